@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+import math
+import json
+import logging
+import threading
+
+
+def tDistributionCoverage(t, df):
+    """Get P(|T| < t) of the Student's t-distribution with df (integer) degrees of freedom.
+
+    This is the finite series of Abramowitz and Stegun 26.7.3 and 26.7.4.
+    """
+    theta = math.atan(t / math.sqrt(df))
+    cos2 = math.cos(theta) ** 2
+    if df % 2 == 1:
+        if df == 1:
+            return 2 * theta / math.pi
+        term = 1
+        series = 1
+        for k in range(3, df - 1, 2):
+            term *= (k - 1) / k * cos2
+            series += term
+        return 2 / math.pi * (theta + math.sin(theta) * math.cos(theta) * series)
+    term = 1
+    series = 1
+    for k in range(2, df - 1, 2):
+        term *= (k - 1) / k * cos2
+        series += term
+    return math.sin(theta) * series
+
+
+def tQuantile(confidence, df):
+    """Get t, such that the two-sided interval [-t, t] covers confidence of the t-distribution."""
+    low = 0.0
+    high = 1.0
+    while tDistributionCoverage(high, df) < confidence:
+        high *= 2
+    for i in range(100):
+        middle = (low + high) / 2
+        if tDistributionCoverage(middle, df) < confidence:
+            low = middle
+        else:
+            high = middle
+    return high
+
+
+def relativeConfidenceWidth(values, confidence=0.95):
+    """Get the width of the confidence interval of the mean of values relative to the mean."""
+    n = len(values)
+    if n < 2:
+        return math.inf
+    mean = sum(values) / n
+    if mean == 0:
+        return math.inf
+    variance = sum((value - mean) ** 2 for value in values) / (n - 1)
+    return 2 * tQuantile(confidence, n - 1) * math.sqrt(variance / n) / abs(mean)
+
+
+class RepetitionController:
+    """Decide, if further repetitions of a setup are needed.
+
+    A setup is done as soon as the relative width of the confidence interval of its QMpH (and
+    optionally the QpS of each query) is below targetWidth after at least minRepetitions, or when
+    maxRepetitions were completed. The decisions are written to a JSON file.
+    """
+
+    logger = logging.getLogger('quit-eval.adaptive')
+
+    def __init__(self, targetWidth, confidence=0.95, minRepetitions=3, maxRepetitions=10,
+                 perQuery=False, output=None):
+        self.targetWidth = targetWidth
+        self.confidence = confidence
+        self.minRepetitions = max(minRepetitions, 2)
+        self.maxRepetitions = maxRepetitions
+        self.perQuery = perQuery
+        self.output = output
+        self.results = {}
+        self.decisions = {}
+        self.lock = threading.Lock()
+
+    def isDone(self, setup):
+        with self.lock:
+            return setup in self.decisions
+
+    def getWidths(self, setup):
+        results = self.results[setup]
+        widths = {"qmph": relativeConfidenceWidth([qmph for qmph, queries in results],
+                                                  self.confidence)}
+        if self.perQuery:
+            queryNumbers = set()
+            for qmph, queries in results:
+                queryNumbers.update(queries.keys())
+            for nr in sorted(queryNumbers):
+                values = [queries[nr] for qmph, queries in results if nr in queries]
+                widths[str(nr)] = relativeConfidenceWidth(values, self.confidence)
+        return widths
+
+    def addResult(self, setup, qmph, queries):
+        """Add the QMpH and the QpS per query number of a completed repetition of setup."""
+        with self.lock:
+            self.results.setdefault(setup, []).append((qmph, queries))
+            if setup in self.decisions:
+                return
+            repetitions = len(self.results[setup])
+            widths = self.getWidths(setup)
+            self.logger.info("{} after {} repetitions: relative CI width of QMpH {:.4f}".format(
+                setup, repetitions, widths["qmph"]))
+            if repetitions >= self.minRepetitions and max(widths.values()) <= self.targetWidth:
+                self.decide(setup, "target reached", widths)
+            elif repetitions >= self.maxRepetitions:
+                self.decide(setup, "maximum repetitions reached", widths)
+
+    def finish(self, setups):
+        """Record a decision for the setups, which ran out of executions (e.g. after failures)."""
+        with self.lock:
+            for setup in setups:
+                if setup not in self.decisions:
+                    widths = self.getWidths(setup) if setup in self.results else {}
+                    self.decide(setup, "no further executions scheduled", widths)
+
+    def decide(self, setup, reason, widths):
+        self.logger.info("Stop repetitions of {}: {}".format(setup, reason))
+        self.decisions[setup] = {
+            "reason": reason,
+            "repetitions": len(self.results.get(setup, [])),
+            "widths": {key: (None if math.isinf(width) else width)
+                       for key, width in widths.items()},
+            "targetWidth": self.targetWidth,
+            "confidence": self.confidence
+        }
+        if self.output is not None:
+            with open(self.output, "w") as outputFile:
+                json.dump(self.decisions, outputFile, indent=2, sort_keys=True)
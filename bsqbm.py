@@ -4,15 +4,26 @@ import sys
 import os
 import signal
 import shutil
+import json
+import argparse
+import xml.etree.ElementTree
 import yaml
 import subprocess
 import shlex
 import time
 import psutil
 import threading
+import queue
+import socket
 import pygit2
 import logging
 import requests
+from preparation import prepareDataset
+from repocache import RepositoryCache, hashFile
+from adaptive import RepetitionController
+from profiling import PySpyProfiler, getSamplerEnvironment, getContainerPid
+from resources import SizeTracker, ProcessTree, ProcessSampler, CgroupReader, IoCounter
+from readiness import waitForEndpoint, waitForContainerRemoval, waitForPortRelease, recordReadiness
 
 logger = logging.getLogger('quit-eval')
 logger.setLevel(logging.DEBUG)
@@ -31,19 +42,175 @@ class BSQBMRunner:
 
     executionQueue = []
     prepared = False
+    parallel = 1
+    basePort = 5000
+    pinCpus = False
+    resume = False
+    repetitionController = None
+
+    def configure(self, generalConfig):
+        self.parallel = int(generalConfig.get("parallel", 1))
+        self.basePort = int(generalConfig.get("basePort", 5000))
+        self.pinCpus = generalConfig.get("pinCpus", False)
+        self.wallclocks = []
+        self.progressLock = threading.Lock()
+        if generalConfig.get("targetCIWidth") is not None:
+            self.repetitionController = RepetitionController(
+                float(generalConfig["targetCIWidth"]),
+                float(generalConfig["confidenceLevel"]),
+                int(generalConfig["minRepetitions"]),
+                int(generalConfig["maxRepetitions"]),
+                generalConfig["ciPerQuery"],
+                os.path.join(generalConfig["resultDirectory"], "repetitions.json"))
 
     def prepare(self):
         for execution in self.executionQueue:
+            if self.resume:
+                if execution.isCompleted():
+                    self.logger.info("Skip completed execution {}".format(execution.runName))
+                    execution.completed = True
+                    self.wallclocks.append(execution.getCompletionMarker()["wallclock"])
+                    self.addResult(execution)
+                    continue
+                self.logger.info("Clean execution {}".format(execution.runName))
+                execution.cleanup()
             execution.prepare()
         self.prepared = True
 
+    def getPendingExecutions(self):
+        return [execution for execution in self.executionQueue if not execution.completed]
+
     def run(self, block=False):
         if not self.prepared:
             raise Exception("The Run was not prepared")
-        for execution in self.executionQueue:
+        self.remaining = len(self.getPendingExecutions())
+        if self.parallel > 1:
+            self.runParallel()
+        else:
+            for execution in self.getPendingExecutions():
+                self.runExecution(execution, block)
+        if self.repetitionController is not None and block:
+            self.repetitionController.finish(
+                set(execution.setupName for execution in self.executionQueue))
+
+    def isNeeded(self, execution):
+        """Check if the setup of the execution still needs repetitions in the adaptive mode."""
+        controller = self.repetitionController
+        if controller is None or not controller.isDone(execution.setupName):
+            return True
+        self.logger.info("Skip execution {}, enough repetitions of {}".format(
+            execution.runName, execution.setupName))
+        execution.cleanup()
+        with self.progressLock:
+            self.remaining -= 1
+        return False
+
+    def addResult(self, execution):
+        if self.repetitionController is None:
+            return
+        results = execution.getResults()
+        if results is None:
+            self.logger.warning("No results of {} for the adaptive repetitions".format(
+                execution.runName))
+            return
+        self.repetitionController.addResult(execution.setupName, *results)
+
+    def runExecution(self, execution, block):
+        """Run a single execution.
+
+        In blocking mode the execution is terminated afterwards and a completion marker is written,
+        if the execution succeeded.
+        """
+        if not self.isNeeded(execution):
+            return
+        started = time.time()
+        try:
             execution.run(block)
-            if (block):
-                execution.terminate()
+        except Exception as exc:
+            execution.terminate()
+            self.reportFailure(execution, exc)
+            return
+        if (block):
+            failure = execution.getFailure()
+            execution.terminate()
+            if failure is not None:
+                self.reportFailure(execution, failure)
+                return
+            finished = time.time()
+            execution.writeCompletionMarker(started, finished)
+            self.reportProgress(execution, finished - started)
+            self.addResult(execution)
+
+    def reportFailure(self, execution, reason):
+        with self.progressLock:
+            self.remaining -= 1
+        self.logger.error("Execution {} failed: {}, {} executions remaining".format(
+            execution.runName, reason, self.remaining))
+
+    def reportProgress(self, execution, wallclock):
+        with self.progressLock:
+            self.wallclocks.append(wallclock)
+            self.remaining -= 1
+            estimate = sum(self.wallclocks) / len(self.wallclocks) * self.remaining / self.parallel
+        self.logger.info(
+            "Finished {} after {:.0f}s, {} executions remaining (about {:.0f}s)".format(
+                execution.runName, wallclock, self.remaining, estimate))
+
+    def runParallel(self):
+        """Run the execution queue with self.parallel executions at once.
+
+        Each worker owns a slot with its own ports and (optionally) cpu sets, executions are
+        taken from the queue in order and always run blocking.
+        """
+        pending = queue.Queue()
+        for execution in self.getPendingExecutions():
+            pending.put(execution)
+
+        def worker(slot):
+            while True:
+                try:
+                    execution = pending.get_nowait()
+                except queue.Empty:
+                    return
+                self.logger.debug("Run {} in slot {}".format(execution.runName, slot))
+                execution.assignSlot(slot)
+                self.runExecution(execution, True)
+
+        workers = []
+        for slot in self.allocateSlots():
+            workerThread = threading.Thread(target=worker, args=(slot,))
+            workerThread.start()
+            workers.append(workerThread)
+        for workerThread in workers:
+            workerThread.join()
+
+    def allocateSlots(self):
+        requiredPorts = max(execution.requiredPorts for execution in self.executionQueue)
+        cpus = sorted(os.sched_getaffinity(0))
+        pinCpus = self.pinCpus
+        if pinCpus and len(cpus) < self.parallel:
+            self.logger.warning("Only {} cpus for {} parallel executions, will not pin cpus".format(
+                len(cpus), self.parallel))
+            pinCpus = False
+        cpusPerSlot = len(cpus) // self.parallel
+
+        slots = []
+        usedPorts = set()
+        port = self.basePort
+        for number in range(self.parallel):
+            ports = []
+            while len(ports) < requiredPorts:
+                port = findFreePort(port, usedPorts)
+                usedPorts.add(port)
+                ports.append(port)
+            slot = {"number": number, "ports": ports, "storeCpus": None, "driverCpus": None}
+            if pinCpus:
+                slotCpus = cpus[number * cpusPerSlot:(number + 1) * cpusPerSlot]
+                half = max(1, len(slotCpus) // 2)
+                slot["storeCpus"] = slotCpus[:half]
+                slot["driverCpus"] = slotCpus[half:] or slotCpus[:half]
+            slots.append(slot)
+        return slots
 
     def addExecutionsToQueue(self, executions):
         self.executionQueue += executions
@@ -58,6 +225,20 @@ class BSQBMRunner:
             execution = None
 
 
+def findFreePort(start, usedPorts=()):
+    """Return the first port starting at start, which is not used and can be bound."""
+    port = start
+    while True:
+        if port not in usedPorts:
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as probe:
+                try:
+                    probe.bind(('', port))
+                    return port
+                except OSError:
+                    pass
+        port += 1
+
+
 class MonitorThread(threading.Thread):
     """The Monitor Thread.
 
@@ -67,6 +248,16 @@ class MonitorThread(threading.Thread):
 
     logger = logging.getLogger('quit-eval.monitor')
 
+    rescanInterval = 60
+    interval = 1
+    details = False
+    containerName = None
+    cgroupRoot = '/sys/fs/cgroup'
+    maxCgroupBackoff = 30
+    ioInterval = None
+    columns = ["time", "du", "mem", "dualloc", "ducost", "procs"]
+    workerColumns = ["time", "pid", "ppid", "rss", "utime", "stime", "threads"]
+
     def __init__(self):
         super(MonitorThread, self).__init__()
         self._stop_event = threading.Event()
@@ -85,46 +276,156 @@ class MonitorThread(threading.Thread):
     def run(self):
         self.logger.debug("Start monitor on pid: {} in directory: {}".format(
             self.process.pid, self.repositoryPath))
-        with open(os.path.join(self.logPath, "resources-mem.log"), "a") as reslog:
-            psProcess = psutil.Process(self.process.pid)
-            du = 0
-            mem = 0
+        self.sizeTracker = SizeTracker(self.repositoryPath, self.rescanInterval)
+        sampler = ProcessSampler() if self.details else None
+        processTree = ProcessTree(self.process.pid)
+        self.cgroup = None
+        self.containerId = None
+        self.cgroupWalked = False
+        self.cgroupBackoff = self.interval
+        self.nextCgroupLookup = 0
+        du = 0
+        dualloc = 0
+        ioMonitor = None
+        if self.ioInterval:
+            ioMonitor = IoMonitorThread(self.process.pid, self.logPath, self.ioInterval,
+                                        self.containerName)
+            ioMonitor.start()
+        with open(os.path.join(self.logPath, "resources-mem.log"), "a") as reslog, \
+                open(os.path.join(self.logPath, "resources-workers.log"), "a") as workerlog, \
+                open(os.path.join(self.logPath, "resources-events.log"), "a") as eventlog:
+            if reslog.tell() == 0:
+                reslog.write(" ".join(self.getColumns()) + "\n")
+            if workerlog.tell() == 0:
+                workerlog.write(" ".join(self.workerColumns) + "\n")
+            processes = []
+            nextSample = time.monotonic()
             while(self.process.poll() is None and not self.stopped()):
                 timestamp = float(round(time.time() * 1000) / 1000)
-                try:
-                    mem = float(psProcess.memory_info().rss) / 1024
-                except Exception as exc:
-                    self.logger.debug("Monitor exception: mem", exc)
-                try:
-                    du = self.get_size(self.repositoryPath)
-                except Exception as exc:
-                    self.logger.debug("Monitor exception: du {}".format(str(exc)))
-                    try:
-                        du = self.get_size(self.repositoryPath)
-                    except Exception as exc:
-                        self.logger.debug("Monitor exception failed again: du {}".format(str(exc)))
-                        self.logger.debug("using old value for du {}".format(str(du)))
-                reslog.write("{} {} {}\n".format(timestamp, du, mem))
-                time.sleep(1)
+                processes, started, exited = processTree.update()
+                for process in started:
+                    eventlog.write("{} start {}\n".format(timestamp, process.pid))
+                for process in exited:
+                    eventlog.write("{} exit {}\n".format(timestamp, process.pid))
+                du, dualloc, ducost = self.measureSize(du, dualloc)
+                values = self.sampleResources(timestamp, processes, (du, dualloc, ducost), sampler,
+                                              workerlog)
+                reslog.write(" ".join(str(value) for value in values) + "\n")
+                nextSample += self.interval
+                self._stop_event.wait(max(0, nextSample - time.monotonic()))
             self.logger.debug(
                 "Monitor for {} on {} stopped, reason: process.poll() = {}; self.stopped() = {}"
                 .format(self.process.pid, self.repositoryPath, self.process.poll(), self.stopped()))
         try:
-            with open(os.path.join(self.logPath, "resources-mem.log"), "a") as reslog:
+            with open(os.path.join(self.logPath, "resources-mem.log"), "a") as reslog, \
+                    open(os.path.join(self.logPath, "resources-workers.log"), "a") as workerlog:
                 timestamp = float(round(time.time() * 1000) / 1000)
-                try:
-                    mem = float(psProcess.memory_info().rss) / 1024
-                except psutil.NoSuchProcess:
-                    mem = 0
-                try:
-                    du = self.get_size(self.repositoryPath)
-                except Exception as exc:
-                    du = 0
-                reslog.write("{} {} {}\n".format(timestamp, du, mem))
+                processes = processTree.update()[0]
+                self.sizeTracker.rescan()
+                values = self.sampleResources(timestamp, processes, self.measureSize(0, 0), sampler,
+                                              workerlog)
+                reslog.write(" ".join(str(value) for value in values) + "\n")
         except Exception as exc:
             self.logger.warning("Monitor exception when writing the last line: {}".format(str(exc)))
+        if ioMonitor is not None:
+            ioMonitor.stop()
+            ioMonitor.join()
         self.logger.debug("Monitor Run finished and all resources are closed")
 
+    def sampleResources(self, timestamp, processes, size, sampler, workerlog):
+        """Get the values of a line of resources-mem.log, size is the result of measureSize.
+
+        The memory is the RSS summed over the process tree or the memory of the cgroup of the
+        container.
+        """
+        mem = self.sampleWorkers(timestamp, processes, workerlog)
+        cgroupValues = self.sampleCgroup()
+        if cgroupValues and cgroupValues[0] != "NaN":
+            # the store runs in the container, not in the docker client process
+            mem = cgroupValues[0]
+        du, dualloc, ducost = size
+        values = [timestamp, du, mem, dualloc, ducost, len(processes)]
+        if sampler:
+            values += sampler.sample(processes)
+        return values + cgroupValues
+
+    def sampleWorkers(self, timestamp, processes, workerlog):
+        """Write the usage of each process of the tree to workerlog, return the total RSS in KiB."""
+        mem = 0
+        for process in processes:
+            try:
+                with process.oneshot():
+                    rss = float(process.memory_info().rss) / 1024
+                    cpu = process.cpu_times()
+                    values = [timestamp, process.pid, process.ppid(), rss, cpu.user, cpu.system,
+                              process.num_threads()]
+            except psutil.Error:
+                continue
+            mem += rss
+            workerlog.write(" ".join(str(value) for value in values) + "\n")
+        return mem
+
+    def sampleCgroup(self):
+        """Sample the cgroup of the container, it is looked up until the container exists.
+
+        Failed lookups are retried with an exponential backoff and the cgroup tree is walked at
+        most once, so the lookup does not load the measured run.
+        """
+        if self.containerName is None:
+            return []
+        if self.cgroup is None and time.monotonic() >= self.nextCgroupLookup:
+            self.lookupCgroup()
+            if self.cgroup is None:
+                self.nextCgroupLookup = time.monotonic() + self.cgroupBackoff
+                self.cgroupBackoff = min(self.cgroupBackoff * 2, self.maxCgroupBackoff)
+        if self.cgroup is None:
+            return ["NaN"] * len(CgroupReader.columns)
+        return self.cgroup.sample()
+
+    def lookupCgroup(self):
+        if self.containerId is None:
+            try:
+                inspect = subprocess.run(['docker', 'inspect', '-f', '{{.Id}}', self.containerName],
+                                         stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            except OSError as exc:
+                self.logger.debug("Monitor exception: docker inspect {}".format(str(exc)))
+                return
+            if inspect.returncode != 0:
+                return
+            self.containerId = inspect.stdout.decode().strip()
+        self.cgroup = CgroupReader.findContainerCgroup(self.containerId, self.cgroupRoot,
+                                                       walk=not self.cgroupWalked)
+        self.cgroupWalked = True
+        self.logger.debug("Found cgroup {} for container {}".format(
+            self.cgroup.path if self.cgroup else None, self.containerName))
+
+    def getColumns(self):
+        columns = self.columns
+        if self.details:
+            columns = columns + ProcessSampler.columns
+        if self.containerName is not None:
+            columns = columns + CgroupReader.columns
+        return columns
+
+    def measureSize(self, du, dualloc):
+        """Update the size of the repository and return apparent size, allocated size and the cost.
+
+        The sizes are given in KiB, the cost of the measurement in milliseconds. If the
+        measurement fails twice the old values are returned.
+        """
+        start = time.perf_counter()
+        try:
+            du, dualloc = self.sizeTracker.update()
+        except Exception as exc:
+            self.logger.debug("Monitor exception: du {}".format(str(exc)))
+            try:
+                self.sizeTracker.rescan()
+                du, dualloc = self.sizeTracker.update()
+            except Exception as exc:
+                self.logger.debug("Monitor exception failed again: du {}".format(str(exc)))
+                self.logger.debug("using old value for du {}".format(str(du)))
+        return du, dualloc, round((time.perf_counter() - start) * 1000, 3)
+
     def get_size(self, start_path='.'):
         total_size = 0
         for dirpath, dirnames, filenames in os.walk(start_path):
@@ -137,10 +438,75 @@ class MonitorThread(threading.Thread):
         return total_size / 1024
 
 
+class IoMonitorThread(threading.Thread):
+    """Sample the cumulative io counters of the store process tree at a high rate.
+
+    The counters are written to resources-io.log. For containers the tree of the containerized
+    process is followed, as soon as the container is running.
+    """
+
+    logger = logging.getLogger('quit-eval.iomonitor')
+
+    treeInterval = 1
+    columns = ["time"] + IoCounter.columns
+
+    def __init__(self, pid, logPath, interval, containerName=None):
+        super(IoMonitorThread, self).__init__()
+        self._stop_event = threading.Event()
+        self.pid = pid
+        self.logPath = logPath
+        self.interval = interval
+        self.containerName = containerName
+
+    def stop(self):
+        self._stop_event.set()
+
+    def getPid(self):
+        if self.containerName is None:
+            return self.pid
+        while not self._stop_event.is_set():
+            pid = getContainerPid(self.containerName)
+            if pid:
+                return pid
+            self._stop_event.wait(self.interval)
+        return None
+
+    def run(self):
+        pid = self.getPid()
+        if pid is None:
+            return
+        try:
+            processTree = ProcessTree(pid)
+        except psutil.Error as exc:
+            self.logger.debug("Can not follow {}: {}".format(pid, exc))
+            return
+        counter = IoCounter()
+        processes = []
+        nextTreeUpdate = time.monotonic()
+        nextSample = time.monotonic()
+        with open(os.path.join(self.logPath, "resources-io.log"), "a") as iolog:
+            if iolog.tell() == 0:
+                iolog.write(" ".join(self.columns) + "\n")
+            while True:
+                stopping = self._stop_event.is_set()
+                if time.monotonic() >= nextTreeUpdate or stopping:
+                    processes = processTree.update()[0]
+                    nextTreeUpdate += self.treeInterval
+                values = [round(time.time(), 4)] + counter.sample(processes)
+                iolog.write(" ".join(str(value) for value in values) + "\n")
+                if stopping:
+                    break
+                nextSample += self.interval
+                self._stop_event.wait(max(0, nextSample - time.monotonic()))
+
+
 class Execution:
     logger = logging.getLogger('quit-eval.execution')
 
     running = False
+    completed = False
+    setupName = None
+    repetition = 1
 
     usecase = 'exploreAndUpdate'
     runName = None
@@ -155,32 +521,273 @@ class Execution:
     storeArguments = None
     profiling = False
 
+    storeHost = 'localhost'
+    storePort = 5000
+    requiredPorts = 1
+    containerName = 'bsbm.docker'
+    storeCpus = None
+    driverCpus = None
+    bsbmWorkingDirectory = None
+    bsbmDriver = 'testdriver'
+    bsbmClients = 1
+    openLoopRate = None
+    openLoopArrival = 'fixed'
+    openLoopWorkers = 64
+    steadyWindow = 5
+    steadyThreshold = 0.1
+    maxWarmup = 100
+    readinessTimeout = 120
+    prepareMemory = 256
+    prepareUnique = False
+    monitorInterval = 1
+    monitorDetails = False
+    ioInterval = None
+    dockerized = False
+    cgroupRoot = '/sys/fs/cgroup'
+    pythonStore = True
+    defaultProfiler = None
+    profilingRate = 100
+
+    def getCompletionMarkerPath(self):
+        return os.path.join(self.logPath, "completed.json")
+
+    def getOutputChecksums(self):
+        """Get the sha256 of all files written to the log directory."""
+        checksums = {}
+        for dirpath, dirnames, filenames in os.walk(self.logPath):
+            for f in filenames:
+                path = os.path.join(dirpath, f)
+                if os.path.islink(path) or path == self.getCompletionMarkerPath():
+                    continue
+                checksums[os.path.relpath(path, self.logPath)] = hashFile(path)
+        return checksums
+
+    def writeCompletionMarker(self, started, finished):
+        with open(self.getCompletionMarkerPath(), "w") as marker:
+            json.dump({
+                "runName": self.runName,
+                "started": started,
+                "finished": finished,
+                "wallclock": finished - started,
+                "checksums": self.getOutputChecksums()
+            }, marker, indent=2)
+
+    def getCompletionMarker(self):
+        with open(self.getCompletionMarkerPath(), "r") as marker:
+            return json.load(marker)
+
+    def isCompleted(self):
+        """Check if the execution was completed and its output was not modified since."""
+        if not os.path.exists(self.getCompletionMarkerPath()):
+            return False
+        try:
+            return self.getCompletionMarker()["checksums"] == self.getOutputChecksums()
+        except (ValueError, KeyError):
+            return False
+
+    def getFailure(self):
+        """Get the reason why the finished execution failed or None, if it succeeded.
+
+        Has to be called before terminate, while the store should still be running.
+        """
+        if hasattr(self, "bsbmProcess"):
+            returnCode = self.bsbmProcess.poll()
+            if returnCode != 0:
+                return "the load driver exited with {}".format(returnCode)
+        if hasattr(self, "storeProcess") and self.storeProcess.poll() is not None:
+            return "the store exited with {}".format(self.storeProcess.returncode)
+        if self.getResults() is None:
+            return "the load driver wrote no results"
+        return None
+
+    def getResults(self):
+        """Get the QMpH and the QpS per query number from the BSBM result or None."""
+        try:
+            result = xml.etree.ElementTree.parse(
+                os.path.join(self.logPath, self.runName + ".xml")).getroot()
+            qmph = float(result.find('querymix').find('qmph').text)
+        except (OSError, xml.etree.ElementTree.ParseError, AttributeError, ValueError):
+            return None
+        queries = {}
+        for query in result.find('queries').findall('query'):
+            if query.find('qps') is not None:
+                queries[int(query.get('nr'))] = float(query.find('qps').text)
+        return qmph, queries
+
+    def cleanup(self):
+        """Remove everything a partial execution has left behind."""
+        for path in [self.repositoryPath, self.logPath]:
+            if os.path.exists(path):
+                shutil.rmtree(path)
+
+    def getEndpoint(self, path='/sparql'):
+        return 'http://{}:{}{}'.format(self.storeHost, self.storePort, path)
+
+    def assignSlot(self, slot):
+        """Bind this execution to the ports and cpus of a slot of the parallel runner."""
+        self.storePort = slot["ports"][0]
+        self.storeCpus = slot["storeCpus"]
+        self.driverCpus = slot["driverCpus"]
+        self.containerName = 'bsbm.docker.' + self.runName
+        # the testdriver writes its run.log to the working directory
+        self.bsbmWorkingDirectory = os.path.join(self.logPath, 'bsbm')
+
+    def getDriverCommand(self):
+        """Get the command of the load driver, the Java testdriver or the python driver.py."""
+        if self.bsbmDriver == 'python':
+            logPath = os.path.abspath(self.logPath)
+            command = [sys.executable,
+                       os.path.join(os.path.dirname(os.path.abspath(__file__)), "driver.py"),
+                       "-latencylog", os.path.join(logPath, self.runName + "-latency.log"),
+                       "-histograms", os.path.join(logPath, self.runName + "-histograms.json")]
+            if self.openLoopRate is not None:
+                command += ["-rate", str(self.openLoopRate), "-arrival", self.openLoopArrival,
+                            "-maxinflight", str(self.openLoopWorkers)]
+            if str(self.bsbmWarmup) == 'auto':
+                command += ["-steadywindow", str(self.steadyWindow),
+                            "-steadythreshold", str(self.steadyThreshold),
+                            "-maxwarmup", str(self.maxWarmup)]
+            return command
+        if self.openLoopRate is not None:
+            self.logger.warning("The testdriver has no open-loop mode, use bsbmDriver: python")
+        return ["./testdriver"]
+
+    def getWarmup(self):
+        """Get the warmup argument of the load driver, driver.py detects the steady state."""
+        if str(self.bsbmWarmup) == 'auto' and self.bsbmDriver != 'python':
+            self.logger.warning("The testdriver can not detect the steady state, use 5 warmup runs")
+            return 5
+        return self.bsbmWarmup
+
+    def getClientArguments(self):
+        """Get the arguments to run the load driver with concurrent clients."""
+        if int(self.bsbmClients) > 1:
+            return ["-mt", str(self.bsbmClients)]
+        return []
+
+    def getBSBMDirectory(self):
+        """Get the directory to run the testdriver in.
+
+        For parallel executions this is a private directory linking to the content of bsbmLocation.
+        """
+        if self.bsbmWorkingDirectory is None:
+            return self.bsbmLocation
+        if not os.path.exists(self.bsbmWorkingDirectory):
+            os.makedirs(self.bsbmWorkingDirectory)
+            for entry in os.listdir(self.bsbmLocation):
+                if entry == "run.log":
+                    continue
+                os.symlink(os.path.abspath(os.path.join(self.bsbmLocation, entry)),
+                           os.path.join(self.bsbmWorkingDirectory, entry))
+        return self.bsbmWorkingDirectory
+
+    def startMonitor(self, directory):
+        self.monitor = MonitorThread()
+        self.monitor.interval = self.monitorInterval
+        self.monitor.details = self.monitorDetails
+        self.monitor.ioInterval = self.ioInterval
+        if self.dockerized:
+            self.monitor.containerName = self.containerName
+            self.monitor.cgroupRoot = self.cgroupRoot
+        self.monitor.setstoreProcessAndDirectory(
+            self.storeProcess, directory, self.logPath)
+        self.monitor.start()
+
+    def getProfiler(self):
+        """Get the profiler to use, 'profiling: true' selects the default of the execution type."""
+        if not self.profiling:
+            return None
+        if self.profiling is True:
+            return self.defaultProfiler
+        return self.profiling
+
+    def getStoreEnvironment(self):
+        """Get the environment for the store process, it injects the stack sampler if selected."""
+        if self.getProfiler() == 'sampler':
+            return getSamplerEnvironment(
+                os.path.join(os.path.abspath(self.logPath), "profile-stacks"), self.profilingRate)
+        return None
+
+    def startProfiler(self):
+        """Attach py-spy to the running store, if it was selected as profiler."""
+        if self.getProfiler() != 'pyspy':
+            return
+        if not self.pythonStore:
+            self.logger.info("Profiling is only possible for python stores")
+            return
+        if self.dockerized:
+            pid = getContainerPid(self.containerName)
+        else:
+            pid = self.storeProcess.pid
+        if pid is None:
+            self.logger.error("Could not find the process to profile")
+            return
+        self.profiler = PySpyProfiler(
+            os.path.join(os.path.abspath(self.logPath), "profile-stacks.txt"), self.profilingRate)
+        self.profiler.start(pid)
+
+    def stopProfiler(self):
+        if hasattr(self, "profiler"):
+            self.profiler.stop()
+
+    def waitUntilReady(self, endpoint, phase="ready"):
+        """Wait for the store to answer on endpoint and record the time it took."""
+        self.logger.debug("Wait for {} to be ready".format(endpoint))
+        seconds = waitForEndpoint(endpoint, self.readinessTimeout, self.storeProcess)
+        recordReadiness(self.logPath, phase, seconds)
+
+    def removeContainer(self):
+        """Remove the docker container and wait until it and all ports it published are gone."""
+        start = time.monotonic()
+        subprocess.run(['docker', 'rm', '-f', self.containerName], stdout=subprocess.DEVNULL)
+        try:
+            waitForContainerRemoval(self.containerName, self.readinessTimeout)
+            for portMapping in self.getPortMappings():
+                waitForPortRelease(int(portMapping.split(':')[0]), self.readinessTimeout)
+            recordReadiness(self.logPath, "teardown", time.monotonic() - start)
+        except TimeoutError as exc:
+            self.logger.warning(str(exc))
+
+    def popen(self, command, cpus=None, **kwargs):
+        # taskset pins the process before it starts any thread and execs the command, so the pid
+        # stays the same (preexec_fn is not safe in the threads of the parallel runner)
+        if cpus:
+            command = ["taskset", "-c", ",".join(str(cpu) for cpu in cpus)] + list(command)
+        return subprocess.Popen(command, **kwargs)
+
+    def prepare_dataset(self, target):
+        """Write the sorted dataset of the bsbm as quads in <urn:bsbm> to target.
+
+        The sort is done externally with at most prepareMemory MiB of memory.
+        """
+        prepareDataset(os.path.join(self.bsbmLocation, "dataset.nt"), target,
+                       memoryBudget=self.prepareMemory * 1024 * 1024, unique=self.prepareUnique)
+
     def prepare_repository(self, directory):
         if not os.path.exists(directory):
             os.makedirs(directory)
-        with open(os.path.join(self.bsbmLocation, "dataset.nt"), 'r') as sourceGraph:
-            with open(os.path.join(directory, "data.nq"), 'w') as targetGraph:
-                for line in sorted(list(sourceGraph)):
-                    targetGraph.write(line.rstrip()[:-1] + "<urn:bsbm> .\n")
+        self.prepare_dataset(os.path.join(directory, "data.nq"))
 
     def terminate(self):
         self.logger.debug("Terminate has been called on execution")
         if self.running:
+            self.stopProfiler()
             # self.logger.debug(self.mem_usage)
             # self.memory_log.close()
             if hasattr(self, "bsbmProcess"):
                 self.terminateProcess(self.bsbmProcess)
             # mv bsbm/run.log $QUIT_EVAL_DIR/$LOGDIR/$RUNDIR-run.log
-            if (os.path.exists(os.path.join(self.bsbmLocation, "run.log"))):
-                os.rename(os.path.join(self.bsbmLocation, "run.log"),
+            if (os.path.exists(os.path.join(self.getBSBMDirectory(), "run.log"))):
+                os.rename(os.path.join(self.getBSBMDirectory(), "run.log"),
                           os.path.join(self.logPath, self.runName + "-run.log"))
             if hasattr(self, "storeProcess"):
                 self.terminateProcess(self.storeProcess)
-            self.logger.debug("Call monitor.stop()")
-            self.monitor.stop()
-            self.logger.debug("monitor.stop() called")
-            self.monitor.join()
-            self.logger.debug("monitor.join() finished")
+            if hasattr(self, "monitor"):
+                self.logger.debug("Call monitor.stop()")
+                self.monitor.stop()
+                self.logger.debug("monitor.stop() called")
+                self.monitor.join()
+                self.logger.debug("monitor.join() finished")
             self.running = False
 
     def terminateProcess(self, process):
@@ -213,6 +820,8 @@ class R43plesExecution(Execution):
 
     repositoryPath = None
     bsbmUsecaseFile = "r43ples.sparql.txt"
+    storePort = 8080
+    pythonStore = False
 
     def prepare(self):
 
@@ -233,20 +842,20 @@ class R43plesExecution(Execution):
 
     def runBSBM(self):
         arguments = "{} -runs {} -w {} -dg \"urn:bsbm\" -o {} -ucf {} -udataset {} -u {}".format(
-            "http://localhost:8080/r43ples/sparql",
+            self.getEndpoint('/r43ples/sparql'),
             self.bsbmRuns,
-            self.bsbmWarmup,
+            self.getWarmup(),
             os.path.abspath(os.path.join(self.logPath, self.runName + ".xml")),
             os.path.join("usecases", self.usecase, self.bsbmUsecaseFile),
             "dataset_update.nt",
-            "http://localhost:8080/r43ples/sparql"
+            self.getEndpoint('/r43ples/sparql')
         )
-        self.bsbmArgs = shlex.split(arguments)
+        self.bsbmArgs = shlex.split(arguments) + self.getClientArguments()
         self.logger.debug("Start BSBM in {} with {}".format(
-            self.bsbmLocation, arguments))
+            self.getBSBMDirectory(), self.bsbmArgs))
 
-        self.bsbmProcess = subprocess.Popen(
-            ["./testdriver"] + self.bsbmArgs, cwd=self.bsbmLocation)
+        self.bsbmProcess = self.popen(
+            self.getDriverCommand() + self.bsbmArgs, self.driverCpus, cwd=self.getBSBMDirectory())
         self.logger.debug(
             "BSBM Process ID is: {}".format(self.bsbmProcess.pid))
 
@@ -254,6 +863,8 @@ class R43plesExecution(Execution):
 class RawbaseExecution(Execution):
 
     repositoryPath = None
+    storePort = 8080
+    pythonStore = False
 
     def prepare(self):
 
@@ -279,6 +890,10 @@ class QuitExecution(Execution):
     repositoryPath = None
     bareRepo = None
     bsbmUsecaseFile = "quit.sparql.txt"
+    configTemplate = "config.ttl"
+    defaultProfiler = 'cprofile'
+    repositoryCache = None
+    repositoryCacheSize = None
 
     def prepare(self):
 
@@ -304,16 +919,38 @@ class QuitExecution(Execution):
         else:
             self.prepare_repository(self.repositoryPath)
 
+    def getConfigTemplatePath(self):
+        return os.path.join(os.path.dirname(os.path.abspath(__file__)), "stuff",
+                            self.configTemplate)
+
     def prepare_repository(self, directory):
+        """Prepare the initial repository, if configured it is cloned from the repository cache."""
+        if self.repositoryCache is None:
+            self.build_repository(directory)
+            return
+        maxSize = None
+        if self.repositoryCacheSize is not None:
+            maxSize = self.repositoryCacheSize * 1024 * 1024
+        cache = RepositoryCache(self.repositoryCache, maxSize)
+        options = {
+            "layout": type(self).build_repository.__qualname__,
+            "graph": "urn:bsbm",
+            "unique": self.prepareUnique
+        }
+        key = cache.getKey(
+            [os.path.join(self.bsbmLocation, "dataset.nt"), self.getConfigTemplatePath()], options)
+        if cache.clone(key, directory):
+            self.logger.debug("Cloned initial repository {} from cache".format(key))
+            return
+        self.build_repository(directory)
+        cache.store(key, directory, options)
+
+    def build_repository(self, directory):
         repo = pygit2.init_repository(directory)  # git init $directory
-        configttl = os.path.join(os.path.dirname(
-            os.path.abspath(__file__)), "stuff", "config.ttl")
+        configttl = self.getConfigTemplatePath()
 
         # sed "s/.$/<urn:bsbm> ./g" $BSBM_DIR/dataset.nt | LC_ALL=C sort -u > $REPOSITORY/graph.nq
-        with open(os.path.join(self.bsbmLocation, "dataset.nt"), 'r') as sourceGraph:
-            with open(os.path.join(directory, "graph.nq"), 'w') as targetGraph:
-                for line in sorted(list(sourceGraph)):
-                    targetGraph.write(line.rstrip()[:-1] + "<urn:bsbm> .\n")
+        self.prepare_dataset(os.path.join(directory, "graph.nq"))
 
         with open(os.path.join(directory, "graph.nq.graph"), 'w') as targetGraphDotGraph:
             targetGraphDotGraph.write("urn:bsbm\n")
@@ -332,23 +969,18 @@ class QuitExecution(Execution):
         commiter = author
         oid = repo.create_commit(
             "HEAD", author, commiter, "init for bsqbm", tree, [])
-        # self.logger.debug(
-        #   "try to creat tag for {} {} {} {}".format(type(oid), oid, str(oid), str(oid)[:5])
-        # )
         # git tag init-graph
-        # repo.create_tag("init-graph", str(oid)[:5], pygit2.GIT_OBJ_BLOB, author, "init-graph\n")
+        repo.references.create("refs/tags/init-graph", oid)
 
-    def run(self, block=False, sleep=20):
+    def run(self, block=False):
 
         self.logger.debug("start scenario {}".format(self.runName))
 
         self.running = True
         self.runStore()
-        self.monitor = MonitorThread()
-        self.monitor.setstoreProcessAndDirectory(
-            self.storeProcess, self.repositoryPath, self.logPath)
-        self.monitor.start()
-        time.sleep(sleep)
+        self.startMonitor(self.repositoryPath)
+        self.waitUntilReady(self.getEndpoint())
+        self.startProfiler()
         self.runBSBM()
         if (block):
             self.bsbmProcess.wait()
@@ -368,89 +1000,105 @@ class QuitExecution(Execution):
 
         return [self.executable, "-cm", mode, "-c", config, "-t", target] + storeArguments
 
+    def getPortArguments(self):
+        # only pass the port if it differs from the default, older stores don't know the option
+        if self.storePort != 5000:
+            return ["-p", str(self.storePort)]
+        return []
+
     def runStore(self):
         storeArguments = shlex.split(self.storeArguments)
-        if self.profiling:
+        if self.getProfiler() == 'cprofile':
             quitCommand = ["python", "-m", "cProfile", "-o",
                            os.path.join(self.logPath, "profile_data.pyprof")]
         else:
             quitCommand = []
         quitCommand += [self.executable, "-cm", "localconfig", "-c", os.path.join(
             self.repositoryPath, "config.ttl"), "-t", self.repositoryPath] + storeArguments
+        quitCommand += self.getPortArguments()
         self.logger.debug("Start quit: {}".format(quitCommand))
-        self.storeProcess = subprocess.Popen(quitCommand)
+        self.storeProcess = self.popen(quitCommand, self.storeCpus, env=self.getStoreEnvironment())
         self.logger.debug("Quit process is: {}".format(self.storeProcess.pid))
 
     def runBSBM(self):
         arguments = "{} -runs {} -w {} -dg \"urn:bsbm\" -o {} -ucf {} -udataset {} -u {}".format(
-            "http://localhost:5000/sparql",
+            self.getEndpoint(),
             self.bsbmRuns,
-            self.bsbmWarmup,
+            self.getWarmup(),
             os.path.abspath(os.path.join(self.logPath, self.runName + ".xml")),
             os.path.join("usecases", self.usecase, self.bsbmUsecaseFile),
             "dataset_update.nt",
-            "http://localhost:5000/sparql"
+            self.getEndpoint()
         )
-        self.bsbmArgs = shlex.split(arguments)
+        self.bsbmArgs = shlex.split(arguments) + self.getClientArguments()
         self.logger.debug("Start BSBM in {} with {}".format(
-            self.bsbmLocation, arguments))
+            self.getBSBMDirectory(), self.bsbmArgs))
 
-        self.bsbmProcess = subprocess.Popen(
-            ["./testdriver"] + self.bsbmArgs, cwd=self.bsbmLocation)
+        self.bsbmProcess = self.popen(
+            self.getDriverCommand() + self.bsbmArgs, self.driverCpus, cwd=self.getBSBMDirectory())
         self.logger.debug(
             "BSBM Process ID is: {}".format(self.bsbmProcess.pid))
 
 
 class AdhsExecution(QuitExecution):
 
+    defaultProfiler = 'sampler'
+
     def runStore(self):
         storeArguments = shlex.split(self.storeArguments)
         adhsCommand = ["python", self.executable] + storeArguments
+        if self.storePort != 5000:
+            raise Exception("adhs can not be moved to port {}, run it with parallel: 1".format(
+                self.storePort))
         self.logger.debug("Start adhs: {}".format(adhsCommand))
-        self.storeProcess = subprocess.Popen(adhsCommand)
+        self.storeProcess = self.popen(adhsCommand, self.storeCpus, env=self.getStoreEnvironment())
         self.logger.debug("Adhs process is: {}".format(self.storeProcess.pid))
 
 
 class AdhsUwsgiExecution(QuitExecution):
 
+    defaultProfiler = 'sampler'
+
     def runStore(self):
         storeArguments = shlex.split(self.storeArguments)
         argumentString = " ".join(storeArguments)
-        adhsCommand = ["uwsgi", "--http", "0.0.0.0:5000", "-b", "65536", "--pythonpath", self.pythonpath,
-                       "-w", self.wsgimodule, "--pyargv", argumentString]
+        adhsCommand = ["uwsgi", "--http", "0.0.0.0:{}".format(self.storePort), "-b", "65536",
+                       "--pythonpath", self.pythonpath, "-w", self.wsgimodule,
+                       "--pyargv", argumentString]
         self.logger.debug("Start adhs with uwsgi: {}".format(adhsCommand))
-        self.storeProcess = subprocess.Popen(adhsCommand)
+        self.storeProcess = self.popen(adhsCommand, self.storeCpus, env=self.getStoreEnvironment())
         self.logger.debug("Adhs uwsgi process is: {}".format(self.storeProcess.pid))
 
 
 class UwsgiExecution(QuitExecution):
 
+    defaultProfiler = 'sampler'
+
     def runStore(self):
         storeArguments = shlex.split(self.storeArguments)
         arguments = ["-cm", "localconfig", "-c", os.path.join(self.repositoryPath, "config.ttl"),
                      "-t", self.repositoryPath] + storeArguments
         argumentString = " ".join(arguments)
-        uwsgiCommand = ["uwsgi", "--http", "0.0.0.0:5000", "-b", "65536", "--pythonpath", self.pythonpath,
-                        "-w", self.wsgimodule, "--pyargv", argumentString]
+        uwsgiCommand = ["uwsgi", "--http", "0.0.0.0:{}".format(self.storePort), "-b", "65536",
+                        "--pythonpath", self.pythonpath, "-w", self.wsgimodule,
+                        "--pyargv", argumentString]
         self.logger.debug("Start quit with uwsgi: {}".format(uwsgiCommand))
-        self.storeProcess = subprocess.Popen(uwsgiCommand)
+        self.storeProcess = self.popen(uwsgiCommand, self.storeCpus, env=self.getStoreEnvironment())
         self.logger.debug("Uwsgi process is: {}".format(self.storeProcess.pid))
 
 
 class QuitOldExecution(QuitExecution):
 
     bsbmUsecaseFile = "quit-old.sparql.txt"
+    configTemplate = "config_old.ttl"
+    defaultProfiler = 'sampler'
 
-    def prepare_repository(self, directory):
+    def build_repository(self, directory):
         repo = pygit2.init_repository(directory)  # git init $directory
-        configttl = os.path.join(os.path.dirname(
-            os.path.abspath(__file__)), "stuff", "config_old.ttl")
+        configttl = self.getConfigTemplatePath()
 
         # sed "s/.$/<urn:bsbm> ./g" $BSBM_DIR/dataset.nt | LC_ALL=C sort -u > $REPOSITORY/graph.nq
-        with open(os.path.join(self.bsbmLocation, "dataset.nt"), 'r') as sourceGraph:
-            with open(os.path.join(directory, "graph.nq"), 'w') as targetGraph:
-                for line in sorted(list(sourceGraph)):
-                    targetGraph.write(line.rstrip()[:-1] + "<urn:bsbm> .\n")
+        self.prepare_dataset(os.path.join(directory, "graph.nq"))
 
         index = repo.index
         index.read()
@@ -465,13 +1113,16 @@ class QuitOldExecution(QuitExecution):
         commiter = author
         oid = repo.create_commit(
             "HEAD", author, commiter, "init for bsqbm", tree, [])
+        # git tag init-graph
+        repo.references.create("refs/tags/init-graph", oid)
 
     def runStore(self):
         storeArguments = shlex.split(self.storeArguments)
         # quit-store --pathspec
-        quitCommand = [self.executable] + storeArguments
+        quitCommand = [self.executable] + storeArguments + self.getPortArguments()
         self.logger.debug("Start quit: {} in {}".format(quitCommand, self.repositoryPath))
-        self.storeProcess = subprocess.Popen(quitCommand, cwd=self.repositoryPath)
+        self.storeProcess = self.popen(quitCommand, self.storeCpus, cwd=self.repositoryPath,
+                                       env=self.getStoreEnvironment())
         self.logger.debug("Quit process is: {}".format(self.storeProcess.pid))
 
 
@@ -479,12 +1130,21 @@ class QuitDockerExecution(QuitExecution):
     logger = logging.getLogger('quit-eval.docker_execution')
 
     running = False
+    dockerized = True
+    defaultProfiler = 'pyspy'
 
     image = 'aksw/quitstore'
-    portMappings = ['5000:5000']
+    containerPort = 5000
     envVariables = []
 
-    def run(self, block=False, sleep=20):
+    def getPortMappings(self):
+        return ['{}:{}'.format(self.storePort, self.containerPort)]
+
+    def getPortArguments(self):
+        # inside of the container the store always listens on its default port
+        return []
+
+    def run(self, block=False):
 
         self.logger.debug("start scenario {}".format(self.runName))
         self.hostTargetDir = self.repositoryPath
@@ -492,11 +1152,9 @@ class QuitDockerExecution(QuitExecution):
 
         self.running = True
         self.runStore()
-        self.monitor = MonitorThread()
-        self.monitor.setstoreProcessAndDirectory(
-            self.storeProcess, self.repositoryPath, self.logPath)
-        self.monitor.start()
-        time.sleep(sleep)
+        self.startMonitor(self.repositoryPath)
+        self.waitUntilReady(self.getEndpoint())
+        self.startProfiler()
         self.runBSBM()
         if (block):
             try:
@@ -508,14 +1166,12 @@ class QuitDockerExecution(QuitExecution):
     def runStore(self):
         self.volumeMounts = [self.hostTargetDir + ':' + self.repositoryPath]
 
-        if self.profiling:
-            self.logger.info('Profiling not implemented for docker environment, yet.')
-            dockerCommand = []
-        else:
-            dockerCommand = []
+        dockerCommand = []
 
-        dockerCommand += ['docker', 'run', '--name', 'bsbm.docker']
-        for portMapping in self.portMappings:
+        dockerCommand += ['docker', 'run', '--name', self.containerName]
+        if self.storeCpus:
+            dockerCommand += ['--cpuset-cpus', ','.join(str(cpu) for cpu in self.storeCpus)]
+        for portMapping in self.getPortMappings():
             dockerCommand += ['-p', portMapping]
         for volumeMount in self.volumeMounts:
             dockerCommand += ['-v', volumeMount]
@@ -525,30 +1181,31 @@ class QuitDockerExecution(QuitExecution):
         dockerCommand += self.getStoreCommand()
         self.logger.debug("Start quit container: {}".format(dockerCommand))
         print(' '.join(dockerCommand))
-        self.storeProcess = subprocess.Popen(dockerCommand)
+        self.storeProcess = self.popen(dockerCommand)
         self.logger.debug("Quit docker process is: {}".format(self.storeProcess.pid))
         self.repositoryPath = self.hostTargetDir
 
     def terminate(self):
         self.logger.debug("Terminate has been called on execution")
         if self.running:
+            self.stopProfiler()
             # self.logger.debug(self.mem_usage)
             # self.memory_log.close()
             if hasattr(self, "bsbmProcess"):
                 self.terminateProcess(self.bsbmProcess)
             # mv bsbm/run.log $QUIT_EVAL_DIR/$LOGDIR/$RUNDIR-run.log
-            if (os.path.exists(os.path.join(self.bsbmLocation, "run.log"))):
-                os.rename(os.path.join(self.bsbmLocation, "run.log"),
+            if (os.path.exists(os.path.join(self.getBSBMDirectory(), "run.log"))):
+                os.rename(os.path.join(self.getBSBMDirectory(), "run.log"),
                           os.path.join(self.logPath, self.runName + "-run.log"))
             if hasattr(self, "storeProcess"):
-                subprocess.Popen('docker rm -f bsbm.docker', shell=True, stdout=subprocess.PIPE)
-                time.sleep(15)
+                self.removeContainer()
                 # self.terminateProcess(self.storeProcess)
-            self.logger.debug("Call monitor.stop()")
-            self.monitor.stop()
-            self.logger.debug("monitor.stop() called")
-            self.monitor.join()
-            self.logger.debug("monitor.join() finished")
+            if hasattr(self, "monitor"):
+                self.logger.debug("Call monitor.stop()")
+                self.monitor.stop()
+                self.logger.debug("monitor.stop() called")
+                self.monitor.join()
+                self.logger.debug("monitor.join() finished")
             self.running = False
 
 
@@ -556,15 +1213,19 @@ class R43plesDockerExecution(R43plesExecution):
     logger = logging.getLogger('quit-eval.docker_execution')
 
     running = False
+    dockerized = True
 
     containerLoadDataMount = '/var/r43ples/data'
     graph = 'urn:bsbm'
     image = 'aksw/r43ples'
-    portMappings = ['8080:80']
+    containerPort = 80
     volumeMounts = []
     envVariables = ['GRAPH_URI=' + graph]
 
-    def run(self, block=False, sleep=25):
+    def getPortMappings(self):
+        return ['{}:{}'.format(self.storePort, self.containerPort)]
+
+    def run(self, block=False):
 
         self.logger.debug("start scenario {}".format(self.runName))
         self.hostLoadDataDir = self.repositoryPath
@@ -574,14 +1235,10 @@ class R43plesDockerExecution(R43plesExecution):
 
         self.running = True
         self.runStore()
-        time.sleep(sleep)
+        self.waitUntilReady(self.getEndpoint('/r43ples/sparql'))
         self.postPrepare('urn:bsbm')
-        time.sleep(2)
-        self.monitor = MonitorThread()
-        self.monitor.setstoreProcessAndDirectory(
-            self.storeProcess, self.hostTbdDir, self.logPath)
-        self.monitor.start()
-        time.sleep(5)
+        self.startProfiler()
+        self.startMonitor(self.hostTbdDir)
         self.runBSBM()
         if (block):
             try:
@@ -595,14 +1252,12 @@ class R43plesDockerExecution(R43plesExecution):
             self.hostLoadDataDir + ':' + self.containerLoadDataMount,
             self.hostTbdDir + ':' + self.containerTbdMount]
 
-        if self.profiling:
-            self.logger.info('Profiling not implemented for docker environment, yet.')
-            dockerCommand = []
-        else:
-            dockerCommand = []
+        dockerCommand = []
 
-        dockerCommand += ['docker', 'run', '--name', 'bsbm.docker']
-        for portMapping in self.portMappings:
+        dockerCommand += ['docker', 'run', '--name', self.containerName]
+        if self.storeCpus:
+            dockerCommand += ['--cpuset-cpus', ','.join(str(cpu) for cpu in self.storeCpus)]
+        for portMapping in self.getPortMappings():
             dockerCommand += ['-p', portMapping]
         for volumeMount in self.volumeMounts:
             dockerCommand += ['-v', volumeMount]
@@ -611,13 +1266,19 @@ class R43plesDockerExecution(R43plesExecution):
         dockerCommand += ['--rm', '-t', self.image]
         self.logger.debug("Start r43ples container: {}".format(' '.join(dockerCommand)))
         print(' '.join(dockerCommand))
-        self.storeProcess = subprocess.Popen(dockerCommand)
+        self.storeProcess = self.popen(dockerCommand)
         self.logger.debug("R43ples docker process is: {}".format(self.storeProcess.pid))
         # self.repositoryPath = self.hostTargetDir
 
+    def cleanup(self):
+        super().cleanup()
+        database = os.path.join(self.repositoryPath, '../database')
+        if os.path.exists(database):
+            shutil.rmtree(database)
+
     def postPrepare(self, graphuri):
         res = requests.post(
-            'http://localhost:8080/r43ples/sparql',
+            self.getEndpoint('/r43ples/sparql'),
             data={'query': 'CREATE GRAPH <' + graphuri + '>'},
             headers={'Accept': 'application/json'})
 
@@ -630,25 +1291,26 @@ class R43plesDockerExecution(R43plesExecution):
         print("Bitte r43ples testen")
         self.pause()
         if self.running:
+            self.stopProfiler()
             self.logger.debug('Trying to stop container')
-            subprocess.Popen(['docker', 'rm', '-f', 'bsbm.docker'])
-            time.sleep(2)
+            self.removeContainer()
             self.logger.debug('Container stopped')
             # self.logger.debug(self.mem_usage)
             # self.memory_log.close()
             if hasattr(self, "bsbmProcess"):
                 self.terminateProcess(self.bsbmProcess)
             # mv bsbm/run.log $QUIT_EVAL_DIR/$LOGDIR/$RUNDIR-run.log
-            if (os.path.exists(os.path.join(self.bsbmLocation, "run.log"))):
-                os.rename(os.path.join(self.bsbmLocation, "run.log"),
+            if (os.path.exists(os.path.join(self.getBSBMDirectory(), "run.log"))):
+                os.rename(os.path.join(self.getBSBMDirectory(), "run.log"),
                           os.path.join(self.logPath, self.runName + "-run.log"))
             if hasattr(self, "storeProcess"):
                 self.terminateProcess(self.storeProcess)
-            self.logger.debug("Call monitor.stop()")
-            self.monitor.stop()
-            self.logger.debug("monitor.stop() called")
-            self.monitor.join()
-            self.logger.debug("monitor.join() finished")
+            if hasattr(self, "monitor"):
+                self.logger.debug("Call monitor.stop()")
+                self.monitor.stop()
+                self.logger.debug("monitor.stop() called")
+                self.monitor.join()
+                self.logger.debug("monitor.join() finished")
             self.running = False
 
     def __del__(self):
@@ -662,24 +1324,34 @@ class RawbaseDockerExecution(RawbaseExecution):
     logger = logging.getLogger('quit-eval.docker_execution')
 
     running = False
+    dockerized = True
 
     image = 'aksw/rawbase'
-    portMappings = ['8080:80', '8890:8890']
+    containerPort = 80
+    virtuosoPort = 8890
+    requiredPorts = 2
     volumeMounts = []
     envVariables = []
 
-    def run(self, block=False, sleep=25):
+    def getPortMappings(self):
+        return ['{}:{}'.format(self.storePort, self.containerPort),
+                '{}:8890'.format(self.virtuosoPort)]
+
+    def assignSlot(self, slot):
+        super().assignSlot(slot)
+        self.virtuosoPort = slot["ports"][1]
+
+    def run(self, block=False):
 
         self.logger.debug("start scenario {}".format(self.runName))
 
         self.running = True
         self.runStore()
-        time.sleep(sleep)
-        self.monitor = MonitorThread()
-        self.monitor.setstoreProcessAndDirectory(
-            self.storeProcess, self.repositoryPath, self.logPath)
-        self.monitor.start()
-        time.sleep(sleep)
+        self.waitUntilReady(self.getEndpoint('/rawbase/sparql'))
+        self.waitUntilReady('http://{}:{}/sparql'.format(self.storeHost, self.virtuosoPort),
+                            "virtuoso")
+        self.startProfiler()
+        self.startMonitor(self.repositoryPath)
         self.runBSBM()
         if (block):
             try:
@@ -691,14 +1363,12 @@ class RawbaseDockerExecution(RawbaseExecution):
     def runStore(self):
         self.volumeMounts = []
 
-        if self.profiling:
-            self.logger.info('Profiling not implemented for docker environment, yet.')
-            dockerCommand = []
-        else:
-            dockerCommand = []
+        dockerCommand = []
 
-        dockerCommand += ['docker', 'run', '--name', 'bsbm.docker']
-        for portMapping in self.portMappings:
+        dockerCommand += ['docker', 'run', '--name', self.containerName]
+        if self.storeCpus:
+            dockerCommand += ['--cpuset-cpus', ','.join(str(cpu) for cpu in self.storeCpus)]
+        for portMapping in self.getPortMappings():
             dockerCommand += ['-p', portMapping]
         for volumeMount in self.volumeMounts:
             dockerCommand += ['-v', volumeMount]
@@ -707,7 +1377,7 @@ class RawbaseDockerExecution(RawbaseExecution):
         dockerCommand += ['--rm', '-t', self.image]
         self.logger.debug("Start rawbase container: {}".format(' '.join(dockerCommand)))
         print(' '.join(dockerCommand))
-        self.storeProcess = subprocess.Popen(dockerCommand)
+        self.storeProcess = self.popen(dockerCommand)
         self.logger.debug("Rawbase docker process is: {}".format(self.storeProcess.pid))
 
     def pause(self):
@@ -719,25 +1389,26 @@ class RawbaseDockerExecution(RawbaseExecution):
         # print("Bitte r43ples testen")
         # self.pause()
         if self.running:
+            self.stopProfiler()
             self.logger.debug('Trying to stop container')
-            subprocess.Popen(['docker', 'rm', '-f', 'bsbm.docker'])
-            time.sleep(2)
+            self.removeContainer()
             self.logger.debug('Container stopped')
             # self.logger.debug(self.mem_usage)
             # self.memory_log.close()
             if hasattr(self, "bsbmProcess"):
                 self.terminateProcess(self.bsbmProcess)
             # mv bsbm/run.log $QUIT_EVAL_DIR/$LOGDIR/$RUNDIR-run.log
-            if (os.path.exists(os.path.join(self.bsbmLocation, "run.log"))):
-                os.rename(os.path.join(self.bsbmLocation, "run.log"),
+            if (os.path.exists(os.path.join(self.getBSBMDirectory(), "run.log"))):
+                os.rename(os.path.join(self.getBSBMDirectory(), "run.log"),
                           os.path.join(self.logPath, self.runName + "-run.log"))
             if hasattr(self, "storeProcess"):
                 self.terminateProcess(self.storeProcess)
-            self.logger.debug("Call monitor.stop()")
-            self.monitor.stop()
-            self.logger.debug("monitor.stop() called")
-            self.monitor.join()
-            self.logger.debug("monitor.join() finished")
+            if hasattr(self, "monitor"):
+                self.logger.debug("Call monitor.stop()")
+                self.monitor.stop()
+                self.logger.debug("monitor.stop() called")
+                self.monitor.join()
+                self.logger.debug("monitor.join() finished")
             self.running = False
 
     def __del__(self):
@@ -777,6 +1448,7 @@ class ScenarioReader:
         resultDirectory = os.path.abspath(
             os.path.join(basePath, docs["resultDirectory"]))
         generalConfig["resultDirectory"] = resultDirectory
+        self.readRunnerConfig(docs, generalConfig)
 
         bsbmLocation = docs["bsbmLocation"]
         executable = None
@@ -790,26 +1462,51 @@ class ScenarioReader:
         else:
             raise Exception("Don't now what to run in scenario: {}".format(resultDirectory))
 
-        repetitions = docs["repetitions"] if "repetitions" in docs else "3"
+        repetitions = self.getRepetitions(docs, generalConfig)
         bsbmRuns = docs["bsbmRuns"] if "bsbmRuns" in docs else "100"
         bsbmWarmup = docs["bsbmWarmup"] if "bsbmWarmup" in docs else "5"
+        steadyWindow = docs["steadyWindow"] if "steadyWindow" in docs else 5
+        steadyThreshold = docs["steadyThreshold"] if "steadyThreshold" in docs else 0.1
+        maxWarmup = docs["maxWarmup"] if "maxWarmup" in docs else 100
 
         repositoryBasePath = docs["repositoryBasePath"] if "repositoryBasePath" in docs else "repo"
         logBasePath = docs["logBasePath"] if "logBasePath" in docs else "logs"
 
         bareRepo = docs["bareRepo"] if "bareRepo" in docs else False
         profiling = docs["profiling"] if "profiling" in docs else False
+        bsbmDriver = docs["bsbmDriver"] if "bsbmDriver" in docs else 'testdriver'
+        readinessTimeout = docs["readinessTimeout"] if "readinessTimeout" in docs else 120
+        prepareMemory = docs["prepareMemory"] if "prepareMemory" in docs else 256
+        prepareUnique = docs["prepareUnique"] if "prepareUnique" in docs else False
+        monitorInterval = docs["monitorInterval"] if "monitorInterval" in docs else 1
+        monitorDetails = docs["monitorDetails"] if "monitorDetails" in docs else False
+        ioInterval = docs["ioInterval"] if "ioInterval" in docs else None
+        cgroupRoot = docs["cgroupRoot"] if "cgroupRoot" in docs else '/sys/fs/cgroup'
+        profilingRate = docs["profilingRate"] if "profilingRate" in docs else 100
+        repositoryCache = docs["repositoryCache"] if "repositoryCache" in docs else None
+        repositoryCacheSize = docs["repositoryCacheSize"] if "repositoryCacheSize" in docs else None
+        if repositoryCache is not None:
+            repositoryCache = os.path.abspath(os.path.join(basePath, repositoryCache))
         docker = docs["docker"] if "docker" in docs else False
         default_executionType = docs["executionType"] if "executionType" in docs else "Quit"
         usecase = docs["usecase"] if "usecase" in docs else False
         default_usecaseFile = docs["usecaseFile"] if "usecaseFile" in docs else False
+        clients = docs["clients"] if "clients" in docs else None
+        openLoopRate = docs["openLoopRate"] if "openLoopRate" in docs else None
+        openLoopArrival = docs["openLoopArrival"] if "openLoopArrival" in docs else 'fixed'
+        openLoopWorkers = docs["openLoopWorkers"] if "openLoopWorkers" in docs else 64
+        expandedScenarios = self.expandLevels(
+            docs["scenarios"], "clients", clients, "{}-c{}", "bsbmClients")
+        expandedScenarios = self.expandLevels(
+            expandedScenarios, "openLoopRate", openLoopRate, "{}-r{}", "openLoopRate")
 
         for repetition in range(1, repetitions + 1):
-            for scenario in docs["scenarios"]:
+            for scenario in expandedScenarios:
                 self.logger.debug(
                     "scenario items: {}".format(scenario.items()))
                 for runName, runConfig in scenario.items():
 
+                    setupName = "quit-" + runName
                     runName = runName + "-" + str(repetition)
 
                     # these lines could go into a factory
@@ -827,7 +1524,11 @@ class ScenarioReader:
 
                     execution.bsbmLocation = bsbmLocation
                     execution.bsbmRuns = bsbmRuns
-                    execution.bsbmWarmup = bsbmWarmup
+                    execution.bsbmWarmup = runConfig[
+                        "bsbmWarmup"] if "bsbmWarmup" in runConfig else bsbmWarmup
+                    execution.steadyWindow = steadyWindow
+                    execution.steadyThreshold = steadyThreshold
+                    execution.maxWarmup = maxWarmup
 
                     # these parameters are individual per scenario
                     runDirectory = os.path.join(
@@ -836,6 +1537,8 @@ class ScenarioReader:
                         "quit-" + runName, runDirectory, runConfig)
 
                     execution.runName = "quit-" + runName
+                    execution.setupName = setupName
+                    execution.repetition = repetition
 
                     if uc:
                         execution.usecase = uc
@@ -864,11 +1567,73 @@ class ScenarioReader:
                         "bareRepo") in runConfig else bareRepo
                     execution.profiling = runConfig["profiling"] if (
                         "profiling") in runConfig else profiling
+                    execution.bsbmDriver = runConfig["bsbmDriver"] if (
+                        "bsbmDriver") in runConfig else bsbmDriver
+                    execution.bsbmClients = runConfig["bsbmClients"] if (
+                        "bsbmClients") in runConfig else 1
+                    execution.openLoopRate = runConfig["openLoopRate"] if (
+                        "openLoopRate") in runConfig else None
+                    execution.openLoopArrival = runConfig["openLoopArrival"] if (
+                        "openLoopArrival") in runConfig else openLoopArrival
+                    execution.openLoopWorkers = openLoopWorkers
+                    execution.readinessTimeout = runConfig["readinessTimeout"] if (
+                        "readinessTimeout") in runConfig else readinessTimeout
+                    execution.prepareMemory = prepareMemory
+                    execution.prepareUnique = prepareUnique
+                    execution.monitorInterval = runConfig["monitorInterval"] if (
+                        "monitorInterval") in runConfig else monitorInterval
+                    execution.monitorDetails = runConfig["monitorDetails"] if (
+                        "monitorDetails") in runConfig else monitorDetails
+                    execution.ioInterval = runConfig["ioInterval"] if (
+                        "ioInterval") in runConfig else ioInterval
+                    execution.cgroupRoot = cgroupRoot
+                    execution.profilingRate = profilingRate
+                    execution.repositoryCache = repositoryCache
+                    execution.repositoryCacheSize = repositoryCacheSize
 
                     scenarios.append(execution)
 
         return generalConfig, scenarios
 
+    def readRunnerConfig(self, docs, generalConfig):
+        generalConfig["parallel"] = docs["parallel"] if "parallel" in docs else 1
+        generalConfig["basePort"] = docs["basePort"] if "basePort" in docs else 5000
+        generalConfig["pinCpus"] = docs["pinCpus"] if "pinCpus" in docs else False
+        generalConfig["targetCIWidth"] = docs["targetCIWidth"] if "targetCIWidth" in docs else None
+        generalConfig["confidenceLevel"] = docs[
+            "confidenceLevel"] if "confidenceLevel" in docs else 0.95
+        generalConfig["minRepetitions"] = docs["minRepetitions"] if "minRepetitions" in docs else 3
+        generalConfig["maxRepetitions"] = docs["maxRepetitions"] if "maxRepetitions" in docs else 10
+        generalConfig["ciPerQuery"] = docs["ciPerQuery"] if "ciPerQuery" in docs else False
+
+    def getRepetitions(self, docs, generalConfig):
+        """Get the number of repetitions to schedule, in the adaptive mode this is the maximum."""
+        if generalConfig["targetCIWidth"] is not None:
+            return int(generalConfig["maxRepetitions"])
+        return int(docs["repetitions"]) if "repetitions" in docs else 3
+
+    def expandLevels(self, scenarios, key, levels=None, name="{}-{}", attribute=None):
+        """Expand each scenario into one scenario per level.
+
+        The levels are given as list with key, globally or per scenario (e.g. the numbers of
+        concurrent clients). The expanded scenarios are named name.format(<name>, level) and have
+        the level set as attribute in their configuration.
+        """
+        expanded = []
+        for scenario in scenarios:
+            for runName, runConfig in scenario.items():
+                scenarioLevels = runConfig[key] if key in runConfig else levels
+                if scenarioLevels is None:
+                    expanded.append({runName: runConfig})
+                    continue
+                if not isinstance(scenarioLevels, list):
+                    scenarioLevels = [scenarioLevels]
+                for level in scenarioLevels:
+                    levelConfig = dict(runConfig)
+                    levelConfig[attribute or key] = level
+                    expanded.append({name.format(runName, level): levelConfig})
+        return expanded
+
     def getScenarioPathFunction(self, runName, runDirectory, runConfig):
         def scenarioPathFunction(key, default):
             basePath = runConfig[key] if key in runConfig else default
@@ -879,8 +1644,12 @@ class ScenarioReader:
         return scenarioPathFunction
 
 
-def main(scenarioPath, scenarioReader, runner):
-    """Start the BSQBM."""
+def main(scenarioPath, scenarioReader, runner, resume=False):
+    """Start the BSQBM.
+
+    With resume an existing result directory is continued: completed executions are skipped,
+    partial ones are cleaned and run again.
+    """
     def signal_handler(signal, frame):
         print('You pressed Ctrl+C!')
         logger.info("Terminated with Ctrl+C")
@@ -901,13 +1670,13 @@ def main(scenarioPath, scenarioReader, runner):
     generalConfig, scenarios = scenarioReader.readScenarios(
         docs, os.path.dirname(scenarioPath))
 
-    if os.path.exists(generalConfig["resultDirectory"]):
+    if os.path.exists(generalConfig["resultDirectory"]) and not resume:
         logger.error(
-            "The result directory ({}) already exists, please provide a new location".format(
-                generalConfig["resultDirectory"]))
+            "The result directory ({}) already exists, please provide a new location or use "
+            "--resume".format(generalConfig["resultDirectory"]))
         sys.exit(1)
 
-    os.makedirs(generalConfig["resultDirectory"])
+    os.makedirs(generalConfig["resultDirectory"], exist_ok=True)
 
     logfile = os.path.join(generalConfig["resultDirectory"], "scenario.log")
 
@@ -924,6 +1693,8 @@ def main(scenarioPath, scenarioReader, runner):
 
     logger.info("Use scenario configuration from: {}".format(scenarioPath))
 
+    runner.configure(generalConfig)
+    runner.resume = resume
     runner.addExecutionsToQueue(scenarios)
 
     with open(
@@ -944,9 +1715,10 @@ if __name__ == '__main__':
     ch.setLevel(logging.DEBUG)
     logger.addHandler(ch)
 
-    if (len(sys.argv) < 2):
-        logger.error("You need to specify a scenario")
-        sys.exit(1)
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument('scenario', type=str, help='The scenario description')
+    argparser.add_argument('--resume', action='store_true',
+                           help='Continue the scenario in an existing result directory')
+    args = argparser.parse_args()
 
-    scenarioPath = sys.argv[1]
-    main(scenarioPath, ScenarioReader(), BSQBMRunner())
+    main(args.scenario, ScenarioReader(), BSQBMRunner(), args.resume)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Distributions of the distance from HEAD of the revisions accessed in a random access benchmark.
+
+Each distribution draws size distances in [0, count), 0 being HEAD. Except for uniform, which draws
+without replacement, revisions can be drawn repeatedly. The distances are drawn from the given
+random.Random generator, so concurrent executions don't interleave their draws.
+"""
+
+import bisect
+import itertools
+import random
+
+
+def uniform(count, size, generator=random):
+    return generator.sample(range(count), size)
+
+
+def zipf(count, size, s=1.0, generator=random):
+    """Draw distances with P(d) proportional to 1 / (d + 1)^s.
+
+    The distances are drawn from the cumulative weights, which is exact for every s.
+    """
+    cumulative = list(itertools.accumulate(1 / (d + 1) ** s for d in range(count)))
+    total = cumulative[-1]
+    return [min(bisect.bisect_right(cumulative, generator.random() * total), count - 1)
+            for i in range(size)]
+
+
+def exponential(count, size, mean=None, generator=random):
+    """Draw recency weighted distances, exponentially distributed with mean.
+
+    The mean defaults to a tenth of count.
+    """
+    if mean is None:
+        mean = max(count / 10, 1)
+    distances = []
+    while len(distances) < size:
+        distance = int(generator.expovariate(1 / mean))
+        if distance < count:
+            distances.append(distance)
+    return distances
+
+
+def buckets(count, size, buckets=None, generator=random):
+    """Draw a bucket by its weight and a distance uniformly from the bucket.
+
+    buckets is a list of [from, to, weight], to is exclusive and can be None for the oldest
+    revision.
+    """
+    if buckets is None:
+        buckets = [[0, 10, 0.5], [10, 100, 0.3], [100, None, 0.2]]
+    ranges = []
+    weights = []
+    for low, high, weight in buckets:
+        high = count if high is None else min(high, count)
+        if low < high:
+            ranges.append((low, high))
+            weights.append(weight)
+    if not ranges:
+        raise ValueError("None of the buckets {} is within the {} revisions".format(buckets, count))
+    return [generator.randrange(*generator.choices(ranges, weights)[0]) for i in range(size)]
+
+
+def hotset(count, size, hot=10, probability=0.9, generator=random):
+    """Draw from a fixed set of hot revisions with probability, otherwise from all revisions."""
+    hotSet = generator.sample(range(count), min(hot, count))
+    return [generator.choice(hotSet) if generator.random() < probability
+            else generator.randrange(count)
+            for i in range(size)]
+
+
+distributions = {
+    'uniform': uniform,
+    'zipf': zipf,
+    'exponential': exponential,
+    'buckets': buckets,
+    'hotset': hotset
+}
+
+
+def sampleDistances(distribution, count, size, parameters=None, generator=random):
+    """Draw size distances from HEAD out of count revisions.
+
+    The named distribution is called with parameters.
+    """
+    if distribution not in distributions:
+        raise ValueError("Unknown distribution {}, expected one of {}".format(
+            distribution, ", ".join(sorted(distributions.keys()))))
+    return distributions[distribution](count, size, generator=generator, **(parameters or {}))
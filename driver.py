@@ -0,0 +1,651 @@
+#!/usr/bin/env python3
+"""A BSBM compatible load driver.
+
+The driver reads the query mixes and use case files of the BSBM tools (bsbmtools/queries/* and
+bsbmtools/usecases/*), takes the query parameters from the generated dataset and the update
+transactions from the update dataset. It writes the BSBM result XML and a run.log in the format
+of the Java testdriver, so the evaluation and verification scripts can be used unchanged.
+"""
+
+import os
+import re
+import sys
+import math
+import time
+import random
+import socket
+import asyncio
+import logging
+import argparse
+import datetime
+import urllib.parse
+from histogram import HistogramSet
+from steadystate import SteadyStateDetector
+
+logger = logging.getLogger('quit-eval.driver')
+
+BSBM_INSTANCES = "http://www4.wiwiss.fu-berlin.de/bizer/bsbm/v01/instances/"
+BSBM_VOCABULARY = "http://www4.wiwiss.fu-berlin.de/bizer/bsbm/v01/vocabulary/"
+RDF_TYPE = "<http://www.w3.org/1999/02/22-rdf-syntax-ns#type>"
+RDFS_LABEL = "<http://www.w3.org/2000/01/rdf-schema#label>"
+
+triplePattern = re.compile(r'^(\S+)\s+(\S+)\s+(.*?)\s*\.\s*$')
+placeholderPattern = re.compile(r'%([A-Za-z0-9_]+)%')
+productPattern = re.compile(r'/Product[0-9]+>$')
+reviewPattern = re.compile(r'/Review[0-9]+>$')
+offerPattern = re.compile(r'/Offer[0-9]+>$')
+
+accept = {
+    "Select": "application/sparql-results+xml",
+    "Construct": "application/n-triples",
+    "Describe": "application/n-triples",
+    "Update": "*/*"
+}
+
+
+class QueryTemplate:
+    """A query of a query mix with its type and the types of its parameters."""
+
+    def __init__(self, nr, text, queryType, parameters):
+        self.nr = nr
+        self.text = text
+        self.queryType = queryType
+        self.parameters = parameters
+
+    @classmethod
+    def read(cls, directory, number, nr):
+        with open(os.path.join(directory, "query{}.txt".format(number)), "r") as queryFile:
+            text = queryFile.read()
+        queryType = "Select"
+        parameters = {}
+        with open(os.path.join(directory, "query{}desc.txt".format(number)), "r") as descFile:
+            for line in descFile:
+                line = line.strip()
+                if "=" not in line:
+                    continue
+                key, value = line.split("=", 1)
+                if key == "QueryType":
+                    queryType = value
+                else:
+                    parameters[key] = value
+        return cls(nr, text, queryType, parameters)
+
+
+def readQueryMix(directory, offset=0):
+    """Read a query mix directory.
+
+    Return the sequence of (global) query numbers and the templates by number. The query numbers
+    are offset by the number of queries of the previous mixes, as the testdriver does it for use
+    cases.
+    """
+    with open(os.path.join(directory, "querymix.txt"), "r") as mixFile:
+        numbers = [int(number) for number in mixFile.read().split()]
+    ignored = set()
+    ignorePath = os.path.join(directory, "ignoreQueries.txt")
+    if os.path.exists(ignorePath):
+        with open(ignorePath, "r") as ignoreFile:
+            ignored = set(int(number) for number in ignoreFile.read().split())
+    templates = {}
+    for number in set(numbers) - ignored:
+        templates[offset + number] = QueryTemplate.read(directory, number, offset + number)
+    mix = [offset + number for number in numbers if number not in ignored]
+    return mix, templates, offset + max(numbers)
+
+
+def readUseCase(path, baseDirectory='.'):
+    """Read a use case file, which lists querymix=<directory> lines, and concatenate its mixes."""
+    mix = []
+    templates = {}
+    offset = 0
+    with open(path, "r") as useCaseFile:
+        for line in useCaseFile:
+            line = line.strip()
+            if not line.startswith("querymix="):
+                continue
+            directory = os.path.join(baseDirectory, line.split("=", 1)[1])
+            partMix, partTemplates, offset = readQueryMix(directory, offset)
+            mix += partMix
+            templates.update(partTemplates)
+    return mix, templates
+
+
+class ParameterPool:
+    """Parameter values taken from the generated dataset.
+
+    Parameters of a query are correlated by a product, as the testdriver does it: the product
+    type and product features of a query belong to the same product, so the queries have results.
+    Offers deleted by update queries are drawn without replacement.
+    """
+
+    def __init__(self, seed):
+        self.random = random.Random(seed)
+        self.products = {}
+        self.productLabels = {}
+        self.reviews = []
+        self.offers = []
+        self.deletableOffers = []
+        self.countries = set()
+        self.currentDate = None
+        self.words = []
+        self.transactions = []
+        self.transaction = 0
+
+    def readDataset(self, path):
+        countryPredicate = "<{}country>".format(BSBM_VOCABULARY)
+        featurePredicate = "<{}productFeature>".format(BSBM_VOCABULARY)
+        validFromPredicate = "<{}validFrom>".format(BSBM_VOCABULARY)
+        productTypePrefix = "<{}ProductType".format(BSBM_INSTANCES)
+        reviews = set()
+        offers = set()
+        with open(path, "r") as dataset:
+            for line in dataset:
+                match = triplePattern.match(line)
+                if not match:
+                    continue
+                subject, predicate, obj = match.groups()
+                if productPattern.search(subject):
+                    product = self.products.setdefault(subject, ([], []))
+                    if predicate == RDF_TYPE and obj.startswith(productTypePrefix):
+                        product[0].append(obj)
+                    elif predicate == featurePredicate:
+                        product[1].append(obj)
+                    elif predicate == RDFS_LABEL:
+                        self.productLabels[subject] = obj
+                elif reviewPattern.search(subject):
+                    reviews.add(subject)
+                elif offerPattern.search(subject):
+                    offers.add(subject)
+                    if predicate == validFromPredicate and (
+                            self.currentDate is None or obj > self.currentDate):
+                        self.currentDate = obj
+                if predicate == countryPredicate:
+                    self.countries.add(obj)
+        self.reviews = sorted(reviews)
+        self.offers = sorted(offers)
+        self.deletableOffers = list(self.offers)
+        self.countries = sorted(self.countries)
+        words = set()
+        for label in self.productLabels.values():
+            text = label.split('"')[1] if '"' in label else label
+            words.update(re.findall(r'[A-Za-z]{3,}', text))
+        self.words = sorted(words)
+        self.productList = sorted(product for product, (types, features) in self.products.items()
+                                  if types and features)
+        logger.info("Read {} products, {} reviews and {} offers from {}".format(
+            len(self.productList), len(self.reviews), len(self.offers), path))
+
+    def readUpdateDataset(self, path, transactionSize=50):
+        """Read the update transactions, separated by #__SEP__ lines or of transactionSize lines."""
+        transaction = []
+        separated = False
+        with open(path, "r") as updateDataset:
+            for line in updateDataset:
+                if line.startswith("#"):
+                    separated = True
+                    if transaction:
+                        self.transactions.append("".join(transaction))
+                    transaction = []
+                    continue
+                if line.strip():
+                    transaction.append(line)
+                if not separated and len(transaction) >= transactionSize:
+                    self.transactions.append("".join(transaction))
+                    transaction = []
+        if transaction:
+            self.transactions.append("".join(transaction))
+
+    def nextTransaction(self):
+        if not self.transactions:
+            raise Exception("There is no update dataset to take UpdateTransactionData from")
+        transaction = self.transactions[self.transaction % len(self.transactions)]
+        self.transaction += 1
+        return transaction
+
+    def takeOffer(self):
+        if not self.deletableOffers:
+            self.deletableOffers = list(self.offers)
+        index = self.random.randrange(len(self.deletableOffers))
+        self.deletableOffers[index], self.deletableOffers[-1] = (
+            self.deletableOffers[-1], self.deletableOffers[index])
+        return self.deletableOffers.pop()
+
+    def getParameters(self, template):
+        """Get the values of all parameters of a query template."""
+        product = self.random.choice(self.productList)
+        types, features = self.products[product]
+        unusedFeatures = list(features)
+        self.random.shuffle(unusedFeatures)
+        values = {}
+        for name, parameterType in template.parameters.items():
+            if parameterType == "ProductURI":
+                values[name] = product
+            elif parameterType == "ProductTypeURI":
+                values[name] = self.random.choice(types)
+            elif parameterType == "ProductFeatureURI":
+                if unusedFeatures:
+                    values[name] = unusedFeatures.pop()
+                else:
+                    values[name] = self.random.choice(features)
+            elif parameterType == "ProductPropertyNumericValue":
+                values[name] = str(self.random.randint(1, 500))
+            elif parameterType == "Dictionary1":
+                values[name] = self.random.choice(self.words)
+            elif parameterType == "CurrentDate":
+                values[name] = self.currentDate
+            elif parameterType == "ReviewURI":
+                values[name] = self.random.choice(self.reviews)
+            elif parameterType == "CountryURI":
+                values[name] = self.random.choice(self.countries)
+            elif parameterType == "OfferURI":
+                if template.queryType == "Update":
+                    values[name] = self.takeOffer()
+                else:
+                    values[name] = self.random.choice(self.offers)
+            elif parameterType == "UpdateTransactionData":
+                values[name] = self.nextTransaction()
+            else:
+                raise Exception("Unknown parameter type {} of {}".format(parameterType, name))
+        return values
+
+    def instantiate(self, template):
+        values = self.getParameters(template)
+        return placeholderPattern.sub(lambda match: values.get(match.group(1), match.group(0)),
+                                      template.text)
+
+
+class HttpConnection:
+    """A minimal HTTP/1.1 client on asyncio streams, keeping its connection alive."""
+
+    def __init__(self, url):
+        self.url = urllib.parse.urlsplit(url)
+        self.reader = None
+        self.writer = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(
+            self.url.hostname, self.url.port or 80)
+        self.writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = None
+        self.writer = None
+
+    async def post(self, form, acceptType):
+        """Post the form and return the status and the body of the response."""
+        if self.writer is None:
+            await self.connect()
+        body = urllib.parse.urlencode(form).encode()
+        path = self.url.path or "/"
+        if self.url.query:
+            path += "?" + self.url.query
+        request = ("POST {} HTTP/1.1\r\nHost: {}\r\nAccept: {}\r\n"
+                   "Content-Type: application/x-www-form-urlencoded\r\n"
+                   "Content-Length: {}\r\n\r\n").format(
+            path, self.url.netloc, acceptType, len(body)).encode()
+        self.writer.write(request + body)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, value = line.decode("latin-1").split(":", 1)
+            headers[key.strip().lower()] = value.strip()
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await self.reader.readline()
+                    break
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readline()
+            content = b"".join(chunks)
+        elif "content-length" in headers:
+            content = await self.reader.readexactly(int(headers["content-length"]))
+        else:
+            content = await self.reader.read()
+            self.close()
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        return status, content
+
+
+def countResults(queryType, content):
+    if queryType == "Select":
+        return content.count(b"<result>") + content.count(b"<result ")
+    if queryType in ("Construct", "Describe"):
+        return sum(1 for line in content.splitlines()
+                   if line.strip() and not line.startswith((b"@", b"#")))
+    return 0
+
+
+class QueryStatistics:
+
+    def __init__(self):
+        self.times = []
+        self.results = []
+        self.timeouts = 0
+
+
+class Driver:
+    """Run warmup and measured query mix runs with a number of concurrent clients.
+
+    With a rate the measured runs are open-loop: the queries of all runs are sent on a fixed or
+    poisson schedule, independent of the completion of earlier queries, and their latency is
+    measured from the intended send time.
+    With a steady state detector instead of a fixed number of warmups, warmup runs are executed
+    until the runtime of the query mixes is stable, at most maxWarmups.
+    """
+
+    def __init__(self, endpoint, updateEndpoint, mix, templates, parameters, runs, warmups,
+                 clients=1, timeout=None, runLog=None, latencyLog=None, rate=None, arrival='fixed',
+                 maxInFlight=256, histograms=None, steadyState=None, maxWarmups=100,
+                 defaultGraph=None):
+        self.endpoint = endpoint
+        self.updateEndpoint = updateEndpoint or endpoint
+        self.mix = mix
+        self.templates = templates
+        self.parameters = parameters
+        self.runs = runs
+        self.warmups = warmups
+        self.clients = clients
+        self.timeout = timeout
+        self.runLog = runLog
+        self.latencyLog = latencyLog
+        self.statistics = {nr: QueryStatistics() for nr in templates}
+        self.rate = rate
+        self.arrival = arrival
+        self.maxInFlight = maxInFlight
+        self.histograms = histograms
+        self.steadyState = steadyState
+        self.maxWarmups = maxWarmups
+        self.defaultGraph = defaultGraph
+        self.mixTimes = []
+        self.completedRuns = 0
+        self.nextRun = 0
+
+    def log(self, message):
+        if self.runLog is None:
+            return
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S,%f")[:-3]
+        self.runLog.write("{} INFO  {}\n".format(timestamp, message))
+
+    async def executeQuery(self, connections, template, run, client, measured, intended=None):
+        query = self.parameters.instantiate(template)
+        if template.queryType == "Update":
+            connection = connections[1]
+            form = {"update": query}
+        else:
+            connection = connections[0]
+            form = {"query": query}
+            if self.defaultGraph is not None:
+                form["default-graph-uri"] = self.defaultGraph
+        start = time.perf_counter()
+        startTime = time.time()
+        timedOut = False
+        try:
+            status, content = await asyncio.wait_for(
+                connection.post(form, accept[template.queryType]), self.timeout)
+        except asyncio.TimeoutError:
+            connection.close()
+            timedOut = True
+            status, content = None, b""
+        except (OSError, ValueError, IndexError, asyncio.IncompleteReadError) as exc:
+            connection.close()
+            logger.error("Query {} failed: {}".format(template.nr, exc))
+            status, content = None, b""
+        if intended is not None:
+            seconds = time.monotonic() - intended
+        else:
+            seconds = time.perf_counter() - start
+        results = countResults(template.queryType, content)
+        if status is not None and status >= 400:
+            logger.error("Query {} failed with status {}".format(template.nr, status))
+        self.log("[Client {}] Query {} of run {} has been executed in {:.6f} seconds.".format(
+            client, template.nr, run, seconds))
+        if self.runLog is not None:
+            self.runLog.write("\nQuery string:\n\n{}\n\n".format(query))
+            if timedOut:
+                self.runLog.write("Query results: timeout\n\n")
+            else:
+                self.runLog.write("Query results ({} results)\n\n".format(results))
+        if self.latencyLog is not None:
+            self.latencyLog.write("{:.6f}\t{}\t{}\t{}\t{}\t{:.6f}\t{}\t{}\n".format(
+                startTime, client, run, int(measured), template.nr, seconds, status, results))
+        if measured:
+            statistics = self.statistics[template.nr]
+            if timedOut:
+                statistics.timeouts += 1
+            else:
+                statistics.times.append(seconds)
+                statistics.results.append(results)
+                if self.histograms is not None:
+                    self.histograms.recordSeconds("query{}".format(template.nr), seconds)
+
+    async def client(self, client, runs, measured, detector=None):
+        connections = (HttpConnection(self.endpoint), HttpConnection(self.updateEndpoint))
+        try:
+            while self.nextRun < runs and not (detector is not None and detector.steady):
+                run = self.nextRun
+                self.nextRun += 1
+                start = time.perf_counter()
+                for nr in self.mix:
+                    await self.executeQuery(connections, self.templates[nr], run, client, measured)
+                if measured:
+                    self.mixTimes.append(time.perf_counter() - start)
+                    self.completedRuns += 1
+                elif detector is not None:
+                    detector.add(time.perf_counter() - start)
+        finally:
+            for connection in connections:
+                connection.close()
+
+    async def phase(self, runs, measured, detector=None):
+        self.nextRun = 0
+        await asyncio.gather(*[self.client(client, runs, measured, detector)
+                               for client in range(self.clients)])
+
+    def getSchedule(self, count):
+        """Get the intended send times of count queries in seconds after the start."""
+        if self.arrival == 'poisson':
+            schedule = []
+            offset = 0
+            for i in range(count):
+                schedule.append(offset)
+                offset += self.parameters.random.expovariate(self.rate)
+            return schedule
+        return [i / self.rate for i in range(count)]
+
+    async def openLoop(self, runs):
+        idle = []
+        inFlight = asyncio.Semaphore(self.maxInFlight)
+
+        async def issue(run, nr, intended):
+            # waiting for a free slot counts as latency, since the query is late
+            async with inFlight:
+                connections = idle.pop() if idle else (
+                    HttpConnection(self.endpoint), HttpConnection(self.updateEndpoint))
+                try:
+                    await self.executeQuery(connections, self.templates[nr], run, 0, True, intended)
+                finally:
+                    idle.append(connections)
+
+        sequence = [(run, nr) for run in range(runs) for nr in self.mix]
+        begin = time.monotonic()
+        tasks = []
+        for offset, (run, nr) in zip(self.getSchedule(len(sequence)), sequence):
+            delay = begin + offset - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.ensure_future(issue(run, nr, begin + offset)))
+        await asyncio.gather(*tasks)
+        self.completedRuns += runs
+        for connections in idle:
+            for connection in connections:
+                connection.close()
+
+    async def run(self):
+        if self.steadyState is not None:
+            logger.info("Start warmup runs until steady state, at most {}".format(self.maxWarmups))
+            await self.phase(self.maxWarmups, False, self.steadyState)
+            self.warmups = self.nextRun
+            if self.steadyState.steady:
+                logger.info("Steady state detected after {} warmup runs".format(self.warmups))
+            else:
+                logger.warning("No steady state detected after {} warmup runs".format(self.warmups))
+        elif self.warmups > 0:
+            logger.info("Start {} warmup runs".format(self.warmups))
+            await self.phase(self.warmups, False)
+        start = time.perf_counter()
+        if self.rate is not None:
+            logger.info("Start {} measured open-loop runs at {} queries per second".format(
+                self.runs, self.rate))
+            await self.openLoop(self.runs)
+        else:
+            logger.info("Start {} measured runs with {} clients".format(self.runs, self.clients))
+            await self.phase(self.runs, True)
+        self.elapsed = time.perf_counter() - start
+
+    def writeResult(self, path, seed):
+        def geometricMean(values):
+            values = [value for value in values if value > 0]
+            if not values:
+                return 0
+            return math.exp(sum(math.log(value) for value in values) / len(values))
+
+        with open(path, "w") as result:
+            result.write('<?xml version="1.0"?>\n<bsbm>\n  <querymix>\n')
+            result.write("     <scalefactor>{}</scalefactor>\n".format(
+                len(self.parameters.productList)))
+            result.write("     <warmups>{}</warmups>\n".format(self.warmups))
+            if self.steadyState is not None:
+                result.write("     <steadystate>{}</steadystate>\n".format(
+                    "true" if self.steadyState.steady else "false"))
+            result.write("     <seed>{}</seed>\n".format(seed))
+            result.write("     <querymixruns>{}</querymixruns>\n".format(self.completedRuns))
+            # the open-loop mode doesn't run whole query mixes, so it has no query mix runtimes
+            if self.mixTimes:
+                result.write("     <minquerymixruntime>{:.4f}</minquerymixruntime>\n".format(
+                    min(self.mixTimes)))
+                result.write("     <maxquerymixruntime>{:.4f}</maxquerymixruntime>\n".format(
+                    max(self.mixTimes)))
+            result.write("     <elapsedruntime>{:.3f}</elapsedruntime>\n".format(self.elapsed))
+            result.write("     <qmph>{:.3f}</qmph>\n".format(
+                self.completedRuns * 3600 / self.elapsed if self.elapsed else 0))
+            if self.mixTimes:
+                result.write("     <cqet>{:.5f}</cqet>\n".format(
+                    sum(self.mixTimes) / len(self.mixTimes)))
+                result.write("     <cqetg>{:.5f}</cqetg>\n".format(geometricMean(self.mixTimes)))
+            result.write("  </querymix>\n  <queries>\n")
+            for nr in sorted(self.statistics.keys()):
+                statistics = self.statistics[nr]
+                result.write('    <query nr="{}">\n'.format(nr))
+                times = statistics.times
+                result.write("      <executecount>{}</executecount>\n".format(len(times)))
+                if times:
+                    total = sum(times)
+                    result.write("      <aqet>{:.6f}</aqet>\n".format(total / len(times)))
+                    result.write("      <aqetg>{:.6f}</aqetg>\n".format(geometricMean(times)))
+                    result.write("      <qps>{:.2f}</qps>\n".format(
+                        len(times) / total if total else 0))
+                    result.write("      <minqet>{:.8f}</minqet>\n".format(min(statistics.times)))
+                    result.write("      <maxqet>{:.8f}</maxqet>\n".format(max(statistics.times)))
+                    result.write("      <avgresults>{:.2f}</avgresults>\n".format(
+                        sum(statistics.results) / len(statistics.results)))
+                    result.write("      <minresults>{}</minresults>\n".format(
+                        min(statistics.results)))
+                    result.write("      <maxresults>{}</maxresults>\n".format(
+                        max(statistics.results)))
+                    result.write("      <timeouts>{}</timeouts>\n".format(statistics.timeouts))
+                result.write("    </query>\n")
+            result.write("  </queries>\n</bsbm>\n")
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(
+        description='A BSBM compatible load driver, accepting the options of the testdriver')
+    argparser.add_argument('endpoint', type=str, help='The SPARQL query endpoint')
+    argparser.add_argument('-runs', type=int, default=50,
+                           help='The number of measured query mix runs')
+    argparser.add_argument('-w', type=str, default='10',
+                           help='The number of warmup query mix runs or auto to detect the steady '
+                                'state')
+    argparser.add_argument('-steadywindow', type=int, default=5,
+                           help='The number of query mixes, which have to be stable with -w auto')
+    argparser.add_argument('-steadythreshold', type=float, default=0.1,
+                           help='The maximum relative variation of stable query mix runtimes with '
+                                '-w auto')
+    argparser.add_argument('-maxwarmup', type=int, default=100,
+                           help='The maximum number of warmup query mix runs with -w auto')
+    argparser.add_argument('-dg', type=str, default=None,
+                           help='The default graph, sent as default-graph-uri with the queries')
+    argparser.add_argument('-o', type=str, default='benchmark_result.xml', help='The result XML')
+    argparser.add_argument('-ucf', type=str, default=None, help='The use case file')
+    argparser.add_argument('-idir', type=str, default='queries/quit.explore',
+                           help='The query mix directory, if no use case is given')
+    argparser.add_argument('-u', type=str, default=None, help='The SPARQL update endpoint')
+    argparser.add_argument('-udataset', type=str, default=None, help='The update dataset')
+    argparser.add_argument('-dataset', type=str, default='dataset.nt',
+                           help='The generated dataset to take parameters from')
+    argparser.add_argument('-mt', type=int, default=1, help='The number of concurrent clients')
+    argparser.add_argument('-seed', type=int, default=808080)
+    argparser.add_argument('-t', type=int, default=None, help='The query timeout in milliseconds')
+    argparser.add_argument('-runlog', type=str, default='run.log')
+    argparser.add_argument('-latencylog', type=str, default=None,
+                           help='Write the latency of every request to this file')
+    argparser.add_argument('-rate', type=float, default=None,
+                           help='Send the measured queries open-loop at this rate per second')
+    argparser.add_argument('-arrival', type=str, default='fixed', choices=['fixed', 'poisson'])
+    argparser.add_argument('-maxinflight', type=int, default=256,
+                           help='The maximum number of concurrent queries in the open-loop mode')
+    argparser.add_argument('-histograms', type=str, default=None,
+                           help='Write latency histograms per query to this file')
+    args = argparser.parse_args()
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if args.ucf is not None:
+        mix, templates = readUseCase(args.ucf)
+    else:
+        mix, templates, size = readQueryMix(args.idir)
+
+    parameters = ParameterPool(args.seed)
+    parameters.readDataset(args.dataset)
+    if args.udataset is not None:
+        parameters.readUpdateDataset(args.udataset)
+
+    runLog = open(args.runlog, "w")
+    latencyLog = None
+    if args.latencylog is not None:
+        latencyLog = open(args.latencylog, "w")
+        latencyLog.write("start\tclient\trun\tmeasured\tquery\tseconds\tstatus\tresults\n")
+
+    histograms = None
+    if args.histograms is not None:
+        histograms = HistogramSet({"rate": args.rate, "arrival": args.arrival, "clients": args.mt})
+
+    steadyState = None
+    warmups = 0
+    if args.w == 'auto':
+        steadyState = SteadyStateDetector(args.steadywindow, args.steadythreshold)
+    else:
+        warmups = int(args.w)
+
+    driver = Driver(args.endpoint, args.u, mix, templates, parameters, args.runs, warmups, args.mt,
+                    args.t / 1000 if args.t else None, runLog, latencyLog, args.rate, args.arrival,
+                    args.maxinflight, histograms, steadyState, args.maxwarmup, args.dg)
+    try:
+        asyncio.run(driver.run())
+        driver.writeResult(args.o, args.seed)
+        if histograms is not None:
+            histograms.write(args.histograms)
+    finally:
+        runLog.close()
+        if latencyLog is not None:
+            latencyLog.close()
+    sys.exit(0)
@@ -6,6 +6,7 @@ import re
 import itertools
 import collections
 import math
+import bisect
 
 import argparse
 import git
@@ -14,7 +15,10 @@ import datetime
 
 from jinja2 import Template
 
-from bsqbm import ScenarioReader
+from bsqbm import ScenarioReader, MonitorThread
+from evaluator import QueryLogExecuter, RandomAccessExecuter
+from histogram import HistogramSet
+from steadystate import detectSteadyState
 
 import os
 
@@ -42,6 +46,11 @@ colors = ["#FF4A46", "#008941", "#006FA6", "#A30059", "#FFDBE5", "#7A4900", "#00
           "#8FB0FF", "#997D87", "#5A0007", "#809693", "#FEFFE6", "#1B4400", "#4FC601", "#3B5DFF"]
 
 runPattern = re.compile('quit-(?P<setup>[^⁻]*)?(?P<number>-[0-9]*)$')
+clientsPattern = re.compile('^(?P<setup>.*)-c(?P<clients>[0-9]+)$')
+ratePattern = re.compile('^(?P<setup>.*)-r(?P<rate>[0-9.]+)$')
+batchPattern = re.compile('^(?P<setup>.*)-b(?P<batch>[0-9]+)$')
+queryTimePattern = re.compile(
+    'Query [0-9]+ of run (?P<run>-?[0-9]+) has been executed in (?P<seconds>[0-9.]+) seconds')
 
 
 def findRuns(directory):
@@ -344,6 +353,305 @@ def getAQET(directory):
             bsbm_plot.write(template.render(bsbm_data))
 
 
+def getStoreCpu(logDirectory):
+    """
+    Get the average number of cores used by the store during a run from its resource logs.
+
+    For containers the cgroup cpu time is used, otherwise the cpu times of all processes of the
+    store.
+    """
+    with open(os.path.join(logDirectory, "resources-mem.log"), "r") as memlogFile:
+        header = memlogFile.readline().split()
+        lines = [line.split() for line in memlogFile if line.strip()]
+    if len(lines) < 2:
+        return float("nan")
+    duration = float(lines[-1][0]) - float(lines[0][0])
+    if duration <= 0:
+        return float("nan")
+    if "cgcpu" in header:
+        column = header.index("cgcpu")
+        values = [float(line[column]) for line in lines if line[column] != "NaN"]
+        if values:
+            return (values[-1] - values[0]) / duration
+    cpu = {}
+    workerlogName = os.path.join(logDirectory, "resources-workers.log")
+    if not os.path.exists(workerlogName):
+        return float("nan")
+    with open(workerlogName, "r") as workerlogFile:
+        workerHeader = workerlogFile.readline().split()
+        pid = workerHeader.index("pid")
+        utime = workerHeader.index("utime")
+        stime = workerHeader.index("stime")
+        for line in workerlogFile:
+            values = line.split()
+            # the cpu times only grow, so the last sample of each process is its total
+            cpu[values[pid]] = float(values[utime]) + float(values[stime])
+    return sum(cpu.values()) / duration
+
+
+def getClientScaling(directory):
+    """
+    Collect QMpH, the average execution time per query and the store cpu usage by the number of
+    concurrent clients of each setup and write a throughput-vs-clients curve.
+    """
+    runs = findRuns(directory)
+
+    levels = {}
+    for runName, runProperties in runs.items():
+        match = clientsPattern.match(runProperties["setup"])
+        if not match:
+            continue
+        logDirectory = os.path.join(directory, runName, "logs")
+        e = xml.etree.ElementTree.parse(os.path.join(logDirectory, runName + ".xml")).getroot()
+        level = levels.setdefault(match.group("setup"), {}).setdefault(
+            int(match.group("clients")), {"qmph": [], "cpu": [], "queries": {}})
+        level["qmph"].append(float(e.find('querymix').find('qmph').text))
+        level["cpu"].append(getStoreCpu(logDirectory))
+        for qu in e.find('queries').findall('query'):
+            if qu.find('aqet') is not None:
+                level["queries"].setdefault(int(qu.get('nr')), []).append(
+                    float(qu.find('aqet').text))
+
+    def meanAndDeviation(values):
+        values = [value for value in values if not math.isnan(value)]
+        if not values:
+            return float("nan"), float("nan")
+        avg = sum(values) / len(values)
+        return avg, math.sqrt(sum((value - avg) * (value - avg) for value in values) / len(values))
+
+    bsbm_clients_dat = ""
+    bsbm_data = {
+        "file_clients": 'bsbm_clients.dat',
+        "scenarios": []
+    }
+    for index, (setup, setupLevels) in enumerate(sorted(levels.items())):
+        bsbm_clients_dat += "# \"{}\"\n".format(setup)
+        bsbm_clients_dat += "# clients qmph qmph_sd cpu cpu_sd {}\n".format(
+            " ".join("aqet{}".format(id) for id in queryLabels.keys()))
+        for clients, level in sorted(setupLevels.items()):
+            bsbm_clients_dat += "{} {} {} {} {}".format(
+                clients, *meanAndDeviation(level["qmph"]), *meanAndDeviation(level["cpu"]))
+            for id in queryLabels.keys():
+                bsbm_clients_dat += " {}".format(meanAndDeviation(level["queries"].get(id, []))[0])
+            bsbm_clients_dat += "\n"
+        bsbm_clients_dat += "\n\n"
+        bsbm_data["scenarios"].append(
+            {"setup": setup, "index": index, "color": colors[index % len(colors)]})
+
+    print(bsbm_clients_dat)
+
+    with open(os.path.join(directory, "bsbm_clients.dat"), "w") as bsbm_clients_dat_file:
+        bsbm_clients_dat_file.write(bsbm_clients_dat)
+
+    with open(os.path.join(basedir, "stuff", 'bsbm_clients.plot.tpl'), "r") as bsbm_tpl:
+        template = Template(bsbm_tpl.read())
+        with open(os.path.join(directory, "bsbm_clients.plot"), "w") as bsbm_plot:
+            bsbm_plot.write(template.render(bsbm_data))
+
+
+def getOpenLoop(directory, slo=None, percentile=99):
+    """
+    Merge the latency histograms of the open-loop runs by setup and rate and write the latency
+    percentiles per rate. With an SLO (in milliseconds) the highest rate is reported, up to which
+    the percentile of all rates stays within the SLO.
+    """
+    runs = findRuns(directory)
+    percentiles = [50, 90, 99, 99.9]
+
+    levels = {}
+    for runName, runProperties in runs.items():
+        match = ratePattern.match(runProperties["setup"])
+        if not match:
+            continue
+        merged = levels.setdefault(match.group("setup"), {}).setdefault(
+            float(match.group("rate")), HistogramSet())
+        for fileName in glob.glob(os.path.join(directory, runName, "logs", "*histograms.json")):
+            merged.merge(HistogramSet.read(fileName))
+
+    openloop_dat = ""
+    for setup, setupLevels in sorted(levels.items()):
+        sustainable = None
+        withinSlo = True
+        openloop_dat += "# \"{}\"\n".format(setup)
+        openloop_dat += "# rate count mean {} max (milliseconds)\n".format(
+            " ".join("p{}".format(p) for p in percentiles))
+        for rate, histograms in sorted(setupLevels.items()):
+            total = histograms.total()
+            openloop_dat += "{} {} {} {} {}\n".format(
+                rate, total.total, total.mean() / 1000,
+                " ".join(str(total.percentile(p) / 1000) for p in percentiles),
+                (total.maximum or 0) / 1000)
+            if slo is not None and withinSlo:
+                if total.percentile(percentile) / 1000 <= slo:
+                    sustainable = rate
+                else:
+                    withinSlo = False
+        if slo is not None:
+            if sustainable is not None:
+                print("{}: sustainable rate at p{} <= {}ms is {}/s".format(
+                    setup, percentile, slo, sustainable))
+                openloop_dat += "# sustainable rate at p{} <= {}ms: {}\n".format(
+                    percentile, slo, sustainable)
+            else:
+                print("{}: no rate keeps p{} <= {}ms".format(setup, percentile, slo))
+        openloop_dat += "\n\n"
+
+    print(openloop_dat)
+
+    with open(os.path.join(directory, "openloop.dat"), "w") as openloop_dat_file:
+        openloop_dat_file.write(openloop_dat)
+
+
+def getMixRuntimes(runlogName):
+    """
+    Get the runtime of each query mix, warmup and measured, from the run log of a (single client)
+    run.
+    """
+    mixTimes = []
+    lastRun = None
+    with open(runlogName, "r") as runlogFile:
+        for line in runlogFile:
+            match = queryTimePattern.search(line)
+            if not match:
+                continue
+            if match.group("run") != lastRun:
+                mixTimes.append(0)
+                lastRun = match.group("run")
+            mixTimes[-1] += float(match.group("seconds"))
+    return mixTimes
+
+
+def getSteadyState(directory, window=5, threshold=0.1):
+    """
+    Detect the steady state of each run from the runtime of its query mixes and report it next to
+    the number of warmup runs, which were used.
+    """
+    runs = findRuns(directory)
+
+    steadystate_dat = "# run mixes warmups detected\n"
+    for runName in sorted(runs.keys()):
+        logDirectory = os.path.join(directory, runName, "logs")
+        runlogName = os.path.join(logDirectory, runName + "-run.log")
+        if not os.path.exists(runlogName):
+            continue
+        mixTimes = getMixRuntimes(runlogName)
+        warmups = "NaN"
+        try:
+            e = xml.etree.ElementTree.parse(os.path.join(logDirectory, runName + ".xml")).getroot()
+            warmups = e.find('querymix').find('warmups').text
+        except (OSError, xml.etree.ElementTree.ParseError, AttributeError):
+            pass
+        detected = detectSteadyState(mixTimes, window, threshold)
+        steadystate_dat += "\"{}\" {} {} {}\n".format(
+            runName, len(mixTimes), warmups, detected if detected is not None else "NaN")
+
+    print(steadystate_dat)
+
+    with open(os.path.join(directory, "steadystate.dat"), "w") as steadystate_dat_file:
+        steadystate_dat_file.write(steadystate_dat)
+
+
+def readLogLine(line, columns):
+    """Get the values of a line of an executer log by column name or None for older layouts."""
+    fields = line.split()
+    if len(fields) != len(columns):
+        return None
+    return dict(zip(columns, fields))
+
+
+def getBatching(directory):
+    """
+    Collect the cost per request and per operation of the query log executions by the batch size of
+    each setup and write a throughput-vs-batch-size curve.
+    """
+    runs = findRuns(directory)
+
+    levels = {}
+    for runName, runProperties in runs.items():
+        match = batchPattern.match(runProperties["setup"])
+        if not match:
+            continue
+        executionLogName = os.path.join(directory, runName, "logs", "execution.log")
+        if not os.path.exists(executionLogName):
+            continue
+        level = levels.setdefault(match.group("setup"), {}).setdefault(
+            int(match.group("batch")), {"requests": 0, "operations": 0, "seconds": 0.0})
+        with open(executionLogName, "r") as executionLog:
+            for line in executionLog:
+                fields = readLogLine(line, QueryLogExecuter.logColumns)
+                if fields is None or fields["status"] == "NaN":
+                    continue
+                level["requests"] += 1
+                level["operations"] += int(fields["operations"])
+                level["seconds"] += int(fields["operations"]) * float(
+                    fields["seconds_per_operation"])
+
+    batching_dat = ("# batch requests operations seconds_per_request seconds_per_operation "
+                    "operations_per_second\n")
+    for setup, setupLevels in sorted(levels.items()):
+        batching_dat += "# \"{}\"\n".format(setup)
+        for batch, level in sorted(setupLevels.items()):
+            if level["requests"] == 0:
+                continue
+            batching_dat += "{} {} {} {} {} {}\n".format(
+                batch, level["requests"], level["operations"], level["seconds"] / level["requests"],
+                level["seconds"] / level["operations"], level["operations"] / level["seconds"])
+        batching_dat += "\n\n"
+
+    print(batching_dat)
+
+    with open(os.path.join(directory, "batching.dat"), "w") as batching_dat_file:
+        batching_dat_file.write(batching_dat)
+
+
+def getRevisionAge(directory):
+    """
+    Collect the random access latency by the distance of the accessed revision from HEAD, in
+    buckets of powers of two, and compare the latency of the first access of a revision to repeated
+    accesses.
+    """
+    runs = findRuns(directory)
+
+    age_dat = "# run bucket from to queries mean_seconds\n"
+    repeated_dat = "# run first_queries first_mean_seconds repeated_queries repeated_mean_seconds\n"
+    for runName in sorted(runs.keys()):
+        for logName in sorted(glob.glob(os.path.join(directory, runName, "logs", "ra-*.log"))):
+            buckets = collections.defaultdict(list)
+            seen = set()
+            first = []
+            repeated = []
+            with open(logName, "r") as raLog:
+                for line in raLog:
+                    # older logs have no distance
+                    fields = readLogLine(line, RandomAccessExecuter.logColumns)
+                    if fields is None or fields["seconds"] == "nan" or fields["status"] == "NaN":
+                        continue
+                    seconds = float(fields["seconds"])
+                    buckets[int(fields["distance"]).bit_length()].append(seconds)
+                    if fields["revision"] in seen:
+                        repeated.append(seconds)
+                    else:
+                        seen.add(fields["revision"])
+                        first.append(seconds)
+            for bucket in sorted(buckets.keys()):
+                times = buckets[bucket]
+                low = 0 if bucket == 0 else 2 ** (bucket - 1)
+                age_dat += "\"{}\" {} {} {} {} {}\n".format(
+                    runName, bucket, low, 2 ** bucket - 1, len(times), sum(times) / len(times))
+            if first:
+                repeated_dat += "\"{}\" {} {} {} {}\n".format(
+                    runName, len(first), sum(first) / len(first), len(repeated),
+                    sum(repeated) / len(repeated) if repeated else "NaN")
+
+    print(age_dat)
+    print(repeated_dat)
+
+    with open(os.path.join(directory, "ra_age.dat"), "w") as age_dat_file:
+        age_dat_file.write(age_dat)
+    with open(os.path.join(directory, "ra_repeated.dat"), "w") as repeated_dat_file:
+        repeated_dat_file.write(repeated_dat)
+
+
 def alignCommitsForAllScenarios(runDir):
 
     generalConfig, scenarios = ScenarioReader().readScenariosFromDir(runDir)
@@ -380,6 +688,8 @@ def alignCommits(scenario, runDir):
     """
     This method adds another column to the resource/memory log, containing the number of commits
     The original input already contains the three columns "timestamp", "repo size", "memory consumption"
+    The number of commits is inserted as 4th column, all further columns of the input are carried
+    through
     """
 
     offset = 0
@@ -403,16 +713,18 @@ def alignCommits(scenario, runDir):
     with open(os.path.join(runDir, scenario.runName + ".dat"), "w") as dat_file:
         titleDone = False
         for line in list(resourcelog):
-            date = line.split()[0]
+            values = line.split()
+            date = values[0]
             # if not isinstance(date, int):
             if date == "time":
                 dat_file.write(
-                    " ".join([line.strip(), "\"count of commits\"\n"]))
+                    " ".join(values[:3] + ["\"count of commits\""] + values[3:]) + "\n")
                 titleDone = True
                 continue
             if not titleDone:
-                dat_file.write(
-                    " ".join(["time", "reposize", "mem", "countCommits\n"]))
+                columns = ["time", "reposize", "mem", "countCommits",
+                           *MonitorThread.columns[3:len(values)]]
+                dat_file.write(" ".join(columns) + "\n")
                 titleDone = True
             #print(int(date), ">", logPop)
             while (float(date) > logPop):
@@ -423,9 +735,9 @@ def alignCommits(scenario, runDir):
                     #print(countCommits, date)
                 else:
                     break
-            values = line.split()
             dat_file.write(" ".join([str(float(
-                values[0]) - offset), str(values[1]), str(values[2]), str(countCommits), "\n"]))
+                values[0]) - offset), str(values[1]), str(values[2]), str(countCommits),
+                *values[3:], "\n"]))
     return countCommits
 
 
@@ -483,7 +795,7 @@ def alignNumstat(scenario, runDir):
             date = line.split()[0]
             # print title line
             if date == "time":
-                dat_file.write(line.strip() + " " + header)
+                dat_file.write(line.strip() + " " + header + "\n")
                 continue
             if float(date) > int(logPop[0]):
                 while (float(date) > int(logPop[0])):
@@ -515,6 +827,98 @@ def alignNumstat(scenario, runDir):
             countCommits += 1
 
 
+def ioPerCommitForAllScenarios(runDir):
+    """
+    Attribute the io of each run to its commits and write the bytes written per changed triple of
+    each setup.
+    """
+    generalConfig, scenarios = ScenarioReader().readScenariosFromDir(runDir)
+
+    setups = collections.OrderedDict()
+    for scenario in scenarios:
+        ioLogName = os.path.join(runDir, "..", scenario.logPath, "resources-io.log")
+        if not os.path.exists(ioLogName):
+            print("There is no io log for {}".format(scenario.runName))
+            continue
+        totals = ioPerCommit(scenario, runDir)
+        setup = setups.setdefault(scenario.setupName, collections.Counter())
+        setup.update(totals)
+
+    io_dat = "# setup commits triples write_bytes syscw write_bytes_per_triple syscw_per_triple\n"
+    for setup, totals in setups.items():
+        triples = totals["triples"]
+        io_dat += "\"{}\" {} {} {} {} {} {}\n".format(
+            setup, totals["commits"], triples, totals["write_bytes"], totals["syscw"],
+            totals["write_bytes"] / triples if triples else "NaN",
+            totals["syscw"] / triples if triples else "NaN")
+
+    print(io_dat)
+
+    with open(os.path.join(runDir, "io_per_triple.dat"), "w") as io_dat_file:
+        io_dat_file.write(io_dat)
+
+
+def ioPerCommit(scenario, runDir):
+    """
+    Join the deltas of the io counters of the store with the commit timestamps of the repository.
+
+    Commit timestamps have a resolution of seconds, so the io of a second is split evenly between
+    the commits of that second. The io between two commits is attributed to the later commit.
+    """
+    with open(os.path.join(runDir, "..", scenario.logPath, "resources-io.log"), "r") as ioLogFile:
+        header = ioLogFile.readline().split()
+        samples = [[float(value) for value in line.split()] for line in ioLogFile if line.strip()]
+    if not samples:
+        return {}
+    times = [sample[0] for sample in samples]
+    writeBytes = header.index("write_bytes")
+    syscw = header.index("syscw")
+
+    def counterAt(timestamp, column):
+        index = max(0, bisect.bisect_right(times, timestamp) - 1)
+        return samples[index][column]
+
+    repo = git.Repo(scenario.repositoryPath)
+    log = repo.git.log('--reverse', '--pretty=format:commit %H %ct %P', '--numstat')
+    commits = []
+    for line in log.split("\n"):
+        fields = line.split()
+        if not fields:
+            continue
+        if fields[0] == "commit":
+            commits.append({"commit": fields[1], "time": int(fields[2]), "root": len(fields) == 3,
+                            "added": 0, "deleted": 0})
+        elif len(fields) >= 3 and commits and fields[2].endswith(".nq"):
+            commits[-1]["added"] += int(fields[0]) if fields[0] != "-" else 0
+            commits[-1]["deleted"] += int(fields[1]) if fields[1] != "-" else 0
+    # the initial import is not caused by an update
+    commits = [commit for commit in commits if not commit["root"]]
+
+    totals = collections.Counter()
+    with open(os.path.join(runDir, scenario.runName + "_io.dat"), "w") as dat_file:
+        dat_file.write("commit time added deleted write_bytes syscw\n")
+        start = None
+        for second, group in itertools.groupby(commits, key=lambda commit: commit["time"]):
+            group = list(group)
+            if start is None:
+                start = second
+            end = second + 1
+            groupBytes = counterAt(end, writeBytes) - counterAt(start, writeBytes)
+            groupSyscw = counterAt(end, syscw) - counterAt(start, syscw)
+            start = end
+            for commit in group:
+                commitBytes = groupBytes / len(group)
+                commitSyscw = groupSyscw / len(group)
+                dat_file.write("{} {} {} {} {} {}\n".format(
+                    commit["commit"], commit["time"], commit["added"], commit["deleted"],
+                    commitBytes, commitSyscw))
+                totals["commits"] += 1
+                totals["triples"] += commit["added"] + commit["deleted"]
+                totals["write_bytes"] += commitBytes
+                totals["syscw"] += commitSyscw
+    return totals
+
+
 def plotForMem(directory):
     """
     Align multiples runs of the same setup/scenario to a common series of averaged data points
@@ -553,6 +957,16 @@ if __name__ == "__main__":
     argparser = argparse.ArgumentParser()
     argparser.add_argument('--mem', action='store_true')
     argparser.add_argument('--bsbm', action='store_true')
+    argparser.add_argument('--clients', action='store_true')
+    argparser.add_argument('--openloop', action='store_true')
+    argparser.add_argument('--steadystate', action='store_true')
+    argparser.add_argument('--ioPerCommit', action='store_true')
+    argparser.add_argument('--revisionAge', action='store_true')
+    argparser.add_argument('--batching', action='store_true')
+    argparser.add_argument('--slo', type=float, default=None,
+                           help='The latency objective of --openloop in milliseconds')
+    argparser.add_argument('--percentile', type=float, default=99,
+                           help='The latency percentile of the --slo (default 99)')
     argparser.add_argument('--align', action='store_true')
     argparser.add_argument('--alignNumstats', action='store_true')
     argparser.add_argument('--runName', type=str, default=None)
@@ -565,6 +979,19 @@ if __name__ == "__main__":
     elif args.bsbm:
         getQPS(args.directory)
         getAQET(args.directory)
+    elif args.clients:
+        getClientScaling(args.directory)
+    elif args.openloop:
+        getOpenLoop(args.directory, args.slo, args.percentile)
+    elif args.steadystate:
+        getSteadyState(args.directory)
+    elif args.batching:
+        getBatching(args.directory)
+    elif args.revisionAge:
+        getRevisionAge(args.directory)
+    elif args.ioPerCommit:
+        # directory in this case is a specific quit run repo
+        ioPerCommitForAllScenarios(args.directory)
     elif args.align:
         # directory in this case is a specific quit run repo
         alignCommitsForAllScenarios(args.directory)
@@ -1,10 +1,16 @@
 #!/usr/bin/env python3
 import random
-import requests
 import sys
 import pygit2
 import os
+import time
 import datetime
+from concurrent.futures import ThreadPoolExecutor
+from histogram import HistogramSet
+from transport import Transport
+from rawbase import RawbaseHead
+from distributions import sampleDistances
+from querylog import compileQueryLog, QueryLogArtifact
 
 
 class Evaluator:
@@ -16,50 +22,137 @@ class Evaluator:
     logFile = ''
     logDir = '/var/logs'
     queries = 10
+    openLoopRate = None
+    openLoopArrival = 'fixed'
+    openLoopWorkers = 64
+    transport = None
+    # only requests of read-only executers are sent again after a failure on a reused connection
+    readOnly = False
+    rawbaseHead = None
+    rawbaseVerifyInterval = 100
+    timingColumns = ['connect_ns', 'ttfb_ns', 'body_ns', 'total_ns', 'bytes', 'rows']
+    missingTiming = ['NaN'] * len(timingColumns)
+    # the columns of a log line split at whitespace, start and end are written as date and time
+    timeColumns = ['start_date', 'start_time', 'end_date', 'end_time']
+
+    def getTiming(self, res):
+        """Get the values of timingColumns for a response.
+
+        The times are in nanoseconds of a monotonic clock.
+        """
+        rows = res.countRows()
+        return [str(res.timing["connectNs"]), str(res.timing["ttfbNs"]), str(res.timing["bodyNs"]),
+                str(res.timing["totalNs"]), str(res.timing["bytes"]),
+                'NaN' if rows is None else str(rows)]
+
+    def getSchedule(self, count):
+        """Get the intended send times of count requests in seconds after the start.
+
+        The requests are spaced evenly at openLoopRate per second or, with the poisson arrival,
+        with exponentially distributed gaps.
+        """
+        if self.openLoopArrival == 'poisson':
+            schedule = []
+            offset = 0
+            for i in range(count):
+                schedule.append(offset)
+                offset += self.random.expovariate(self.openLoopRate)
+            return schedule
+        return [i / self.openLoopRate for i in range(count)]
+
+    def runOpenLoop(self, tasks, requestMethod, histogramFile):
+        """Issue the requests of tasks on a fixed schedule, independent of their completion.
+
+        tasks is a list of (queryType, arguments of requestMethod). The latency is measured from the
+        intended send time, so the time a request waits for a busy store (or worker) is included.
+        The latencies are recorded into a histogram per query type, which is written to
+        histogramFile.
+        Return (queryType, intended, start, end, status, timing) per task.
+        """
+        histograms = HistogramSet({"rate": self.openLoopRate, "arrival": self.openLoopArrival})
+
+        def timedRequest(queryType, arguments, intended, intendedTime):
+            try:
+                start, end, status, timing = requestMethod(*arguments)
+            except ConnectionError as error:
+                print(error)
+                start, end = intendedTime, datetime.datetime.now()
+                status, timing = 'NaN', self.missingTiming
+            histograms.recordSeconds(queryType, time.monotonic() - intended)
+            return queryType, intendedTime, start, end, status, timing
+
+        begin = time.monotonic()
+        beginTime = datetime.datetime.now()
+        futures = []
+        with ThreadPoolExecutor(self.openLoopWorkers) as pool:
+            for offset, (queryType, arguments) in zip(self.getSchedule(len(tasks)), tasks):
+                delay = begin + offset - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                futures.append(pool.submit(timedRequest, queryType, arguments, begin + offset,
+                                           beginTime + datetime.timedelta(seconds=offset)))
+        histograms.write(histogramFile)
+        self.writeStatistics()
+        return [future.result() for future in futures]
+
+    def writeStatistics(self):
+        """Write the time spent in connecting, in the store and in the client to transport.log.
+
+        For R&Wbase the time spent in looking up the head revision is written to rawbase-head.log.
+        """
+        self.transport.writeStatistics(os.path.join(self.logDir, 'transport.log'))
+        if self.rawbaseHead is not None:
+            self.rawbaseHead.writeStatistics(os.path.join(self.logDir, 'rawbase-head.log'))
+
+    def close(self):
+        """Close the connections of the transport of this executer."""
+        self.transport.close()
 
     def postRequest(self, query, ref=None):
-        start = datetime.datetime.now()
-        res = requests.post(
+        res = self.transport.post(
             self.endpoint.format(revision=ref),
             data={'query': query},
-            headers={'Accept': 'application/json'})
-        end = datetime.datetime.now()
-        return start, end, res.status_code
+            headers={'Accept': 'application/json'},
+            idempotent=self.readOnly)
+        return res.started, res.finished, res.status, self.getTiming(res)
 
     def getRequest(self, query, ref=None):
-        start = datetime.datetime.now()
-        res = requests.get(
+        res = self.transport.get(
             self.endpoint,
             params={'query': query},
             headers={'Accept': 'application/json'})
-        end = datetime.datetime.now()
-        return start, end, res.status_code
+        return res.started, res.finished, res.status, self.getTiming(res)
 
     def rawbaseQueryRequest(self, query, ref=None):
-        start = datetime.datetime.now()
-        res = requests.post(
+        res = self.transport.post(
             self.endpoint,
             data={'query': query},
-            headers={'Accept': 'application/json'})
-        end = datetime.datetime.now()
-        return start, end, res.status_code
+            headers={'Accept': 'application/json'},
+            idempotent=True)
+        return res.started, res.finished, res.status, self.getTiming(res)
 
     def rawbaseUpdateRequest(self, query):
-        start = datetime.datetime.now()
-        parent = self.rwbaseGetParent()
+        if self.rawbaseHead is None:
+            self.rawbaseHead = RawbaseHead(self.virtuoso, self.rawbaseVerifyInterval,
+                                           self.transport)
+        parent = self.rawbaseHead.getParent()
         params = {"rwb-version": parent}
-        res = requests.post(
+        res = self.transport.post(
             self.endpoint,
             params=params,
             data=query,
             headers={'Accept': 'application/json', "Content-Type": "application/sparql-update"})
-        end = datetime.datetime.now()
-        return start, end, res.status_code
+        self.rawbaseHead.advance(res)
+        return res.started, res.finished, res.status, self.getTiming(res)
 
 
 class QueryLogExecuter(Evaluator):
     """A class that will execute generated queries for a given platform."""
 
+    batchSize = 1
+    logColumns = ['number', 'insert_seconds', 'delete_seconds', *Evaluator.timeColumns, 'status',
+                  *Evaluator.timingColumns, 'operations', 'seconds_per_operation']
+
     def __init__(
             self,
             endpoint='',
@@ -71,11 +164,16 @@ class QueryLogExecuter(Evaluator):
             mode='bsbm-log',
             store=None,
             maxTriplesPerQuery=150,
-            triples=None):
+            triples=None,
+            artifact=None,
+            queryLogMode='legacy'):
 
         self.mode = mode
         self.endpoint = endpoint
         self.virtuoso = virtuoso
+        # each executer has its own connections, statistics and random generator
+        self.transport = Transport()
+        self.random = random.Random()
         self.queryLog = queryLog
         self.queryLogSeed = queryLogSeed
         self.logDir = logDir
@@ -84,53 +182,135 @@ class QueryLogExecuter(Evaluator):
         self.store = store
         self.maxTriplesPerQuery = maxTriplesPerQuery
         self.triples = triples
+        self.artifact = artifact
+        self.queryLogMode = queryLogMode
         self.revisionQuery = "prefix prov: <http://www.w3.org/ns/prov#> select ?entity where {"
         self.revisionQuery += "graph <urn:rawbase:provenance> {?entity a prov:Entity. "
         self.revisionQuery += "?activity prov:generated ?entity ; prov:atTime ?time}} order by desc(?time) limit 1"
 
         try:
             self.initQueryLog()
-        except Exception:
-            raise Exception('Could not read query log')
+        except Exception as exc:
+            raise Exception('Could not read query log') from exc
 
     def initQueryLog(self):
+        if self.artifact is not None:
+            self.queries = self.loadArtifact()
+            return
 
         from lsbm import lsbm
-        lsbm_instance = lsbm("urn:bsbm", self.store, self.maxTriplesPerQuery)
+        lsbm_instance = lsbm("urn:bsbm", self.store, self.maxTriplesPerQuery, self.queryLogMode)
         lsbm_instance.prepare(self.triples, self.queryLog, self.queryLogSeed)
 
         self.queries = lsbm_instance.queryList
 
+    def loadArtifact(self):
+        """Open the compiled query log at self.artifact, it is compiled first, if it is missing."""
+        if not os.path.exists(self.artifact):
+            compileQueryLog(self.artifact, self.queryLog, self.queryLogSeed, self.store,
+                            self.triples, self.maxTriplesPerQuery, self.queryLogMode)
+        artifact = QueryLogArtifact(self.artifact)
+        expected = {"seed": str(self.queryLogSeed), "store": self.store, "statements": self.triples,
+                    "maxTriplesPerQuery": self.maxTriplesPerQuery, "mode": self.queryLogMode}
+        # artifacts without a mode were generated in the legacy mode
+        header = dict({"mode": "legacy"}, **artifact.header)
+        for key, value in expected.items():
+            if header[key] != value:
+                artifact.close()
+                raise Exception('The {} of the query log artifact {} is {}, expected {}'.format(
+                    key, self.artifact, header[key], value))
+        return artifact
+
+    def close(self):
+        """Close the transport and the compiled query log, if one was opened."""
+        super().close()
+        if isinstance(self.queries, QueryLogArtifact):
+            self.queries.close()
+
+    def getRequests(self):
+        """Group batchSize consecutive operations of the query log into one update request each.
+
+        Yield (query_type, query, operations) per request, query_type is insert or delete, if all
+        operations of a request are of that type, and mixed otherwise.
+        """
+        batch = []
+        for operation in self.queries:
+            batch.append(operation)
+            if len(batch) == self.batchSize:
+                yield self.batchRequest(batch)
+                batch = []
+        if batch:
+            yield self.batchRequest(batch)
+
+    def batchRequest(self, batch):
+        """Join the operations of batch into one update, return (query_type, query, operations)."""
+        types = set(query_type for query_type, query in batch)
+        query_type = types.pop() if len(types) == 1 else "mixed"
+        return query_type, " ;\n".join(query for batch_type, query in batch), len(batch)
+
+    def getLogLine(self, number, query_type, execTime, start, end, status, timing, operations):
+        """Get the columns of a request in the execution log, see logColumns.
+
+        The number of operations and the time per operation are logged after the timing columns.
+        """
+        execTimeInsert = str(execTime) if query_type == "insert" else "NaN"
+        execTimeDelete = str(execTime) if query_type == "delete" else "NaN"
+        return [str(number), execTimeInsert, execTimeDelete, str(start), str(end), str(status),
+                *timing, str(operations), str(execTime / operations)]
+
     def run(self, requestMethod):
+        if self.openLoopRate is not None:
+            self.runOpenLoopQueryLog(requestMethod)
+            return
         with open(self.logFile, 'a+') as executionLog:
             number = 0
-            for query_type, query in self.queries:
+            for query_type, query, operations in self.getRequests():
                 number += 1
                 try:
-                    start, end, status = requestMethod(query)
-                    execTime = str(end.timestamp()-start.timestamp())
-                    execTimeInsert = "NaN"
-                    execTimeDelete = "NaN"
-                    if query_type == "insert":
-                        execTimeInsert = execTime
-                    if query_type == "delete":
-                        execTimeDelete = execTime
-                    data = [str(number), execTimeInsert, execTimeDelete, str(start), str(end), str(status)]
+                    start, end, status, timing = requestMethod(query)
+                    data = self.getLogLine(number, query_type, end.timestamp() - start.timestamp(),
+                                           start, end, status, timing, operations)
                     executionLog.write(' '.join(data) + '\n')
-                except requests.exceptions.ConnectionError as error:
+                except ConnectionError as error:
                     print(error)
                     break
+        self.writeStatistics()
 
-    def rwbaseGetParent(self):
-        query = "prefix prov: <http://www.w3.org/ns/prov#> select ?entity where {graph <urn:rawbase:provenance> {?entity a prov:Entity. ?activity prov:generated ?entity ; prov:atTime ?time}} order by desc(?time) limit 1"
+    def runOpenLoopQueryLog(self, requestMethod):
+        """Execute the query log in the open-loop mode.
 
-        response = requests.post(self.virtuoso, data={'query': query},
-                                 headers={'Accept': 'text/csv'})
+        The execution time is taken from the intended send time.
+        """
+        requests = list(self.getRequests())
+        tasks = [(query_type, (query,)) for query_type, query, operations in requests]
+        results = self.runOpenLoop(tasks, requestMethod,
+                                   os.path.join(self.logDir, 'querylog-histograms.json'))
+        with open(self.logFile, 'a+') as executionLog:
+            for number, (request, result) in enumerate(zip(requests, results), 1):
+                operations = request[2]
+                query_type, intended, start, end, status, timing = result
+                data = self.getLogLine(number, query_type, end.timestamp() - intended.timestamp(),
+                                       start, end, status, timing, operations)
+                executionLog.write(' '.join(data) + '\n')
 
-        if len(response.text.split("\n")) > 0:
-            parent = response.text.split("\n")[1].strip("\"")
-            return parent
-        return ""
+
+class ReservoirSample:
+    """A uniform random sample of at most size items of a stream of unknown length (algorithm R)."""
+
+    def __init__(self, size, generator=random):
+        self.size = size
+        self.generator = generator
+        self.items = []
+        self.count = 0
+
+    def add(self, item):
+        self.count += 1
+        if len(self.items) < self.size:
+            self.items.append(item)
+        else:
+            index = self.generator.randrange(self.count)
+            if index < self.size:
+                self.items[index] = item
 
 
 class RandomAccessExecuter(Evaluator):
@@ -139,6 +319,13 @@ class RandomAccessExecuter(Evaluator):
     logFile = ''
     commits = []
     revisions = []
+    revisionCount = 0
+    concurrency = 1
+    distribution = 'uniform'
+    distributionParameters = None
+    readOnly = True
+    logColumns = ['number', 'revision', 'seconds', *Evaluator.timeColumns, 'status',
+                  *Evaluator.timingColumns, 'distance']
 
     def __init__(
             self,
@@ -155,6 +342,8 @@ class RandomAccessExecuter(Evaluator):
         self.virtuoso = virtuoso
         self.logDir = logDir
         self.graph = graph
+        self.transport = Transport()
+        self.random = random.Random()
 
         if store not in ['quit', 'r43ples', 'rawbase']:
             print('No store selected.')
@@ -179,65 +368,174 @@ class RandomAccessExecuter(Evaluator):
                 raise Exception('{} is no repository'.format(repo))
 
     def getRevisions(self):
+        """Count the revisions of the store and sample self.queries of them.
+
+        With the uniform distribution the revisions are streamed into a reservoir sample in a
+        single pass, for R43ples the revision numbers are sampled from their count. With other
+        distributions the revisions are counted first and the sampled distances from HEAD are
+        resolved afterwards. Either way the memory does not grow with the history.
+        """
+        start = time.perf_counter_ns()
+        sample = ReservoirSample(self.queries, self.random)
         if self.store == 'quit':
-            i = 0
-            self.revisions = []
-            for commit in self.repo.walk(self.repo.head.target, pygit2.GIT_SORT_TIME):
-                self.revisions.append((i, str(commit.id)))
-                i += 1
-            print('Found {} git commits'.format(len(self.revisions)))
-            with open(os.path.join(self.logDir, 'revisions.log'), 'a+') as revisionsLog:
-                revisionsLog.write("{store}: {revisions}".format(store="quit", revisions=str(len(self.revisions))))
+            if self.distribution == 'uniform':
+                for i, commit in enumerate(self.walkCommits()):
+                    sample.add((i, str(commit.id)))
+                self.revisionCount = sample.count
+                self.revisions = sample.items
+            else:
+                self.revisionCount = sum(1 for commit in self.walkCommits())
+                numbers = self.sampleNumbers()
+                wanted = set(numbers)
+                last = max(wanted, default=-1)
+                refs = {}
+                for i, commit in enumerate(self.walkCommits()):
+                    if i > last:
+                        break
+                    if i in wanted:
+                        refs[i] = str(commit.id)
+                self.revisions = [(number, refs[number]) for number in numbers]
+            print('Found {} git commits'.format(self.revisionCount))
         elif self.store == 'r43ples':
-            query = """select ?rev where {{
+            query = """select (count(?rev) as ?count) where {{
                 graph <{}-revisiongraph> {{
-                    ?s <http://eatld.et.tu-dresden.de/rmo#revisionNumber> ?rev .}} }} ORDER BY ?rev""".format(
+                    ?s <http://eatld.et.tu-dresden.de/rmo#revisionNumber> ?rev .}} }}""".format(
                 self.graph)
 
-            response = requests.post(self.endpoint, data={'query': query},
-                                     headers={'Accept': 'application/json'})
+            response = self.transport.post(self.endpoint, data={'query': query},
+                                           headers={'Accept': 'application/json'},
+                                           idempotent=True)
 
             data = response.json()
-            self.revisions = list((r, r) for r in range(0, len(data['results']['bindings']) - 1))
-            print('Found {} R43ples-revisions'.format(len(self.revisions)))
-            with open(os.path.join(self.logDir, 'revisions.log'), 'a+') as revisionsLog:
-                revisionsLog.write("{store}: {revisions}".format(store="r43ples", revisions=str(len(self.revisions))))
+            self.revisionCount = max(0, int(data['results']['bindings'][0]['count']['value']) - 1)
+            self.revisions = list((r, r) for r in self.sampleNumbers())
+            print('Found {} R43ples-revisions'.format(self.revisionCount))
 
         elif self.store == 'rawbase':
-            query = "prefix prov: <http://www.w3.org/ns/prov#> select ?entity where {graph <urn:rawbase:provenance> {?entity a prov:Entity. ?activity prov:generated ?entity ; prov:atTime ?time}} order by ?time"
-
-            response = requests.post(self.virtuoso, data={'query': query},
-                                     headers={'Accept': 'text/csv'})
+            where = ("where {graph <urn:rawbase:provenance> {?entity a prov:Entity. "
+                     "?activity prov:generated ?entity ; prov:atTime ?time}}")
+            prefix = "prefix prov: <http://www.w3.org/ns/prov#> "
+            query = prefix + "select ?entity " + where + " order by ?time"
+            header = True
+            wanted = None
+            refs = {}
+            number = 0
 
-            if len(response.text.split("\n")) > 0:
-                revisions = response.text.split("\n")
-                i = 0
-                for line in revisions[1:]:
-                    self.revisions.append((i, line.strip("\"")))
-                    i += 1
-                print('Found {} rawbase revisions'.format(len(self.revisions)))
-                with open(os.path.join(self.logDir, 'revisions.log'), 'a+') as revisionsLog:
-                    revisionsLog.write("{store}: {revisions}".format(store="rawbase", revisions=str(len(self.revisions))))
+            def addRevision(line):
+                nonlocal header, number
+                if header:
+                    header = False
+                    return
+                line = line.decode('utf-8').strip()
+                if line:
+                    if wanted is None:
+                        sample.add((sample.count, line.strip("\"")))
+                    elif number in wanted:
+                        refs[number] = line.strip("\"")
+                    number += 1
+
+            if self.distribution != 'uniform':
+                countQuery = prefix + "select (count(?entity) as ?count) " + where
+                response = self.transport.post(self.virtuoso, data={'query': countQuery},
+                                               headers={'Accept': 'text/csv'}, idempotent=True)
+                self.revisionCount = int(response.text.split("\n")[1].strip().strip("\""))
+                numbers = self.sampleNumbers()
+                wanted = set(numbers)
+            self.transport.post(self.virtuoso, data={'query': query},
+                                headers={'Accept': 'text/csv'}, lineHandler=addRevision,
+                                idempotent=True)
+            if wanted is None:
+                self.revisionCount = sample.count
+                self.revisions = sample.items
+            else:
+                self.revisions = [(number, refs[number]) for number in numbers if number in refs]
+            print('Found {} rawbase revisions'.format(self.revisionCount))
+        enumeration = time.perf_counter_ns() - start
+        print('Enumerated and sampled the revisions in {:.3f}s'.format(enumeration / 1e9))
+        with open(os.path.join(self.logDir, 'revisions.log'), 'a+') as revisionsLog:
+            revisionsLog.write("{store}: {revisions} sampled={sampled} distribution={distribution} "
+                               "enumeration_ns={enumeration}\n".format(
+                                   store=self.store, revisions=self.revisionCount,
+                                   sampled=len(self.revisions), distribution=self.distribution,
+                                   enumeration=enumeration))
+
+    def walkCommits(self):
+        return self.repo.walk(self.repo.head.target, pygit2.GIT_SORT_TIME)
+
+    def getDistance(self, number):
+        """Get the distance from HEAD of a revision.
+
+        The git commits are numbered from HEAD, the revisions of the other stores from the first
+        one.
+        """
+        if self.store == 'quit':
+            return number
+        return self.revisionCount - 1 - number
+
+    def sampleNumbers(self):
+        """Sample the numbers of self.queries out of self.revisionCount revisions.
+
+        The distances from HEAD are drawn with self.distribution.
+        """
+        if self.revisionCount == 0:
+            return []
+        size = self.queries
+        if self.distribution == 'uniform':
+            size = min(self.queries, self.revisionCount)
+        distances = sampleDistances(self.distribution, self.revisionCount, size,
+                                    self.distributionParameters, self.random)
+        # the distance is its own inverse
+        return [self.getDistance(distance) for distance in distances]
 
     def run(self, requestMethod):
-        if len(self.revisions) == 0:
+        if self.revisionCount == 0:
             print('There are no revisions')
             return
-        elif len(self.revisions) < self.queries:
+        elif self.distribution == 'uniform' and self.revisionCount < self.queries:
             print('There are not enough revisions')
             return
 
-        selectedRevisions = random.sample(self.revisions, self.queries)
+        if self.distribution == 'uniform':
+            selectedRevisions = self.random.sample(self.revisions, self.queries)
+        else:
+            selectedRevisions = self.revisions
 
         limit = 1000
         query = {'quit': 'SELECT ?s ?p ?o WHERE {{GRAPH <{graph}> {{?s ?p ?o}}}} LIMIT {limit}',
                  'r43ples': 'SELECT ?s ?p ?o WHERE {{GRAPH <{graph}> REVISION "{revision}" {{?s ?p ?o}}}} LIMIT {limit}',
                  'rawbase': 'SELECT ?s ?p ?o FROM <{revision}> WHERE {{?s ?p ?o}} LIMIT {limit}'}
 
-        # quit
-        with open(self.logFile, 'w+') as executionLog:
-            for number, ref in selectedRevisions:
-                start, end, status = requestMethod(query[self.store].format(limit=limit, revision=str(ref), graph=self.graph), ref)
-                data = [str(number), '"{}"'.format(str(ref)), str(end.timestamp()-start.timestamp()), str(start), str(end), str(status)]
+        if self.openLoopRate is not None:
+            tasks = [('select', (query[self.store].format(limit=limit, revision=str(ref),
+                                                          graph=self.graph), ref))
+                     for number, ref in selectedRevisions]
+            results = self.runOpenLoop(tasks, requestMethod,
+                                       os.path.join(self.logDir, 'ra-histograms.json'))
+            with open(self.logFile, 'w+') as executionLog:
+                for (number, ref), result in zip(selectedRevisions, results):
+                    query_type, intended, start, end, status, timing = result
+                    data = [str(number), '"{}"'.format(str(ref)),
+                            str(end.timestamp() - intended.timestamp()), str(start), str(end),
+                            str(status)] + timing + [str(self.getDistance(number))]
+                    executionLog.write(' '.join(data) + '\n')
+            return
+
+        def timedRequest(revision):
+            number, ref = revision
+            try:
+                start, end, status, timing = requestMethod(
+                    query[self.store].format(limit=limit, revision=str(ref), graph=self.graph), ref)
+            except ConnectionError as error:
+                print(error)
+                start = end = datetime.datetime.now()
+                status, timing = 'NaN', self.missingTiming
+            return [str(number), '"{}"'.format(str(ref)), str(end.timestamp() - start.timestamp()),
+                    str(start), str(end), str(status)] + timing + [str(self.getDistance(number))]
+
+        # with a concurrency above 1 the revisions are checked out in parallel, the results are
+        # still logged in the order of the queries
+        with open(self.logFile, 'w+') as executionLog, ThreadPoolExecutor(self.concurrency) as pool:
+            for data in pool.map(timedRequest, selectedRevisions):
                 print(', '.join(data))
                 executionLog.write(' '.join(data) + '\n')
+        self.writeStatistics()
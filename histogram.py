@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+
+import math
+import json
+import argparse
+import threading
+
+
+class LatencyHistogram:
+    """A log-linear latency histogram in the style of HdrHistogram.
+
+    Values are recorded in microseconds. Each power of two range is split into linear sub buckets,
+    so every recorded value is kept with a relative error below 10^-significantDigits. Histograms
+    with the same precision can be merged by adding up their counts.
+    """
+
+    def __init__(self, significantDigits=2):
+        self.significantDigits = significantDigits
+        self.subBucketBits = math.ceil(math.log2(2 * 10 ** significantDigits))
+        self.subBucketCount = 1 << self.subBucketBits
+        self.subBucketHalf = self.subBucketCount >> 1
+        self.counts = {}
+        self.total = 0
+        self.sum = 0
+        self.minimum = None
+        self.maximum = None
+
+    def getIndex(self, value):
+        if value < self.subBucketCount:
+            return value
+        bucket = value.bit_length() - self.subBucketBits
+        subBucket = value >> bucket
+        offset = (bucket - 1) * self.subBucketHalf + subBucket - self.subBucketHalf
+        return self.subBucketCount + offset
+
+    def getValueRange(self, index):
+        """Get the lowest and the highest value, which are recorded at index."""
+        if index < self.subBucketCount:
+            return index, index
+        bucket = (index - self.subBucketCount) // self.subBucketHalf + 1
+        subBucket = (index - self.subBucketCount) % self.subBucketHalf + self.subBucketHalf
+        return subBucket << bucket, ((subBucket + 1) << bucket) - 1
+
+    def record(self, value, count=1):
+        """Record a value in microseconds."""
+        value = max(0, int(value))
+        index = self.getIndex(value)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.total += count
+        self.sum += value * count
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+
+    def recordSeconds(self, seconds):
+        self.record(round(seconds * 1000000))
+
+    def merge(self, other):
+        if other.significantDigits != self.significantDigits:
+            raise ValueError("Can not merge histograms with {} and {} significant digits".format(
+                self.significantDigits, other.significantDigits))
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += other.total
+        self.sum += other.sum
+        for value in (other.minimum, other.maximum):
+            if value is not None:
+                self.minimum = value if self.minimum is None else min(self.minimum, value)
+                self.maximum = value if self.maximum is None else max(self.maximum, value)
+
+    def percentile(self, percentile):
+        """Get the value in microseconds, which percentile percent of the values do not exceed."""
+        if self.total == 0:
+            return float("nan")
+        rank = max(1, math.ceil(percentile / 100 * self.total))
+        seen = 0
+        for index in sorted(self.counts.keys()):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self.getValueRange(index)[1], self.maximum)
+        return self.maximum
+
+    def mean(self):
+        if self.total == 0:
+            return float("nan")
+        return self.sum / self.total
+
+    def toDict(self):
+        return {"significantDigits": self.significantDigits,
+                "counts": {str(index): count for index, count in sorted(self.counts.items())},
+                "total": self.total, "sum": self.sum, "min": self.minimum, "max": self.maximum}
+
+    @classmethod
+    def fromDict(cls, data):
+        histogram = cls(data["significantDigits"])
+        histogram.counts = {int(index): count for index, count in data["counts"].items()}
+        histogram.total = data["total"]
+        histogram.sum = data["sum"]
+        histogram.minimum = data["min"]
+        histogram.maximum = data["max"]
+        return histogram
+
+
+class HistogramSet:
+    """Latency histograms by query type, which can be recorded from several threads."""
+
+    def __init__(self, metadata=None, significantDigits=2):
+        self.metadata = metadata or {}
+        self.significantDigits = significantDigits
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def get(self, name):
+        if name not in self.histograms:
+            self.histograms[name] = LatencyHistogram(self.significantDigits)
+        return self.histograms[name]
+
+    def recordSeconds(self, name, seconds):
+        with self.lock:
+            self.get(name).recordSeconds(seconds)
+
+    def merge(self, other):
+        for name, histogram in other.histograms.items():
+            self.get(name).merge(histogram)
+
+    def total(self):
+        """Get a histogram of all query types."""
+        total = LatencyHistogram(self.significantDigits)
+        for histogram in self.histograms.values():
+            total.merge(histogram)
+        return total
+
+    def write(self, path):
+        with open(path, "w") as histogramFile:
+            json.dump({"metadata": self.metadata,
+                       "histograms": {name: histogram.toDict()
+                                      for name, histogram in self.histograms.items()}},
+                      histogramFile)
+
+    @classmethod
+    def read(cls, path):
+        with open(path, "r") as histogramFile:
+            data = json.load(histogramFile)
+        histogramSet = cls(data["metadata"])
+        for name, histogram in data["histograms"].items():
+            histogramSet.histograms[name] = LatencyHistogram.fromDict(histogram)
+        return histogramSet
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(
+        description='Merge latency histograms and report their percentiles')
+    argparser.add_argument('histograms', nargs='+', type=str)
+    argparser.add_argument('-p', '--percentiles', nargs='+', type=float, default=[50, 90, 99, 99.9])
+    args = argparser.parse_args()
+
+    merged = HistogramSet()
+    for path in args.histograms:
+        merged.merge(HistogramSet.read(path))
+    merged.histograms["all"] = merged.total()
+
+    percentileColumns = " ".join("p{}".format(p) for p in args.percentiles)
+    print("type count mean {} max (milliseconds)".format(percentileColumns))
+    for name, histogram in sorted(merged.histograms.items()):
+        print("{} {} {:.3f} {} {:.3f}".format(
+            name, histogram.total, histogram.mean() / 1000,
+            " ".join("{:.3f}".format(histogram.percentile(p) / 1000) for p in args.percentiles),
+            (histogram.maximum or 0) / 1000))
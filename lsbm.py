@@ -2,9 +2,11 @@
 
 import sys
 import math
-import requests
+import time
+from transport import transport
+from rawbase import RawbaseHead
 import argparse
-from random import seed, randint, sample
+import random
 
 class lsbm:
 
@@ -13,38 +15,62 @@ class lsbm:
         'r43ples': 'USER "radtke" MESSAGE "RASBM" {query_type} {{GRAPH <{graph}> REVISION "master" {{{body}}}}}',
         'rawbase': '{query_type} {{ {body} }}'}
 
-    def __init__(self, defaultGraph, store, maxTriplesPerQuery):
+    modes = ['legacy', 'indexed']
+    progressInterval = 100
+
+    def __init__(self, defaultGraph, store, maxTriplesPerQuery, mode='legacy'):
+        """Generate a query log of inserts and deletes.
+
+        In the legacy mode the pending statements are kept in lists of statements, which are
+        filtered after each operation, as in the original implementation, so the logs of a seed
+        stay the same. In the indexed mode the pending statements are kept as arrays of statement
+        ids, from which a sample of k statements is drawn and removed in O(k) by swapping with the
+        last id. Its logs are reproducible per seed as well, but differ from the legacy logs, and
+        statements occurring multiple times in the update file are inserted and deleted separately.
+        """
+        if mode not in self.modes:
+            raise ValueError("Unknown mode {}, expected one of {}".format(
+                mode, ", ".join(self.modes)))
         self.defaultGraph = defaultGraph
         self.store = store
         self.maxTriplesPerQuery = maxTriplesPerQuery
+        self.mode = mode
         self.stats = []
 
     def prepare(self, numberOfStatements, queryLog, randSeed='default'):
-        # https://stackoverflow.com/questions/11526975/set-random-seed-programwide-in-python#11527011
-        seed(randSeed)
-        self.toInsert = []
+        statements = []
         with open(queryLog, 'r') as f:
             for line in f:
-                if len(self.toInsert) >= numberOfStatements:
+                if len(statements) >= numberOfStatements:
                     break
                 if line.strip() == "#__SEP__":
                     continue
                 line = line.strip()
-                self.toInsert.append(line)
+                statements.append(line)
+        self.prepareStatements(statements, randSeed)
+
+    def prepareStatements(self, statements, randSeed='default'):
+        # an own generator per instance, the query logs of parallel executions must not interleave
+        self.random = random.Random(randSeed)
+        if self.mode == 'indexed':
+            self.statements = statements
+            self.toInsert = list(range(len(statements)))
+        else:
+            self.toInsert = statements
         self.toDelete = []
         self.prepareQueryList()
 
     def prepareQueryList(self):
         self.queryList = []
         while True:
-            direction = randint(0, 1)
+            direction = self.random.randint(0, 1)
             try:
                 if direction == 0:
                     self.queryList.append(("insert", self.prepareDelete()))
                 else:
                     self.queryList.append(("delete", self.prepareInsert()))
                 self.stats.append((len(self.queryList), len(self.toDelete)))
-                if len(self.queryList)%100 == 0:
+                if self.progressInterval and len(self.queryList) % self.progressInterval == 0:
                     print("querylist: {}, toInsert: {}, toDelete: {}".format(
                         str(len(self.queryList)), str(len(self.toInsert)), str(len(self.toDelete))))
                 if len(self.toInsert) < 1 and len(self.toDelete) < 1:
@@ -55,16 +81,35 @@ class lsbm:
         print("done prepare query list")
 
     def removeListFromList(self, orig, remove):
+        remove = set(remove)
         return list((item for item in orig if item not in remove))
 
+    def takeSample(self, pool, size):
+        """Remove size random statement ids from pool and return them, in O(size)."""
+        if size > len(pool):
+            raise ValueError("Sample larger than population")
+        taken = []
+        for i in range(size):
+            index = self.random.randrange(len(pool))
+            taken.append(pool[index])
+            pool[index] = pool[-1]
+            pool.pop()
+        return taken
+
     def prepareInsert(self):
         if math.ceil(len(self.toInsert)/4) < self.maxTriplesPerQuery:
             maxTripleSize = math.ceil(len(self.toInsert)/4)
         else:
             maxTripleSize = self.maxTriplesPerQuery
-        statementSample = sample(self.toInsert, randint(1, maxTripleSize))
-        self.toInsert = self.removeListFromList(self.toInsert, statementSample)
-        self.toDelete.extend(statementSample)
+        if self.mode == 'indexed':
+            ids = self.takeSample(self.toInsert, self.random.randint(1, maxTripleSize))
+            self.toDelete.extend(ids)
+            statementSample = [self.statements[id] for id in ids]
+        else:
+            size = self.random.randint(1, maxTripleSize)
+            statementSample = self.random.sample(self.toInsert, size)
+            self.toInsert = self.removeListFromList(self.toInsert, statementSample)
+            self.toDelete.extend(statementSample)
         query = self.query_patterns[self.store].format(
             query_type='INSERT DATA', graph=self.defaultGraph,
             body=" ".join(statementSample))
@@ -76,38 +121,34 @@ class lsbm:
             maxTripleSize = math.ceil(len(self.toDelete)/4)
         else:
             maxTripleSize = self.maxTriplesPerQuery
-        statementSample = sample(self.toDelete, randint(1, maxTripleSize))
-        self.toDelete = self.removeListFromList(self.toDelete, statementSample)
+        if self.mode == 'indexed':
+            ids = self.takeSample(self.toDelete, self.random.randint(1, maxTripleSize))
+            statementSample = [self.statements[id] for id in ids]
+        else:
+            size = self.random.randint(1, maxTripleSize)
+            statementSample = self.random.sample(self.toDelete, size)
+            self.toDelete = self.removeListFromList(self.toDelete, statementSample)
         query = self.query_patterns[self.store].format(
             query_type='DELETE DATA', graph=self.defaultGraph,
             body=" ".join(statementSample))
 
         return query
 
-    def rwbaseGetParent(self, rwbVirtuoso):
-        print("get parent commit")
-        #query = "prefix prov: <http://www.w3.org/ns/prov#> select ?activity where {graph <urn:rawbase:provenance> {?activity a prov:Activity; prov:atTime ?time}} order by desc(?time) limit 1"
-        query = "prefix prov: <http://www.w3.org/ns/prov#> select ?entity where {graph <urn:rawbase:provenance> {?entity a prov:Entity. ?activity prov:generated ?entity ; prov:atTime ?time}} order by desc(?time) limit 1"
-
-        response = requests.post(rwbVirtuoso, data={'query': query},
-                                 headers={'Accept': 'text/csv'})
-
-        if len(response.text.split("\n")) > 0:
-            return response.text.split("\n")[1].strip("\"")
-        return ""
-
     def run(self, endpoint, endpointType=None, rwbVirtuoso=None):
+        head = RawbaseHead(rwbVirtuoso) if endpointType == "rwb" else None
 
         for query in self.queryList:
             params = {}
 
-            if endpointType == "rwb":
-                parent = self.rwbaseGetParent(rwbVirtuoso)
-                params["rwb-version"] = parent
+            if head is not None:
+                params["rwb-version"] = head.getParent()
 
             print("exec: {} with params: {}".format(query, params))
-            response = requests.post(endpoint, data=query, params=params,
-                                     headers={'Accept': 'application/json', "Content-Type": "application/sparql-update"})
+            response = transport.post(endpoint, data=query, params=params,
+                                      headers={'Accept': 'application/json',
+                                               "Content-Type": "application/sparql-update"})
+            if head is not None:
+                head.advance(response)
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
@@ -162,11 +203,40 @@ if __name__ == '__main__':
         type=int,
         default='100000',
         help='The total numer of statements to insert and delete with the querylog')
+    parser.add_argument(
+        '--mode',
+        type=str,
+        default='legacy',
+        choices=lsbm.modes,
+        help='How the pending statements are kept, legacy (*) reproduces the logs of earlier '
+             'versions')
+    parser.add_argument(
+        '--benchmark',
+        type=int,
+        nargs='+',
+        default=None,
+        help='Measure the time to generate logs of synthetic statements with the given numbers of '
+             'statements')
     args = parser.parse_args(sys.argv[1:])
     print('Args', args)
 
-    lsbm_instance = lsbm(args.defaultGraph, args.storeType, args.maxTriplesPerQuery)
-    #lsbm.rwbaseGetParent()
+    if args.benchmark:
+        print("mode statements operations seconds microseconds_per_statement")
+        for numberOfStatements in args.benchmark:
+            statements = ["<urn:s{}> <urn:p> <urn:o> .".format(i)
+                          for i in range(numberOfStatements)]
+            lsbm_instance = lsbm(args.defaultGraph, args.storeType, args.maxTriplesPerQuery,
+                                 args.mode)
+            lsbm_instance.progressInterval = 0
+            start = time.perf_counter()
+            lsbm_instance.prepareStatements(statements, args.seed)
+            seconds = time.perf_counter() - start
+            print("{} {} {} {:.3f} {:.3f}".format(
+                args.mode, numberOfStatements, len(lsbm_instance.queryList), seconds,
+                seconds / numberOfStatements * 1000000))
+        sys.exit()
+
+    lsbm_instance = lsbm(args.defaultGraph, args.storeType, args.maxTriplesPerQuery, args.mode)
 
     lsbm_instance.prepare(args.numberOfStatements, args.queryLog, args.seed)
     # lsbm.run(args.endpoint, args.endpointType, args.rwb_virtuoso)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import heapq
+import tempfile
+import logging
+import argparse
+
+logger = logging.getLogger('quit-eval.preparation')
+
+
+def writeRun(lines, directory):
+    lines.sort()
+    fd, runPath = tempfile.mkstemp(prefix="bsqbm-sort-", suffix=".run", dir=directory)
+    with open(fd, 'w') as runFile:
+        runFile.writelines(lines)
+    return runPath
+
+
+def sortedLines(source, memoryBudget, tmpDir):
+    """Generate the lines of source in sorted order.
+
+    Lines are collected until memoryBudget bytes are used, then the chunk is sorted and written to
+    a run file in tmpDir. The run files are merged afterwards. If the whole file fits into the
+    budget no run file is written at all.
+    Each line is terminated with a newline, so a missing newline at the end of the file does not
+    change the order.
+    """
+    runs = []
+    chunk = []
+    size = 0
+    try:
+        with open(source, 'r') as sourceGraph:
+            for line in sourceGraph:
+                if not line.endswith('\n'):
+                    line += '\n'
+                chunk.append(line)
+                size += sys.getsizeof(line)
+                if size >= memoryBudget:
+                    runs.append(writeRun(chunk, tmpDir))
+                    chunk = []
+                    size = 0
+        if not runs:
+            chunk.sort()
+            yield from chunk
+            return
+        runs.append(writeRun(chunk, tmpDir))
+        chunk = []
+        logger.debug("Merge {} sorted runs of {}".format(len(runs), source))
+        runFiles = [open(runPath, 'r') for runPath in runs]
+        try:
+            yield from heapq.merge(*runFiles)
+        finally:
+            for runFile in runFiles:
+                runFile.close()
+    finally:
+        for runPath in runs:
+            os.remove(runPath)
+
+
+def prepareDataset(source, target, graph='urn:bsbm', memoryBudget=256 * 1024 * 1024, unique=False,
+                   tmpDir=None):
+    """Write the sorted N-Triples of source as N-Quads in graph to target.
+
+    This is the streaming equivalent of:
+        sed "s/.$/<urn:bsbm> ./g" dataset.nt | LC_ALL=C sort [-u] > graph.nq
+    """
+    if tmpDir is None:
+        tmpDir = os.path.dirname(os.path.abspath(target))
+    suffix = "<{}> .\n".format(graph)
+    previous = None
+    with open(target, 'w') as targetGraph:
+        for line in sortedLines(source, memoryBudget, tmpDir):
+            if unique and line == previous:
+                continue
+            previous = line
+            targetGraph.write(line.rstrip()[:-1] + suffix)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('source', type=str, help='The N-Triples file to prepare')
+    parser.add_argument('target', type=str, help='The N-Quads file to write')
+    parser.add_argument('-g', '--graph', type=str, default='urn:bsbm')
+    parser.add_argument('-m', '--memory', type=int, default=256,
+                        help='The memory budget for sorting in MiB (default 256)')
+    parser.add_argument('-u', '--unique', action='store_true', help='Remove duplicate statements')
+    parser.add_argument('-T', '--tmpDir', type=str, default=None)
+    args = parser.parse_args()
+
+    prepareDataset(args.source, args.target, args.graph, args.memory * 1024 * 1024, args.unique,
+                   args.tmpDir)
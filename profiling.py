@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+import os
+import signal
+import logging
+import subprocess
+
+basedir = os.path.dirname(os.path.abspath(__file__))
+
+profilers = ['cprofile', 'pyspy', 'sampler']
+
+
+def getSamplerEnvironment(output, rate=100):
+    """Get an environment, which injects the stack sampler into a python interpreter.
+
+    The sampler writes the collapsed stacks of each process to <output>.<pid>.
+    """
+    environment = dict(os.environ)
+    samplerPath = os.path.join(basedir, "stuff", "stacksampler")
+    if environment.get("PYTHONPATH"):
+        environment["PYTHONPATH"] = samplerPath + os.pathsep + environment["PYTHONPATH"]
+    else:
+        environment["PYTHONPATH"] = samplerPath
+    environment["BSQBM_STACKSAMPLER_OUTPUT"] = output
+    environment["BSQBM_STACKSAMPLER_RATE"] = str(rate)
+    return environment
+
+
+def getContainerPid(containerName):
+    inspect = subprocess.run(['docker', 'inspect', '-f', '{{.State.Pid}}', containerName],
+                             stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    if inspect.returncode != 0:
+        return None
+    return int(inspect.stdout.decode().strip())
+
+
+class PySpyProfiler:
+    """Attach py-spy to a running process and record collapsed stacks of it and its subprocesses."""
+
+    logger = logging.getLogger('quit-eval.profiling')
+
+    executable = 'py-spy'
+
+    def __init__(self, output, rate=100):
+        self.output = output
+        self.rate = rate
+        self.process = None
+
+    def start(self, pid):
+        command = [self.executable, 'record', '--pid', str(pid), '--rate', str(self.rate),
+                   '--format', 'raw', '--output', self.output, '--subprocesses', '--nonblocking']
+        self.logger.debug("Start py-spy: {}".format(command))
+        try:
+            self.process = subprocess.Popen(command)
+        except OSError as exc:
+            self.logger.error("Could not start py-spy: {}".format(exc))
+
+    def stop(self):
+        """Stop recording, py-spy writes its output when it is interrupted."""
+        if self.process is None or self.process.poll() is not None:
+            return
+        self.process.send_signal(signal.SIGINT)
+        try:
+            self.process.wait(30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.logger.debug("py-spy exited with {}".format(self.process.poll()))
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import json
+import mmap
+import zlib
+import struct
+import hashlib
+import logging
+import argparse
+import tempfile
+from repocache import hashFile
+
+logger = logging.getLogger('quit-eval.querylog')
+
+magic = b'QLOG\x01'
+headerLength = struct.Struct('>I')
+recordHeader = struct.Struct('>BI')
+queryTypes = ['insert', 'delete']
+operationPattern = re.compile(r'(INSERT|DELETE) DATA')
+
+
+def getArtifactPath(directory, queryLog, seed, store, triples, maxTriplesPerQuery, mode='legacy',
+                    compress=True):
+    """Get the path of the artifact of a query log in directory, keyed by the generation inputs."""
+    key = hashlib.sha256(json.dumps(
+        [hashFile(queryLog), str(seed), store, triples, maxTriplesPerQuery, mode, compress]
+    ).encode()).hexdigest()
+    return os.path.join(directory, "{}.qlog".format(key))
+
+
+def getOperation(query):
+    """Get insert or delete by the update operation of query.
+
+    The query types of lsbm are swapped.
+    """
+    match = operationPattern.search(query)
+    return match.group(1).lower() if match else None
+
+
+def compileQueryLog(path, queryLog, seed, store, triples, maxTriplesPerQuery, mode='legacy',
+                    compress=True):
+    """Generate the operations of a query log with lsbm and write them to an artifact at path.
+
+    The artifact starts with a JSON header with the parameters of the generation and the statement
+    counts, followed by one record per operation: its type, the length of the query and the query,
+    optionally compressed with zlib. The artifact is written to a temporary file and moved to path,
+    so concurrent compilations of the same artifact don't interfere.
+    """
+    from lsbm import lsbm
+    lsbm_instance = lsbm("urn:bsbm", store, maxTriplesPerQuery, mode)
+    lsbm_instance.prepare(triples, queryLog, seed)
+    operations = lsbm_instance.queryList
+
+    header = {
+        "seed": str(seed),
+        "store": store,
+        "queryLog": os.path.abspath(queryLog),
+        "queryLogHash": hashFile(queryLog),
+        "statements": triples,
+        "maxTriplesPerQuery": maxTriplesPerQuery,
+        "mode": mode,
+        "operations": len(operations),
+        "inserts": sum(1 for query_type, query in operations if getOperation(query) == "insert"),
+        "deletes": sum(1 for query_type, query in operations if getOperation(query) == "delete"),
+        "compression": "zlib" if compress else None
+    }
+    encodedHeader = json.dumps(header, sort_keys=True).encode()
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    handle, temporaryPath = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(handle, 'wb') as artifact:
+            artifact.write(magic)
+            artifact.write(headerLength.pack(len(encodedHeader)))
+            artifact.write(encodedHeader)
+            for query_type, query in operations:
+                payload = query.encode('utf-8')
+                if compress:
+                    payload = zlib.compress(payload)
+                artifact.write(recordHeader.pack(queryTypes.index(query_type), len(payload)))
+                artifact.write(payload)
+        os.replace(temporaryPath, path)
+    except BaseException:
+        os.remove(temporaryPath)
+        raise
+    logger.info("Compiled {} operations of {} for {} into {}".format(
+        len(operations), queryLog, store, path))
+    return header
+
+
+class QueryLogArtifact:
+    """A compiled query log, which is memory mapped and iterated as (query_type, query)."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(magic)] != magic:
+            self.close()
+            raise ValueError("{} is no query log artifact".format(path))
+        length, = headerLength.unpack_from(self.map, len(magic))
+        self.offset = len(magic) + headerLength.size
+        self.header = json.loads(self.map[self.offset:self.offset + length].decode())
+        self.offset += length
+
+    def __len__(self):
+        return self.header["operations"]
+
+    def __iter__(self):
+        position = self.offset
+        compressed = self.header["compression"] == "zlib"
+        while position < len(self.map):
+            typeIndex, length = recordHeader.unpack_from(self.map, position)
+            position += recordHeader.size
+            payload = self.map[position:position + length]
+            position += length
+            if compressed:
+                payload = zlib.decompress(payload)
+            yield queryTypes[typeIndex], payload.decode('utf-8')
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(
+        description='Compile a query log into an artifact or show its header')
+    subparsers = argparser.add_subparsers(dest='command')
+    compileParser = subparsers.add_parser('compile')
+    compileParser.add_argument('queryLog', type=str)
+    compileParser.add_argument('artifact', type=str)
+    compileParser.add_argument('-s', '--seed', type=str, default='default')
+    compileParser.add_argument('-st', '--storeType', type=str, default='quit')
+    compileParser.add_argument('-n', '--numberOfStatements', type=int, default=100000)
+    compileParser.add_argument('--maxTriplesPerQuery', type=int, default=150)
+    compileParser.add_argument('-m', '--mode', type=str, default='legacy',
+                               choices=['legacy', 'indexed'])
+    compileParser.add_argument('--uncompressed', action='store_true')
+    infoParser = subparsers.add_parser('info')
+    infoParser.add_argument('artifact', type=str)
+    args = argparser.parse_args()
+
+    if args.command == 'compile':
+        header = compileQueryLog(args.artifact, args.queryLog, args.seed, args.storeType,
+                                 args.numberOfStatements, args.maxTriplesPerQuery, args.mode,
+                                 not args.uncompressed)
+        print(json.dumps(header, indent=2, sort_keys=True))
+    elif args.command == 'info':
+        with QueryLogArtifact(args.artifact) as artifact:
+            print(json.dumps(artifact.header, indent=2, sort_keys=True))
+    else:
+        argparser.print_help()
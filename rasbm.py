@@ -4,9 +4,11 @@ import time
 import logging
 import sys
 import os
+import argparse
 from bsqbm import Execution, ScenarioReader, BSQBMRunner, QuitDockerExecution, QuitExecution, main as bsqbmMain
 from bsqbm import R43plesExecution, R43plesDockerExecution, RawbaseDockerExecution
 from evaluator import QueryLogExecuter, RandomAccessExecuter
+from querylog import getArtifactPath
 
 logger = logging.getLogger('quit-eval.rasbm')
 logger.setLevel(logging.DEBUG)
@@ -29,12 +31,42 @@ class RandomAccessExecution(Execution):
     """Execute Random Access Queries or a BSBM Query Log on supported Backends."""
 
     logger = logging.getLogger('quit-eval.rasbm.ra-execution')
-    default_endpoints = {'query': {'quit': 'http://localhost:5000/sparql/{revision}',
-                                   'r43ples': 'http://localhost:8080/r43ples/sparql',
-                                   'rawbase': 'http://localhost:8080/rawbase/sparql'},
-                         'update': {'quit': 'http://localhost:5000/sparql',
-                                    'r43ples': 'http://localhost:8080/r43ples/sparql',
-                                    'rawbase': 'http://localhost:8080/rawbase/update'}}
+    rasbmConcurrency = 1
+    rasbmBatchSize = 1
+    queryLogArtifacts = None
+    queryLogMode = 'legacy'
+    rasbmDistribution = 'uniform'
+    rasbmDistributionParameters = None
+    rawbaseVerifyInterval = 100
+    rasbmVirtuoso = None
+    default_endpoints = {'query': {'quit': '/sparql/{revision}',
+                                   'r43ples': '/r43ples/sparql',
+                                   'rawbase': '/rawbase/sparql'},
+                         'update': {'quit': '/sparql',
+                                    'r43ples': '/r43ples/sparql',
+                                    'rawbase': '/rawbase/update'}}
+
+    def getStoreEndpoint(self, kind):
+        return self.getEndpoint(self.default_endpoints[kind][self.store])
+
+    def getVirtuosoEndpoint(self):
+        """Get the configured Virtuoso endpoint or the one published by the R&Wbase container."""
+        if self.rasbmVirtuoso is not None:
+            return self.rasbmVirtuoso
+        return 'http://{}:{}/sparql'.format(self.storeHost, getattr(self, 'virtuosoPort', 8890))
+
+    def getFailure(self):
+        """Get the reason why the finished execution failed or None.
+
+        The executers write no BSBM result, so only the store is checked.
+        """
+        if hasattr(self, "storeProcess") and self.storeProcess.poll() is not None:
+            return "the store exited with {}".format(self.storeProcess.returncode)
+        return None
+
+    def run(self, block=False):
+        # the executers run synchronously in runBSBM, there is no BSBM process to wait for
+        super().run(False)
 
     def runBSBM(self):
         self.logger.info('Starting RASBM with mode {}'.format(self.evalMode))
@@ -49,8 +81,16 @@ class RandomAccessExecution(Execution):
     def runQueryLog(self):
         self.logger.info("Query Log Execution")
         self.logger.info("store: {}".format(self.store))
+        if self.store == 'r43ples' and int(self.rasbmBatchSize) > 1:
+            # each operation is prefixed with USER and MESSAGE, they can't be joined into one update
+            raise Exception("R43ples does not support batches, use rasbmBatchSize: 1")
+        artifact = None
+        if self.queryLogArtifacts is not None:
+            artifact = getArtifactPath(self.queryLogArtifacts, self.bsbmQueryLogFile,
+                                       self.bsbmQueryLogSeed, self.store, self.bsbmQueryLogTriples,
+                                       self.rasbmMaxTriplesPerQuery, self.queryLogMode)
         ql = QueryLogExecuter(
-            endpoint=self.default_endpoints['update'][self.store],  # endpoint
+            endpoint=self.getStoreEndpoint('update'),  # endpoint
             logDir=os.path.abspath(self.logPath),  # log dir
             queryLog=self.bsbmQueryLogFile,  # query log file
             queryLogSeed=self.bsbmQueryLogSeed,  # query log seed
@@ -58,16 +98,24 @@ class RandomAccessExecution(Execution):
             store=self.store,  # store
             triples=self.bsbmQueryLogTriples,  # amount of triples that will be picked
             maxTriplesPerQuery=self.rasbmMaxTriplesPerQuery,  # amount of triples that will be picked
-            virtuoso=self.rasbmVirtuoso)  # virtuoso
+            virtuoso=self.getVirtuosoEndpoint(),  # virtuoso
+            artifact=artifact,  # compiled query log
+            queryLogMode=self.queryLogMode)  # generation mode of lsbm
 
         self.logger.debug("Start QueryLogExecuter for {}".format(
             self.store))
 
         if self.store == 'rawbase':
             requestMethod = ql.rawbaseUpdateRequest
+            ql.rawbaseVerifyInterval = self.rawbaseVerifyInterval
         else:
             requestMethod = ql.postRequest
-        ql.run(requestMethod)
+        self.configureLoad(ql)
+        ql.batchSize = self.rasbmBatchSize
+        try:
+            ql.run(requestMethod)
+        finally:
+            ql.close()
 
 
     def runRandomAccess(self):
@@ -75,7 +123,7 @@ class RandomAccessExecution(Execution):
         self.logger.info("Platform: {}".format(self.store))
         if self.store == 'quit':
             ra = RandomAccessExecuter(
-                endpoint=self.default_endpoints['query'][self.store],  # endpoint
+                endpoint=self.getStoreEndpoint('query'),  # endpoint
                 store=self.store,  # store
                 queries=self.rasbmQueryExecutions,  # number of queries
                 logDir=os.path.abspath(self.logPath),  # log dir
@@ -83,7 +131,7 @@ class RandomAccessExecution(Execution):
             requestMethod = ra.postRequest
         elif self.store == 'r43ples':
             ra = RandomAccessExecuter(
-                endpoint=self.default_endpoints['query'][self.store],  # endpoint
+                endpoint=self.getStoreEndpoint('query'),  # endpoint
                 store=self.store,  # store
                 queries=self.rasbmQueryExecutions,  # number of queries
                 logDir=os.path.abspath(self.logPath))  # log dir
@@ -91,28 +139,41 @@ class RandomAccessExecution(Execution):
         elif self.store == 'rawbase':
             self.repodir = os.path.abspath(os.path.join(self.logPath, 'repo')),  # log dir
             ra = RandomAccessExecuter(
-                endpoint=self.default_endpoints['query'][self.store],  # endpoint
+                endpoint=self.getStoreEndpoint('query'),  # endpoint
                 store=self.store,  # store
                 queries=self.rasbmQueryExecutions,  # number of queries
-                virtuoso=self.rasbmVirtuoso,  # virtuoso
+                virtuoso=self.getVirtuosoEndpoint(),  # virtuoso
                 logDir=os.path.abspath(self.logPath))  # log dir
             requestMethod = ra.rawbaseQueryRequest
 
         self.logger.debug("Start Random Access for {}".format(
             self.store))
-        retryCounter = 0
-        while True:
-            try:
-                ra.getRevisions()
-                break
-            except Exception as e:
-                print(e)
-                if retryCounter > 10:
-                    raise e
-                print("try to sleep and hope verything is fine tomorrow")
-                time.sleep(2**retryCounter)
-                retryCounter += 1
-        ra.run(requestMethod)
+        ra.distribution = self.rasbmDistribution
+        ra.distributionParameters = self.rasbmDistributionParameters
+        try:
+            retryCounter = 0
+            while True:
+                try:
+                    ra.getRevisions()
+                    break
+                except Exception as e:
+                    print(e)
+                    if retryCounter > 10:
+                        raise e
+                    print("try to sleep and hope verything is fine tomorrow")
+                    time.sleep(2**retryCounter)
+                    retryCounter += 1
+            self.configureLoad(ra)
+            ra.concurrency = self.rasbmConcurrency
+            ra.run(requestMethod)
+        finally:
+            ra.close()
+
+    def configureLoad(self, executer):
+        """Switch the executer to the open-loop mode, if a rate is configured."""
+        executer.openLoopRate = self.openLoopRate
+        executer.openLoopArrival = self.openLoopArrival
+        executer.openLoopWorkers = self.openLoopWorkers
 
     def __del__(self):
         if self.running:
@@ -178,6 +239,7 @@ class RaScenarioReader(ScenarioReader):
         resultDirectory = os.path.abspath(
             os.path.join(basePath, docs["resultDirectory"]))
         generalConfig["resultDirectory"] = resultDirectory
+        self.readRunnerConfig(docs, generalConfig)
 
         bsbmLocation = docs["bsbmLocation"]
         executable = None
@@ -200,11 +262,18 @@ class RaScenarioReader(ScenarioReader):
         repoDir = docs["repoDir"] if "repoDir" in docs else None
         rasbmMaxTriplesPerQuery = docs["rasbmMaxTriplesPerQuery"] if "rasbmMaxTriplesPerQuery" in docs else 150
         rasbmQueryExecutions = docs["rasbmQueryExecutions"] if "rasbmQueryExecutions" in docs else 1000
-        rasbmVirtuoso = docs["rasbmVirtuoso"] if "rasbmVirtuoso" in docs else 'http://localhost:8890/sparql'
+        rasbmConcurrency = docs["rasbmConcurrency"] if "rasbmConcurrency" in docs else 1
+        rasbmDistribution = docs["rasbmDistribution"] if "rasbmDistribution" in docs else 'uniform'
+        rasbmDistributionParameters = docs[
+            "rasbmDistributionParameters"] if "rasbmDistributionParameters" in docs else None
+        # without rasbmVirtuoso the port published by the R&Wbase container is used
+        rasbmVirtuoso = docs["rasbmVirtuoso"] if "rasbmVirtuoso" in docs else None
+        rawbaseVerifyInterval = docs[
+            "rawbaseVerifyInterval"] if "rawbaseVerifyInterval" in docs else 100
         if "executionType" in docs:
             store = rasbmMode[docs["executionType"].lower()]
 
-        repetitions = docs["repetitions"] if "repetitions" in docs else "3"
+        repetitions = self.getRepetitions(docs, generalConfig)
         bsbmRuns = docs["bsbmRuns"] if "bsbmRuns" in docs else "100"
         bsbmWarmup = docs["bsbmWarmup"] if "bsbmWarmup" in docs else "5"
 
@@ -213,17 +282,42 @@ class RaScenarioReader(ScenarioReader):
 
         bareRepo = docs["bareRepo"] if "bareRepo" in docs else False
         profiling = docs["profiling"] if "profiling" in docs else False
+        readinessTimeout = docs["readinessTimeout"] if "readinessTimeout" in docs else 120
+        prepareMemory = docs["prepareMemory"] if "prepareMemory" in docs else 256
+        prepareUnique = docs["prepareUnique"] if "prepareUnique" in docs else False
+        monitorInterval = docs["monitorInterval"] if "monitorInterval" in docs else 1
+        monitorDetails = docs["monitorDetails"] if "monitorDetails" in docs else False
+        ioInterval = docs["ioInterval"] if "ioInterval" in docs else None
+        cgroupRoot = docs["cgroupRoot"] if "cgroupRoot" in docs else '/sys/fs/cgroup'
+        profilingRate = docs["profilingRate"] if "profilingRate" in docs else 100
+        repositoryCache = docs["repositoryCache"] if "repositoryCache" in docs else None
+        repositoryCacheSize = docs["repositoryCacheSize"] if "repositoryCacheSize" in docs else None
+        if repositoryCache is not None:
+            repositoryCache = os.path.abspath(os.path.join(basePath, repositoryCache))
+        queryLogArtifacts = docs["queryLogArtifacts"] if "queryLogArtifacts" in docs else None
+        queryLogMode = docs["queryLogMode"] if "queryLogMode" in docs else 'legacy'
+        if queryLogArtifacts is not None:
+            queryLogArtifacts = os.path.abspath(os.path.join(basePath, queryLogArtifacts))
         docker = docs["docker"] if "docker" in docs else False
         executionType = docs["executionType"] if "executionType" in docs else "Quit"
         two_graphs = docs["two_graphs"] if "two_graphs" in docs else False
         usecase = docs["usecase"] if "usecase" in docs else False
+        openLoopRate = docs["openLoopRate"] if "openLoopRate" in docs else None
+        openLoopArrival = docs["openLoopArrival"] if "openLoopArrival" in docs else 'fixed'
+        openLoopWorkers = docs["openLoopWorkers"] if "openLoopWorkers" in docs else 64
+        rasbmBatchSize = docs["rasbmBatchSize"] if "rasbmBatchSize" in docs else None
+        expandedScenarios = self.expandLevels(
+            docs["scenarios"], "openLoopRate", openLoopRate, "{}-r{}", "openLoopRate")
+        expandedScenarios = self.expandLevels(
+            expandedScenarios, "rasbmBatchSize", rasbmBatchSize, "{}-b{}", "rasbmBatchSize")
 
         for repetition in range(1, repetitions + 1):
-            for scenario in docs["scenarios"]:
+            for scenario in expandedScenarios:
                 self.logger.debug(
                     "scenario items: {}".format(scenario.items()))
                 for runName, runConfig in scenario.items():
 
+                    setupName = "quit-" + runName
                     runName = runName + "-" + str(repetition)
 
                     # these lines could go into a factory
@@ -251,6 +345,8 @@ class RaScenarioReader(ScenarioReader):
                         "quit-" + runName, runDirectory, runConfig)
 
                     execution.runName = "quit-" + runName
+                    execution.setupName = setupName
+                    execution.repetition = repetition
 
                     if uc:
                         execution.usecase = uc
@@ -279,8 +375,24 @@ class RaScenarioReader(ScenarioReader):
                         "rasbmMaxTriplesPerQuery"] if "rasbmMaxTriplesPerQuery" in runConfig else rasbmMaxTriplesPerQuery
                     execution.rasbmQueryExecutions = runConfig[
                         "rasbmQueryExecutions"] if "rasbmQueryExecutions" in runConfig else rasbmQueryExecutions
+                    execution.rasbmBatchSize = runConfig[
+                        "rasbmBatchSize"] if "rasbmBatchSize" in runConfig else 1
+                    execution.rasbmConcurrency = runConfig[
+                        "rasbmConcurrency"] if "rasbmConcurrency" in runConfig else rasbmConcurrency
+                    execution.rasbmDistribution = runConfig[
+                        "rasbmDistribution"] if (
+                        "rasbmDistribution") in runConfig else rasbmDistribution
+                    execution.rasbmDistributionParameters = runConfig[
+                        "rasbmDistributionParameters"] if (
+                        "rasbmDistributionParameters") in runConfig else rasbmDistributionParameters
                     execution.rasbmVirtuoso = runConfig[
                         "rasbmVirtuoso"] if "rasbmVirtuoso" in runConfig else rasbmVirtuoso
+                    execution.rawbaseVerifyInterval = rawbaseVerifyInterval
+                    execution.openLoopRate = runConfig[
+                        "openLoopRate"] if "openLoopRate" in runConfig else None
+                    execution.openLoopArrival = runConfig[
+                        "openLoopArrival"] if "openLoopArrival" in runConfig else openLoopArrival
+                    execution.openLoopWorkers = openLoopWorkers
                     execution.executable = runConfig[
                         "executable"] if "executable" in runConfig else executable
                     if "executionType" in runConfig:
@@ -308,6 +420,23 @@ class RaScenarioReader(ScenarioReader):
                         "bareRepo") in runConfig else bareRepo
                     execution.profiling = runConfig["profiling"] if (
                         "profiling") in runConfig else profiling
+                    execution.readinessTimeout = runConfig["readinessTimeout"] if (
+                        "readinessTimeout") in runConfig else readinessTimeout
+                    execution.prepareMemory = prepareMemory
+                    execution.prepareUnique = prepareUnique
+                    execution.monitorInterval = runConfig["monitorInterval"] if (
+                        "monitorInterval") in runConfig else monitorInterval
+                    execution.monitorDetails = runConfig["monitorDetails"] if (
+                        "monitorDetails") in runConfig else monitorDetails
+                    execution.ioInterval = runConfig["ioInterval"] if (
+                        "ioInterval") in runConfig else ioInterval
+                    execution.cgroupRoot = cgroupRoot
+                    execution.profilingRate = profilingRate
+                    execution.repositoryCache = repositoryCache
+                    execution.repositoryCacheSize = repositoryCacheSize
+                    execution.queryLogArtifacts = queryLogArtifacts
+                    execution.queryLogMode = runConfig[
+                        "queryLogMode"] if "queryLogMode" in runConfig else queryLogMode
 
                     scenarios.append(execution)
 
@@ -319,9 +448,10 @@ if __name__ == '__main__':
     # ch.setLevel(logging.DEBUG)
     # logger.addHandler(ch)
 
-    if (len(sys.argv) < 2):
-        logger.error("You need to specify a scenario")
-        sys.exit(1)
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument('scenario', type=str, help='The scenario description')
+    argparser.add_argument('--resume', action='store_true',
+                           help='Continue the scenario in an existing result directory')
+    args = argparser.parse_args()
 
-    scenarioPath = sys.argv[1]
-    bsqbmMain(scenarioPath, RaScenarioReader(), BSQBMRunner())
+    bsqbmMain(args.scenario, RaScenarioReader(), BSQBMRunner(), args.resume)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+import csv
+import time
+import logging
+import threading
+from transport import transport as defaultTransport
+
+provenancePattern = """prefix prov: <http://www.w3.org/ns/prov#>
+prefix xsd: <http://www.w3.org/2001/XMLSchema#>
+select ?entity ?time where {{
+    graph <urn:rawbase:provenance> {{
+        ?entity a prov:Entity. ?activity prov:generated ?entity ; prov:atTime ?time
+    }}
+    {filter}
+}} order by desc(?time) limit 1"""
+
+
+class RawbaseHead:
+    """Track the head revision of R&Wbase locally instead of querying it before every update.
+
+    The head is looked up once with a full query on the provenance graph. After an update the new
+    head is taken from the rwb-version header of the response, if R&Wbase sends it, or otherwise
+    looked up incrementally, restricted to revisions not older than the known head. Every
+    verifyInterval updates the head is compared to the result of the full query.
+    The time spent in lookups is accounted separately from the updates.
+    """
+
+    logger = logging.getLogger('quit-eval.rawbase')
+
+    def __init__(self, virtuoso, verifyInterval=100, transport=None):
+        self.virtuoso = virtuoso
+        self.verifyInterval = verifyInterval
+        self.transport = transport or defaultTransport
+        self.revision = None
+        self.time = None
+        self.updates = 0
+        self.lock = threading.Lock()
+        self.statistics = {"lookups": 0, "incremental": 0, "fromResponse": 0, "verifications": 0,
+                           "mismatches": 0, "lookupNs": 0}
+
+    def lookup(self, incremental=False):
+        """Query the latest revision and its time, return None for both, if there is none."""
+        queryFilter = ''
+        if incremental and self.time is not None:
+            queryFilter = 'filter (?time >= "{}"^^xsd:dateTime)'.format(self.time)
+        start = time.perf_counter_ns()
+        response = self.transport.post(self.virtuoso,
+                                       data={'query': provenancePattern.format(filter=queryFilter)},
+                                       headers={'Accept': 'text/csv'}, idempotent=True)
+        self.statistics["lookupNs"] += time.perf_counter_ns() - start
+        self.statistics["lookups"] += 1
+        rows = list(csv.reader(response.text.splitlines()))
+        if len(rows) < 2 or not rows[1]:
+            return None, None
+        return rows[1][0], rows[1][1] if len(rows[1]) > 1 else None
+
+    def seed(self):
+        self.revision, self.time = self.lookup()
+        self.logger.debug("Head of R&Wbase is {}".format(self.revision))
+
+    def getParent(self):
+        """Get the revision the next update has to be based on."""
+        with self.lock:
+            if self.revision is None:
+                self.seed()
+            return self.revision if self.revision is not None else ""
+
+    def advance(self, response):
+        """Update the head after an update with response was executed."""
+        with self.lock:
+            self.updates += 1
+            headers = {name.lower(): value for name, value in response.headers.items()}
+            if 'rwb-version' in headers:
+                self.revision = headers['rwb-version']
+                self.statistics["fromResponse"] += 1
+            else:
+                revision, revisionTime = self.lookup(incremental=True)
+                self.statistics["incremental"] += 1
+                if revision is None:
+                    self.seed()
+                else:
+                    self.revision, self.time = revision, revisionTime
+            if self.verifyInterval and self.updates % self.verifyInterval == 0:
+                self.verify()
+
+    def verify(self):
+        known = self.revision
+        self.seed()
+        self.statistics["verifications"] += 1
+        if known != self.revision:
+            self.statistics["mismatches"] += 1
+            self.logger.warning(
+                "Tracked head {} differs from the head {} of R&Wbase after {} updates".format(
+                    known, self.revision, self.updates))
+
+    def writeStatistics(self, path):
+        """Append the number of head lookups and the time spent in them to path."""
+        with self.lock:
+            statistics = dict(self.statistics, updates=self.updates)
+        with open(path, 'a') as statisticsFile:
+            statisticsFile.write(
+                "updates={updates} lookups={lookups} incremental={incremental} "
+                "fromResponse={fromResponse} verifications={verifications} "
+                "mismatches={mismatches} lookup_ns={lookupNs}\n".format(**statistics))
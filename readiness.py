@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import socket
+import logging
+import subprocess
+import requests
+
+logger = logging.getLogger('quit-eval.readiness')
+
+
+def waitForEndpoint(endpoint, timeout=120, process=None, query='ASK {}', interval=0.1,
+                    maxInterval=2):
+    """Poll a SPARQL endpoint with a cheap query until it answers.
+
+    The interval between two probes is doubled after each failed probe up to maxInterval.
+    If process is given, waiting is aborted as soon as the process exits.
+    Returns the seconds until the endpoint was ready.
+    """
+    start = time.monotonic()
+    attempts = 0
+    while True:
+        attempts += 1
+        try:
+            res = requests.post(
+                endpoint,
+                data={'query': query},
+                headers={'Accept': 'application/sparql-results+json'},
+                timeout=max(interval, 1))
+            if res.status_code == 200:
+                ready = time.monotonic() - start
+                logger.debug("{} is ready after {:.3f}s ({} probes)".format(
+                    endpoint, ready, attempts))
+                return ready
+            logger.debug("{} answered with {}".format(endpoint, res.status_code))
+        except requests.exceptions.RequestException:
+            pass
+        if process is not None and process.poll() is not None:
+            raise Exception("Process {} exited with {} before {} was ready".format(
+                process.pid, process.poll(), endpoint))
+        if time.monotonic() - start > timeout:
+            raise TimeoutError("{} was not ready after {}s".format(endpoint, timeout))
+        time.sleep(interval)
+        interval = min(interval * 2, maxInterval)
+
+
+def waitForContainerRemoval(name, timeout=60, interval=0.1, maxInterval=1):
+    """Wait until a docker container does not exist anymore and return the seconds it took."""
+    start = time.monotonic()
+    while True:
+        inspect = subprocess.run(['docker', 'inspect', name],
+                                 stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        if inspect.returncode != 0:
+            return time.monotonic() - start
+        if time.monotonic() - start > timeout:
+            raise TimeoutError("Container {} was not removed after {}s".format(name, timeout))
+        time.sleep(interval)
+        interval = min(interval * 2, maxInterval)
+
+
+def waitForPortRelease(port, timeout=60, interval=0.1, maxInterval=1):
+    """Wait until a port can be bound again and return the seconds it took."""
+    start = time.monotonic()
+    while True:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as probe:
+            try:
+                probe.bind(('', port))
+                return time.monotonic() - start
+            except OSError:
+                pass
+        if time.monotonic() - start > timeout:
+            raise TimeoutError("Port {} was not released after {}s".format(port, timeout))
+        time.sleep(interval)
+        interval = min(interval * 2, maxInterval)
+
+
+def recordReadiness(logPath, phase, seconds):
+    """Append a measured waiting time to the readiness.log of a run."""
+    with open(os.path.join(logPath, "readiness.log"), "a") as readinessLog:
+        readinessLog.write("{} {} {}\n".format(
+            float(round(time.time() * 1000) / 1000), phase, seconds))
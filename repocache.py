@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import json
+import fcntl
+import shutil
+import hashlib
+import logging
+
+# ioctl to share the extents of a file on copy-on-write file systems (btrfs, xfs)
+FICLONE = 0x40049409
+
+fileHashes = {}
+
+
+def hashFile(path):
+    """Get the sha256 of a file, the result is remembered as long as the file is not modified."""
+    stat = os.stat(path)
+    identifier = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if identifier not in fileHashes:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as hashedFile:
+            for block in iter(lambda: hashedFile.read(1024 * 1024), b''):
+                digest.update(block)
+        fileHashes[identifier] = digest.hexdigest()
+    return fileHashes[identifier]
+
+
+def reflinkOrCopy(source, target):
+    """Copy a file, sharing its extents if the file system supports reflinks."""
+    try:
+        with open(source, 'rb') as sourceFile, open(target, 'wb') as targetFile:
+            fcntl.ioctl(targetFile.fileno(), FICLONE, sourceFile.fileno())
+        shutil.copystat(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def directorySize(path):
+    size = 0
+    for dirpath, dirnames, filenames in os.walk(path):
+        for f in filenames:
+            size += os.path.getsize(os.path.join(dirpath, f))
+    return size
+
+
+class RepositoryCache:
+    """A content addressed store of prepared initial repositories.
+
+    Each entry is a directory named by the hash of the input files and preparation options.
+    Git objects of an entry are immutable and thus hardlinked into the clones, all other files
+    (working tree, index, refs) are reflinked or copied, since the store modifies them.
+    """
+
+    logger = logging.getLogger('quit-eval.repocache')
+
+    def __init__(self, cacheDirectory, maxSize=None):
+        self.cacheDirectory = os.path.abspath(cacheDirectory)
+        self.maxSize = maxSize
+        os.makedirs(self.cacheDirectory, exist_ok=True)
+
+    def getKey(self, files, options):
+        digest = hashlib.sha256()
+        for path in files:
+            digest.update(hashFile(path).encode())
+        digest.update(json.dumps(options, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def entryPath(self, key):
+        return os.path.join(self.cacheDirectory, key)
+
+    def clone(self, key, target):
+        """Clone the entry key to target, return False if there is no such entry."""
+        entry = self.entryPath(key)
+        if not os.path.exists(os.path.join(entry, "entry.json")):
+            return False
+        start = time.time()
+        repository = os.path.join(entry, "repository")
+        for dirpath, dirnames, filenames in os.walk(repository):
+            relative = os.path.relpath(dirpath, repository)
+            os.makedirs(os.path.join(target, relative), exist_ok=True)
+            immutable = relative.split(os.sep)[:2] == ['.git', 'objects']
+            for f in filenames:
+                source = os.path.join(dirpath, f)
+                destination = os.path.join(target, relative, f)
+                if immutable:
+                    try:
+                        os.link(source, destination)
+                        continue
+                    except OSError:
+                        pass
+                reflinkOrCopy(source, destination)
+        os.utime(os.path.join(entry, "entry.json"))
+        self.logger.debug("Cloned {} to {} in {:.3f}s".format(key, target, time.time() - start))
+        return True
+
+    def store(self, key, source, options=None):
+        """Add the prepared repository at source as entry key and evict old entries."""
+        entry = self.entryPath(key)
+        if os.path.exists(entry):
+            return
+        temporary = entry + ".tmp-{}".format(os.getpid())
+        shutil.copytree(os.path.abspath(source), os.path.join(temporary, "repository"),
+                        symlinks=True)
+        with open(os.path.join(temporary, "entry.json"), "w") as entryFile:
+            json.dump({"options": options, "size": directorySize(temporary)}, entryFile)
+        os.rename(temporary, entry)
+        self.logger.debug("Stored {} as {}".format(source, key))
+        self.evict(keep=key)
+
+    def evict(self, keep=None):
+        """Remove the least recently used entries until the cache fits into maxSize bytes."""
+        if self.maxSize is None:
+            return
+        entries = []
+        for key in os.listdir(self.cacheDirectory):
+            entryFile = os.path.join(self.entryPath(key), "entry.json")
+            if not os.path.exists(entryFile):
+                continue
+            with open(entryFile, "r") as entryStream:
+                size = json.load(entryStream)["size"]
+            entries.append((os.path.getmtime(entryFile), key, size))
+        total = sum(size for used, key, size in entries)
+        for used, key, size in sorted(entries):
+            if total <= self.maxSize:
+                break
+            if key == keep:
+                continue
+            self.logger.debug("Evict {} ({} bytes)".format(key, size))
+            shutil.rmtree(self.entryPath(key))
+            total -= size
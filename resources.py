@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import logging
+import psutil
+
+
+class SizeTracker:
+    """Track the size of a directory tree incrementally.
+
+    The size of every file and directory is kept in a map. On each update only directories whose
+    mtime changed are listed again. Files are stat'ed on every update, since they can be modified
+    in place, except for files below immutable paths (the git object store), which are never
+    stat'ed again. Temporary files (tmp_*) of git are always considered mutable.
+    Every rescanInterval seconds a full rescan corrects anything which might have been missed.
+    """
+
+    logger = logging.getLogger('quit-eval.sizetracker')
+
+    def __init__(self, path, rescanInterval=60,
+                 immutable=(os.path.join('.git', 'objects'), 'objects')):
+        self.path = os.path.abspath(path)
+        self.rescanInterval = rescanInterval
+        self.immutable = tuple(os.path.join(self.path, prefix) for prefix in immutable)
+        self.rescan()
+
+    def rescan(self):
+        self.entries = {}
+        self.children = {}
+        self.mtimes = {}
+        self.mutableFiles = set()
+        self.apparent = 0
+        self.allocated = 0
+        self.lastRescan = time.monotonic()
+        try:
+            self.scanDirectory(self.path, os.stat(self.path))
+        except FileNotFoundError:
+            pass
+
+    def isImmutable(self, path):
+        return path.startswith(self.immutable) and not os.path.basename(path).startswith('tmp_')
+
+    def setEntry(self, path, stat):
+        size, blocks = self.entries.get(path, (0, 0))
+        self.apparent += stat.st_size - size
+        self.allocated += stat.st_blocks * 512 - blocks
+        self.entries[path] = (stat.st_size, stat.st_blocks * 512)
+
+    def removeTree(self, path):
+        for child in self.children.pop(path, ()):
+            self.removeTree(child)
+        self.mtimes.pop(path, None)
+        self.mutableFiles.discard(path)
+        size, blocks = self.entries.pop(path, (0, 0))
+        self.apparent -= size
+        self.allocated -= blocks
+
+    def scanDirectory(self, path, stat):
+        self.setEntry(path, stat)
+        self.mtimes[path] = stat.st_mtime_ns
+        self.children[path] = set()
+        self.listDirectory(path)
+
+    def listDirectory(self, path):
+        current = {}
+        with os.scandir(path) as listing:
+            for entry in listing:
+                current[entry.path] = entry
+        for gone in self.children[path] - current.keys():
+            self.removeTree(gone)
+        self.children[path] = set(current.keys())
+        for childPath, entry in current.items():
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if childPath not in self.mtimes:
+                        self.scanDirectory(childPath, entry.stat(follow_symlinks=False))
+                elif childPath not in self.entries:
+                    self.setEntry(childPath, entry.stat(follow_symlinks=False))
+                    if not self.isImmutable(childPath):
+                        self.mutableFiles.add(childPath)
+            except FileNotFoundError:
+                self.children[path].discard(childPath)
+                self.removeTree(childPath)
+
+    def update(self):
+        """Update the map and return the apparent and the allocated size in KiB."""
+        if time.monotonic() - self.lastRescan > self.rescanInterval:
+            self.rescan()
+            return self.apparent / 1024, self.allocated / 1024
+        for path in list(self.mtimes.keys()):
+            if path not in self.mtimes:
+                # was removed together with its parent
+                continue
+            try:
+                stat = os.stat(path)
+                self.setEntry(path, stat)
+                if stat.st_mtime_ns != self.mtimes[path]:
+                    self.mtimes[path] = stat.st_mtime_ns
+                    self.listDirectory(path)
+            except FileNotFoundError:
+                self.logger.debug("{} disappeared, will rescan".format(path))
+                self.rescan()
+                return self.apparent / 1024, self.allocated / 1024
+        for path in list(self.mutableFiles):
+            try:
+                self.setEntry(path, os.stat(path))
+            except FileNotFoundError:
+                # the listing of its parent will notice the removal on the next update
+                size, blocks = self.entries.pop(path, (0, 0))
+                self.apparent -= size
+                self.allocated -= blocks
+                self.mutableFiles.discard(path)
+        return self.apparent / 1024, self.allocated / 1024
+
+
+class ProcessTree:
+    """Follow a process and all of its descendants.
+
+    Processes are identified by pid and create time, so a reused pid is detected as a new process.
+    """
+
+    def __init__(self, pid):
+        self.root = psutil.Process(pid)
+        self.known = {}
+
+    def update(self):
+        """Discover the current tree, return the processes, the started and the exited processes."""
+        try:
+            current = [self.root] + self.root.children(recursive=True)
+        except psutil.Error:
+            current = []
+        processes = {}
+        for process in current:
+            try:
+                key = (process.pid, process.create_time())
+            except psutil.Error:
+                continue
+            processes[key] = self.known.get(key, process)
+        started = [process for key, process in processes.items() if key not in self.known]
+        exited = [process for key, process in self.known.items() if key not in processes]
+        self.known = processes
+        return list(processes.values()), started, exited
+
+
+class ProcessSampler:
+    """Sample the detailed resource usage of a set of processes.
+
+    The values of all processes are summed up. Cheap values are read with a single
+    psutil.oneshot() per process, USS and PSS are read from /proc/<pid>/smaps_rollup instead of
+    walking all mappings in /proc/<pid>/smaps.
+    Like in IoCounter the last cumulative counters of every process are kept after it exited.
+    Values which can not be read are reported as NaN.
+    """
+
+    columns = ["utime", "stime", "uss", "pss", "rbytes", "wbytes", "vctx", "ictx", "threads", "fds"]
+    cumulativeColumns = ["utime", "stime", "rbytes", "wbytes", "vctx", "ictx"]
+
+    def __init__(self):
+        self.counters = {}
+
+    def readSmapsRollup(self, pid):
+        """Return USS and PSS in KiB."""
+        uss = 0
+        pss = 0
+        with open("/proc/{}/smaps_rollup".format(pid), "r") as rollup:
+            for line in rollup:
+                fields = line.split()
+                if fields[0] == "Pss:":
+                    pss = int(fields[1])
+                elif fields[0] in ("Private_Clean:", "Private_Dirty:", "Private_Hugetlb:"):
+                    uss += int(fields[1])
+        return uss, pss
+
+    def sampleProcess(self, process):
+        values = {}
+        try:
+            with process.oneshot():
+                cpu = process.cpu_times()
+                values["utime"] = cpu.user
+                values["stime"] = cpu.system
+                ctx = process.num_ctx_switches()
+                values["vctx"] = ctx.voluntary
+                values["ictx"] = ctx.involuntary
+                values["threads"] = process.num_threads()
+            values["fds"] = process.num_fds()
+            io = process.io_counters()
+            values["rbytes"] = io.read_bytes
+            values["wbytes"] = io.write_bytes
+        except (psutil.Error, OSError):
+            pass
+        try:
+            values["uss"], values["pss"] = self.readSmapsRollup(process.pid)
+        except (OSError, ValueError, IndexError):
+            pass
+        return values
+
+    def sample(self, processes):
+        total = {}
+        for process in processes:
+            values = self.sampleProcess(process)
+            counters = {column: values[column]
+                        for column in self.cumulativeColumns if column in values}
+            if counters:
+                try:
+                    key = (process.pid, process.create_time())
+                    self.counters[key] = dict(self.counters.get(key, {}), **counters)
+                except psutil.Error:
+                    pass
+            for column, value in values.items():
+                if column not in self.cumulativeColumns:
+                    total[column] = total.get(column, 0) + value
+        for counters in self.counters.values():
+            for column, value in counters.items():
+                total[column] = total.get(column, 0) + value
+        return [total.get(column, "NaN") for column in self.columns]
+
+
+class IoCounter:
+    """Sum up the io counters of /proc/<pid>/io over a set of processes.
+
+    The last counters of every process are kept after it exited, so the sums never decrease.
+    """
+
+    columns = ["rchar", "wchar", "syscr", "syscw", "read_bytes", "write_bytes",
+               "cancelled_write_bytes"]
+
+    def __init__(self):
+        self.counters = {}
+
+    def readIo(self, pid):
+        values = {}
+        with open("/proc/{}/io".format(pid), "r") as io:
+            for line in io:
+                key, value = line.split(":")
+                values[key] = int(value)
+        return values
+
+    def sample(self, processes):
+        for process in processes:
+            try:
+                self.counters[(process.pid, process.create_time())] = self.readIo(process.pid)
+            except (psutil.Error, OSError, ValueError):
+                pass
+        return [sum(counters.get(column, 0) for counters in self.counters.values())
+                for column in self.columns]
+
+
+class CgroupReader:
+    """Read the resource accounting of a (v2) cgroup directly from the cgroup file system.
+
+    Memory values are given in KiB, cpu times in seconds and io in bytes summed over all devices.
+    """
+
+    columns = ["cgmem", "cganon", "cgfile", "cgcpu", "cguser", "cgsystem", "cgrbytes", "cgwbytes"]
+    containerPatterns = ["system.slice/docker-{id}.scope", "docker/{id}",
+                         "system.slice/docker/{id}"]
+
+    def __init__(self, path):
+        self.path = path
+
+    @classmethod
+    def findContainerCgroup(cls, containerId, root='/sys/fs/cgroup', walk=True):
+        """Find the cgroup of a docker container below root or return None.
+
+        The known locations are checked first, only with walk the whole tree is searched.
+        """
+        for pattern in cls.containerPatterns:
+            path = os.path.join(root, pattern.format(id=containerId))
+            if os.path.isdir(path):
+                return cls(path)
+        if not walk:
+            return None
+        for dirpath, dirnames, filenames in os.walk(root):
+            for dirname in dirnames:
+                if containerId in dirname:
+                    return cls(os.path.join(dirpath, dirname))
+        return None
+
+    def readKeyValues(self, name):
+        values = {}
+        with open(os.path.join(self.path, name), "r") as statFile:
+            for line in statFile:
+                fields = line.split()
+                if len(fields) == 2:
+                    values[fields[0]] = int(fields[1])
+        return values
+
+    def sample(self):
+        values = {}
+        try:
+            with open(os.path.join(self.path, "memory.current"), "r") as current:
+                values["cgmem"] = int(current.read()) / 1024
+            memoryStat = self.readKeyValues("memory.stat")
+            values["cganon"] = memoryStat.get("anon", 0) / 1024
+            values["cgfile"] = memoryStat.get("file", 0) / 1024
+        except (OSError, ValueError):
+            pass
+        try:
+            cpuStat = self.readKeyValues("cpu.stat")
+            values["cgcpu"] = cpuStat.get("usage_usec", 0) / 1000000
+            values["cguser"] = cpuStat.get("user_usec", 0) / 1000000
+            values["cgsystem"] = cpuStat.get("system_usec", 0) / 1000000
+        except (OSError, ValueError):
+            pass
+        try:
+            rbytes = 0
+            wbytes = 0
+            with open(os.path.join(self.path, "io.stat"), "r") as ioStat:
+                for line in ioStat:
+                    for field in line.split()[1:]:
+                        key, value = field.split("=")
+                        if key == "rbytes":
+                            rbytes += int(value)
+                        elif key == "wbytes":
+                            wbytes += int(value)
+            values["cgrbytes"] = rbytes
+            values["cgwbytes"] = wbytes
+        except (OSError, ValueError):
+            pass
+        return [values.get(column, "NaN") for column in self.columns]
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+import math
+
+
+class SteadyStateDetector:
+    """Detect the end of the warmup in a series of query mix runtimes.
+
+    The series is steady as soon as the last window runtimes have a coefficient of variation
+    below threshold and their mean differs by less than threshold from the mean of the window
+    before. All runtimes up to that point are considered warmup.
+    """
+
+    def __init__(self, window=5, threshold=0.1):
+        self.window = window
+        self.threshold = threshold
+        self.values = []
+        self.warmup = None
+
+    @property
+    def steady(self):
+        return self.warmup is not None
+
+    def add(self, value):
+        """Add the next runtime and return True, once the series is steady."""
+        self.values.append(value)
+        if self.warmup is None and self.isSteady(len(self.values)):
+            self.warmup = len(self.values)
+        return self.steady
+
+    def isSteady(self, end):
+        if end < 2 * self.window:
+            return False
+        current = self.values[end - self.window:end]
+        previous = self.values[end - 2 * self.window:end - self.window]
+        mean = sum(current) / self.window
+        if mean <= 0:
+            return False
+        deviation = math.sqrt(sum((value - mean) ** 2 for value in current) / (self.window - 1))
+        previousMean = sum(previous) / self.window
+        stable = deviation / mean <= self.threshold
+        return stable and abs(mean - previousMean) / mean <= self.threshold
+
+
+def detectSteadyState(values, window=5, threshold=0.1):
+    """Get the number of leading warmup values of a series or None, if it never gets steady."""
+    detector = SteadyStateDetector(window, threshold)
+    for value in values:
+        if detector.add(value):
+            break
+    return detector.warmup
@@ -0,0 +1,16 @@
+set output "bsbm_clients.pdf"
+set terminal pdf
+
+set xlabel 'concurrent clients'
+set ylabel 'QMPH'
+set y2label 'store cpu (cores)'
+set logscale x 2
+set yrange [0:]
+set y2range [0:]
+set ytics nomirror
+set y2tics
+set key top left
+
+plot {% for scenario in scenarios %}'{{ file_clients }}' index {{ scenario.index }} using 1:2:3 with yerrorlines lt rgb "{{ scenario.color }}" title "{{ scenario.setup }}", \
+     '{{ file_clients }}' index {{ scenario.index }} using 1:4 axes x1y2 with lines dt 2 lt rgb "{{ scenario.color }}" title "{{ scenario.setup }} cpu"{% if not loop.last %}, \
+     {% endif %}{% endfor %}
@@ -0,0 +1,72 @@
+"""A signal based stack sampler, which is injected into the store at interpreter start.
+
+If BSQBM_STACKSAMPLER_OUTPUT is set, the stacks of all threads are sampled on each SIGPROF
+(ITIMER_PROF, so only cpu time of the process counts) with BSQBM_STACKSAMPLER_RATE Hz.
+The collapsed stacks are written to <BSQBM_STACKSAMPLER_OUTPUT>.<pid> when the process exits or
+is terminated. Forked children (e.g. uwsgi workers) restart the timer and write their own file.
+"""
+
+import os
+import sys
+import signal
+import atexit
+import _thread
+import collections
+
+output = os.environ.get("BSQBM_STACKSAMPLER_OUTPUT")
+rate = float(os.environ.get("BSQBM_STACKSAMPLER_RATE", "100"))
+stacks = collections.Counter()
+
+
+def frameLabel(frame):
+    code = frame.f_code
+    return "{} ({}:{})".format(code.co_name, code.co_filename, frame.f_lineno)
+
+
+def sample(signum, frame):
+    frames = sys._current_frames()
+    # do not record the handler itself for the interrupted thread
+    frames[_thread.get_ident()] = frame
+    for threadFrame in frames.values():
+        stack = []
+        while threadFrame is not None:
+            stack.append(frameLabel(threadFrame))
+            threadFrame = threadFrame.f_back
+        stacks[";".join(reversed(stack))] += 1
+
+
+def write():
+    signal.setitimer(signal.ITIMER_PROF, 0)
+    if not stacks:
+        return
+    with open("{}.{}".format(output, os.getpid()), "w") as collapsed:
+        for stack, count in stacks.items():
+            collapsed.write("{} {}\n".format(stack, count))
+    stacks.clear()
+
+
+def start():
+    stacks.clear()
+    signal.signal(signal.SIGPROF, sample)
+    signal.setitimer(signal.ITIMER_PROF, 1 / rate, 1 / rate)
+
+
+def install():
+    previousHandler = signal.getsignal(signal.SIGTERM)
+
+    def terminate(signum, frame):
+        write()
+        if callable(previousHandler):
+            previousHandler(signum, frame)
+        else:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            os.kill(os.getpid(), signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, terminate)
+    atexit.register(write)
+    os.register_at_fork(after_in_child=start)
+    start()
+
+
+if output:
+    install()
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+
+import json
+import time
+import select
+import logging
+import datetime
+import threading
+import http.client
+import urllib.parse
+
+
+class TransportError(ConnectionError):
+    """A request could not be sent or its response could not be read."""
+
+    pass
+
+
+class Response:
+    """The response of a request with the timing of its phases.
+
+    connect is the time to open a new connection (0 for a reused one), server the time from
+    sending the request until the body was read, i.e. network and store, and overhead the remaining
+    time spent in the client, all in seconds. The same phases are kept in nanoseconds of a
+    monotonic clock together with the time to the first byte (ttfbNs, until the response headers
+    were read), the time to transfer the body (bodyNs) and its size in bytes. started and finished
+    are the wall clock times around the server phase.
+    """
+
+    def __init__(self, status, headers, body, started, finished, timing):
+        self.status = status
+        self.status_code = status
+        self.headers = headers
+        self.body = body
+        self.started = started
+        self.finished = finished
+        self.timing = timing
+
+    @property
+    def text(self):
+        return self.body.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.body.decode('utf-8'))
+
+    def countRows(self):
+        """Get the number of results of a SPARQL result in JSON, XML, CSV or TSV or None.
+
+        Without a content type the format is guessed from the first character of the body.
+        """
+        contentType = self.headers.get('Content-Type', self.headers.get('content-type', ''))
+        contentType = contentType.split(';')[0].strip()
+        start = self.body.lstrip()[:1]
+        try:
+            if contentType.endswith('json') or (not contentType and start == b'{'):
+                data = self.json()
+                if isinstance(data, dict) and 'results' in data:
+                    return len(data['results']['bindings'])
+                return None
+            if contentType.endswith('xml') or (not contentType and start == b'<'):
+                return self.body.count(b'<result>') + self.body.count(b'<result ')
+            if contentType in ('text/csv', 'text/tab-separated-values'):
+                return max(0, len([line for line in self.body.splitlines() if line.strip()]) - 1)
+        except (ValueError, KeyError, TypeError):
+            return None
+        return None
+
+
+class ConnectionPool:
+    """Keep-alive connections to a single host, shared between threads."""
+
+    def __init__(self, scheme, host, port, timeout=None, maxIdle=64):
+        if scheme == 'https':
+            self.connectionClass = http.client.HTTPSConnection
+        else:
+            self.connectionClass = http.client.HTTPConnection
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.maxIdle = maxIdle
+        self.idle = []
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Get an idle connection or a new, not yet connected one and tell if it was reused.
+
+        Idle connections, which were closed by the server in the meantime, are discarded.
+        """
+        while True:
+            with self.lock:
+                if not self.idle:
+                    break
+                connection = self.idle.pop()
+            if not self.isStale(connection):
+                return connection, True
+            connection.close()
+        return self.connectionClass(self.host, self.port, timeout=self.timeout), False
+
+    def isStale(self, connection):
+        """Check if an idle connection was closed, it is readable only on EOF or an error."""
+        if connection.sock is None:
+            return True
+        try:
+            readable, writable, failed = select.select([connection.sock], [], [], 0)
+        except (OSError, ValueError):
+            return True
+        return bool(readable)
+
+    def release(self, connection):
+        with self.lock:
+            if len(self.idle) < self.maxIdle:
+                self.idle.append(connection)
+                return
+        connection.close()
+
+    def close(self):
+        with self.lock:
+            for connection in self.idle:
+                connection.close()
+            self.idle = []
+
+
+class Transport:
+    """A HTTP transport with a keep-alive connection pool per endpoint, based on http.client.
+
+    The time spent in connecting and in the client is accounted separately from the time the
+    server needed, so measured execution times reflect the store.
+    """
+
+    logger = logging.getLogger('quit-eval.transport')
+
+    chunkSize = 65536
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self.pools = {}
+        self.lock = threading.Lock()
+        self.statistics = {"requests": 0, "connects": 0, "retries": 0, "connect": 0.0,
+                           "server": 0.0, "overhead": 0.0}
+
+    def getPool(self, url):
+        key = (url.scheme, url.hostname, url.port)
+        with self.lock:
+            if key not in self.pools:
+                self.pools[key] = ConnectionPool(url.scheme, url.hostname, url.port, self.timeout)
+            return self.pools[key]
+
+    def request(self, method, url, params=None, data=None, headers=None, lineHandler=None,
+                idempotent=None):
+        """Send a request and read its response.
+
+        With a lineHandler the body is not kept, but passed line by line to lineHandler as it is
+        received. A request on a reused connection is only sent again, if sending it failed or if
+        it is idempotent, i.e. a GET or a read-only query, so updates are never applied twice.
+        """
+        if idempotent is None:
+            idempotent = method in ('GET', 'HEAD')
+        begin = time.perf_counter_ns()
+        url = urllib.parse.urlsplit(url)
+        path = url.path or '/'
+        query = url.query
+        if params:
+            query = '&'.join(part for part in (query, urllib.parse.urlencode(params)) if part)
+        if query:
+            path += '?' + query
+        headers = dict(headers or {})
+        if isinstance(data, dict):
+            body = urllib.parse.urlencode(data).encode()
+            headers.setdefault('Content-Type', 'application/x-www-form-urlencoded')
+        elif isinstance(data, str):
+            body = data.encode('utf-8')
+        else:
+            body = data
+        pool = self.getPool(url)
+
+        # a reused connection might have been closed by the server in the meantime, retry once
+        for attempt in range(2):
+            connection, reused = pool.acquire()
+            connect = 0
+            size = 0
+            sent = False
+            try:
+                if not reused:
+                    connectStart = time.perf_counter_ns()
+                    connection.connect()
+                    connect = time.perf_counter_ns() - connectStart
+                started = datetime.datetime.now()
+                serverStart = time.perf_counter_ns()
+                connection.request(method, path, body=body, headers=headers)
+                sent = True
+                response = connection.getresponse()
+                firstByte = time.perf_counter_ns()
+                chunks = []
+                if lineHandler is None:
+                    while True:
+                        chunk = response.read(self.chunkSize)
+                        if not chunk:
+                            break
+                        chunks.append(chunk)
+                        size += len(chunk)
+                else:
+                    for line in response:
+                        size += len(line)
+                        lineHandler(line)
+                    # mark the response as complete, so the connection can be reused
+                    response.read()
+                content = b''.join(chunks)
+                serverEnd = time.perf_counter_ns()
+                finished = datetime.datetime.now()
+            except (OSError, http.client.HTTPException) as exc:
+                connection.close()
+                if reused and attempt == 0 and size == 0 and (idempotent or not sent):
+                    with self.lock:
+                        self.statistics["retries"] += 1
+                    continue
+                raise TransportError("{} {}://{}{} failed: {}".format(
+                    method, url.scheme, url.netloc, path, exc)) from exc
+            break
+
+        if response.will_close:
+            connection.close()
+        else:
+            pool.release(connection)
+        total = time.perf_counter_ns() - begin
+        server = serverEnd - serverStart
+        timing = {"connect": connect / 1e9, "server": server / 1e9,
+                  "overhead": (total - connect - server) / 1e9, "total": total / 1e9,
+                  "connectNs": connect, "ttfbNs": firstByte - serverStart,
+                  "bodyNs": serverEnd - firstByte, "serverNs": server, "totalNs": total,
+                  "bytes": size}
+        with self.lock:
+            self.statistics["requests"] += 1
+            self.statistics["connects"] += 0 if reused else 1
+            for phase in ("connect", "server", "overhead"):
+                self.statistics[phase] += timing[phase]
+        return Response(response.status, dict(response.getheaders()), content, started, finished,
+                        timing)
+
+    def post(self, url, data=None, params=None, headers=None, lineHandler=None, idempotent=False):
+        return self.request('POST', url, params, data, headers, lineHandler, idempotent)
+
+    def get(self, url, params=None, headers=None):
+        return self.request('GET', url, params, None, headers)
+
+    def writeStatistics(self, path):
+        """Append the number of requests and connections and the time spent per phase to path."""
+        with self.lock:
+            statistics = dict(self.statistics)
+        with open(path, 'a') as statisticsFile:
+            statisticsFile.write(
+                "requests={requests} connects={connects} retries={retries} "
+                "connect={connect:.6f} server={server:.6f} overhead={overhead:.6f}\n".format(
+                    **statistics))
+
+    def close(self):
+        with self.lock:
+            for pool in self.pools.values():
+                pool.close()
+
+
+transport = Transport()